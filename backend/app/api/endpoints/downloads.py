@@ -1,9 +1,13 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, Depends, HTTPException
 from app.services.download_service import download_manager
-from app.models.download import DownloadRequest, DownloadAction
+from app.services.cache_service import cache_service
+from app.services.catalog_service import catalog_service
+from app.models.download import DownloadRequest, DownloadAction, DownloadQueueUpdate, BandwidthSettings, DownloadRateLimit
+from app.utils.bandwidth_limiter import bandwidth_limiter
 from typing import List, Dict, Any, Optional
 from app.config import settings, logger
 from fastapi.responses import FileResponse
+import json
 import os
 
 router = APIRouter()
@@ -16,25 +20,43 @@ async def startup():
     await download_manager.load_downloads()
 
 
+def _parse_subscription(video_ids: Any) -> Optional[List[str]]:
+    """订阅内容："all" 或不传表示全部下载，否则为视频ID列表（或逗号分隔的字符串）"""
+    if video_ids is None or video_ids == "all":
+        return None
+    if isinstance(video_ids, str):
+        return [video_id for video_id in video_ids.split(",") if video_id]
+    return [str(video_id) for video_id in video_ids]
+
+
 @router.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket连接处理，用于实时更新下载进度"""
+async def websocket_endpoint(websocket: WebSocket, video_ids: Optional[str] = Query(None)):
+    """
+    WebSocket连接处理，用于实时更新下载进度
+
+    连接时可以通过 video_ids 参数（逗号分隔或 "all"）指定订阅的下载，默认订阅全部。
+    连接后先收到订阅范围内的完整快照，之后只收到这些下载的增量。
+    连接期间发送 {"type": "subscribe", "video_ids": [...] | "all"} 可以更换订阅，随后会收到新的快照。
+    """
     await websocket.accept()
-    download_manager.websocket_connections.add(websocket)
+    download_manager.broadcaster.connect(websocket, _parse_subscription(video_ids))
     try:
-        # 连接建立后发送现有下载状态
-        for video_id, download in download_manager.active_downloads.items():
-            await download_manager.broadcast_progress(video_id)
-            
-        # 保持连接，直到客户端断开
+        # 接收订阅变更，直到客户端断开
         while True:
-            await websocket.receive_text()
+            message = await websocket.receive_text()
+            try:
+                request = json.loads(message)
+            except ValueError:
+                logger.debug(f"忽略无法解析的WebSocket消息: {message[:100]}")
+                continue
+            if isinstance(request, dict) and request.get("type") == "subscribe":
+                download_manager.broadcaster.subscribe(websocket, _parse_subscription(request.get("video_ids")))
     except WebSocketDisconnect:
         logger.info("WebSocket连接断开")
     except Exception as e:
         logger.error(f"WebSocket错误: {e}")
     finally:
-        download_manager.websocket_connections.remove(websocket)
+        await download_manager.broadcaster.disconnect(websocket)
 
 
 @router.get("/history")
@@ -48,13 +70,59 @@ async def start_download(download_request: DownloadRequest):
     """开始下载视频"""
     return await download_manager.start_download(
         download_request.video_id,
-        download_request.force
+        download_request.force,
+        download_request.priority or 0
     )
 
 
+@router.get("/queue")
+async def get_download_queue() -> Dict[str, Any]:
+    """获取下载调度状态：正在下载和排队中的视频ID"""
+    return download_manager.scheduler.stats()
+
+
+@router.post("/queue")
+async def reorder_download_queue(update: DownloadQueueUpdate):
+    """调整排队中下载的优先级或位置"""
+    success = await download_manager.reorder_download(update.video_id, update.priority, update.position)
+    return {"status": "success" if success else "error", "message": "队列已调整" if success else "下载不在队列中"}
+
+
+@router.get("/connections")
+async def get_host_connections() -> Dict[str, Any]:
+    """获取各下载主机当前学习到的并发连接数和吞吐量"""
+    return download_manager.connection_controller.stats()
+
+
+@router.get("/memory")
+async def get_buffer_memory() -> Dict[str, Any]:
+    """获取下载缓冲池的内存使用情况"""
+    return download_manager.buffer_pool.stats()
+
+
+@router.get("/bandwidth")
+async def get_bandwidth_settings() -> Dict[str, Any]:
+    """获取带宽限制设置"""
+    return bandwidth_limiter.stats()
+
+
+@router.post("/bandwidth")
+async def update_bandwidth_settings(update: BandwidthSettings) -> Dict[str, Any]:
+    """运行时调整全局限速、单个下载默认限速和视频播放预留比例"""
+    bandwidth_limiter.configure(update.global_limit, update.default_download_limit, update.streaming_reserve)
+    return bandwidth_limiter.stats()
+
+
+@router.post("/bandwidth/download")
+async def update_download_rate_limit(update: DownloadRateLimit):
+    """设置单个下载的限速"""
+    success = await download_manager.set_bandwidth_limit(update.video_id, update.limit)
+    return {"status": "success" if success else "error", "message": "限速已更新" if success else "下载不存在"}
+
+
 @router.post("/action")
 async def handle_download_action(action: DownloadAction):
-    """处理下载操作(暂停/继续/取消/重试/删除)"""
+    """处理下载操作(暂停/继续/取消/重试/删除/校验)"""
     video_id = action.video_id
     action_type = action.action.lower()
     result = {"status": "error", "message": "无效的操作"}
@@ -74,6 +142,8 @@ async def handle_download_action(action: DownloadAction):
     elif action_type == "delete":
         success = await download_manager.delete_download(video_id)
         result = {"status": "success" if success else "error", "message": "删除操作处理完成" if success else "操作失败"}
+    elif action_type == "verify":
+        result = await download_manager.verify_download(video_id)
     
     return result
 
@@ -104,7 +174,7 @@ async def get_downloaded_file(video_id: str):
 async def get_cover(video_id: str):
     """
     获取本地封面图片
-    如果本地不存在，则实时获取视频详情并下载封面
+    如果本地不存在，则从视频目录或视频详情中获取封面地址并下载封面
     """
     cover_filename = f"{video_id}.jpg"
     cover_path = settings.COVER_PATH / cover_filename
@@ -113,15 +183,19 @@ async def get_cover(video_id: str):
     if not cover_path.exists():
         logger.info(f"本地封面不存在，尝试下载视频 {video_id} 的封面")
         
-        # 获取视频详情
-        from app.services.video_service import VideoService
-        video_service = VideoService()
-        
         try:
-            video_detail = await video_service.get_video_detail(video_id)
-            if video_detail and video_detail.cover_url:
+            # 优先从本地视频目录获取封面地址，没有时再获取视频详情
+            cover_url = ""
+            catalog_video = await catalog_service.get_video(video_id)
+            if catalog_video:
+                cover_url = catalog_video.cover_url
+            if not cover_url:
+                video_detail = await cache_service.get_video_detail(video_id)
+                cover_url = video_detail.cover_url if video_detail else ""
+
+            if cover_url:
                 # 下载封面
-                await download_manager.download_cover(video_id, video_detail.cover_url)
+                await download_manager.download_cover(video_id, cover_url)
                 
                 # 再次检查是否下载成功
                 if not cover_path.exists():
@@ -1,48 +1,55 @@
-from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
 from app.models.video import *
 from app.services.video_service import VideoService
+from app.services.cache_service import cache_service
+from app.services.prefetch_service import prefetch_service
+from app.services.calendar_service import calendar_service
+from app.services.catalog_service import catalog_service
+from app.services.autocomplete_service import autocomplete_service
+from app.services.comment_service import comment_service
+from app.services.preview_service import preview_service
+import re
 import httpx
 from app.config import settings
-from app.utils.ttl_lru_cache import lru_cache
-from app.utils.chinese_converter import convert_dict
+from app.utils.locale import negotiate_locale, to_locale
+from app.utils.bandwidth_limiter import bandwidth_limiter
 
 router = APIRouter()
 video_service = VideoService()
 
 
+def get_locale(
+        request: Request,
+        lang: Optional[str] = Query(None, description="返回语言：zh-Hans（简体）或 zh-Hant（繁体），默认按 Accept-Language")
+) -> str:
+    """确定响应使用的语言区域"""
+    return negotiate_locale(lang, request.headers.get("accept-language"))
+
+
 @router.get("/home", response_model=HomeData)
-@lru_cache(maxsize=1, ttl=1800)  # 缓存10个结果，过期时间30分钟
-async def get_home_page():
+async def get_home_page(locale: str = Depends(get_locale)):
     """获取首页数据，包括头图和推荐视频"""
-    return await video_service.get_home_data()
+    return await cache_service.get_home_data(locale)
 
 
 @router.get("/search_combination", response_model=SearchCombination)
-@lru_cache(maxsize=1, ttl=86400)  # 只缓存1个结果，过期时间24小时
-async def search_videos():
-    return await video_service.get_search_combination()
-
+async def search_videos(locale: str = Depends(get_locale)):
+    return await cache_service.get_search_combination(locale)
 
-def _search_key_builder(*args, **kwargs):
-    """为搜索接口创建缓存键"""
-    # 提取所有查询参数
-    query = kwargs.get("query", "")
-    genre = kwargs.get("genre", "")
-    tags = "-".join(kwargs.get("tags", []) or [])
-    broad = str(kwargs.get("broad", False))
-    sort = kwargs.get("sort", "")
-    year = str(kwargs.get("year", ""))
-    month = str(kwargs.get("month", ""))
-    page = str(kwargs.get("page", 1))
 
-    # 组合成键
-    key = f"search:{query}:{genre}:{tags}:{broad}:{sort}:{year}:{month}:{page}"
-    return key
+@router.get("/autocomplete", response_model=List[SearchSuggestion])
+async def autocomplete(
+        q: str = Query(..., min_length=1, description="输入的前缀，简繁体均可"),
+        kind: Optional[str] = Query(None, description="只返回指定类型：tag、genre、studio"),
+        limit: int = Query(10, description="最多返回数量", ge=1, le=50),
+        locale: str = Depends(get_locale)
+):
+    """标签、视频类型、发行商的前缀联想，按本地目录中的热度排序"""
+    return to_locale(await autocomplete_service.suggest(q, limit=limit, kind=kind), locale)
 
 
 @router.get("/search")
-@lru_cache(maxsize=100, ttl=86400, key_builder=_search_key_builder)  # 缓存100个搜索结果，过期时间24小时
 async def search_videos(
         query: str = Query(None, description="搜索关键词"),
         genre: Optional[str] = Query(None, description="视频类型过滤"),
@@ -51,9 +58,16 @@ async def search_videos(
         sort: Optional[str] = Query(None, description="排序方式"),
         year: Optional[int] = Query(None, description="年份"),
         month: Optional[int] = Query(None, description="月份"),
-        page: int = Query(1, description="页码", ge=1)
+        page: int = Query(1, description="页码", ge=1),
+        local: bool = Query(False, description="离线搜索本地目录，不请求上游"),
+        downloaded: bool = Query(False, description="离线搜索时只搜索已下载的视频"),
+        locale: str = Depends(get_locale)
 ):
     """搜索视频"""
+    if local:
+        # 本地目录没有排序和年月信息，只支持关键词、类型和标签过滤，结果按相关度排序
+        return await catalog_service.search(query, genre=genre, tags=tags, downloaded_only=downloaded, page=page)
+
     params = {
         "query": query,
         "genre": genre,
@@ -64,34 +78,138 @@ async def search_videos(
         "month": month,
         "page": page
     }
-    return await video_service.search_videos(**convert_dict(params, to_simple=False))
+    results = await cache_service.search_videos(locale=locale, **params)
+    prefetch_service.on_search(params, results)
+    return results
+
+
+@router.get("/search/stream")
+async def stream_search_videos(
+        query: str = Query(None, description="搜索关键词"),
+        genre: Optional[str] = Query(None, description="视频类型过滤"),
+        tags: Optional[List[str]] = Query(None, description="标签过滤"),
+        broad: Optional[bool] = Query(False, description="宽泛搜索"),
+        sort: Optional[str] = Query(None, description="排序方式"),
+        year: Optional[int] = Query(None, description="年份"),
+        month: Optional[int] = Query(None, description="月份"),
+        page_start: int = Query(1, description="起始页码", ge=1),
+        page_end: Optional[int] = Query(None, description="结束页码（包含），默认到最后一页", ge=1),
+        locale: str = Depends(get_locale)
+):
+    """获取多页搜索结果，每页的 detailed_videos 以 NDJSON 流式返回，跨页按 video_id 去重"""
+    params = {
+        "query": query,
+        "genre": genre,
+        "tags": tags,
+        "broad": broad,
+        "sort": sort,
+        "year": year,
+        "month": month,
+    }
+    # 限制单次请求的最大页数
+    max_page_end = page_start + settings.BATCH_SEARCH_MAX_PAGES - 1
+    page_end = min(page_end, max_page_end) if page_end else max_page_end
+
+    async def generate():
+        async for results in cache_service.iter_search_pages(params, page_start, page_end, locale=locale):
+            yield results.model_dump_json(include={"page", "total_pages", "has_next", "detailed_videos"}) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+@router.get("/calendar/{year}/{month}", response_model=ReleaseCalendar)
+async def get_release_calendar(
+        year: int,
+        month: int,
+        genre: Optional[str] = Query(None, description="视频类型过滤"),
+        locale: str = Depends(get_locale)
+):
+    """获取月度发行日历，按日期分组"""
+    if not 1 <= month <= 12:
+        raise HTTPException(status_code=400, detail="月份必须在1到12之间")
+    return await calendar_service.get_release_calendar(year, month, genre, locale=locale)
+
+
+@router.get("/previews/{yyyymm}", response_model=MonthlyPreviews)
+async def get_monthly_previews(yyyymm: str, locale: str = Depends(get_locale)):
+    """获取月度新番预告，月份格式为 yyyymm"""
+    if not re.fullmatch(r"\d{6}", yyyymm) or not 1 <= int(yyyymm[4:]) <= 12:
+        raise HTTPException(status_code=400, detail="月份格式应为yyyymm")
+    previews = await preview_service.get_monthly_previews(int(yyyymm[:4]), int(yyyymm[4:]), locale=locale)
+    if not previews.videos:
+        raise HTTPException(status_code=404, detail="无法获取新番预告")
+    return previews
+
+
+@router.get("/catalog", response_model=List[VideoPreview])
+async def get_catalog_videos(
+        ids: List[str] = Query(..., description="视频ID列表")
+):
+    """从本地视频目录批量查询视频预览信息（标题、封面等），不请求上游"""
+    videos = await catalog_service.get_videos(ids)
+    return [videos[video_id] for video_id in ids if video_id in videos]
 
 
 @router.get("/detail/{video_id}", response_model=VideoDetail)
-@lru_cache(maxsize=100, ttl=3600)  # 缓存100个视频详情，过期时间1小时
-async def get_video_detail(video_id: str):
+async def get_video_detail(video_id: str, locale: str = Depends(get_locale)):
     """获取视频详情"""
-    video = await video_service.get_video_detail(video_id)
+    video = await cache_service.get_video_detail(video_id, locale)
     if not video:
         raise HTTPException(status_code=404, detail="视频不存在")
+    prefetch_service.on_video_detail(video)
     return video
 
 
+@router.post("/details")
+async def get_video_details(batch_request: VideoDetailBatchRequest, locale: str = Depends(get_locale)):
+    """批量获取视频详情，按完成顺序以 NDJSON 流式返回"""
+
+    async def generate():
+        async for item in cache_service.iter_video_details(batch_request.video_ids, locale=locale):
+            yield item.model_dump_json() + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+@router.get("/streams/{video_id}", response_model=VideoStreamInfo)
+async def get_video_streams(video_id: str):
+    """获取视频播放流地址（快速路径，不解析完整详情页）"""
+    stream_info = await video_service.resolve_stream_urls(video_id)
+    if not stream_info or not stream_info.stream_urls:
+        raise HTTPException(status_code=404, detail="无法获取播放地址")
+    return stream_info
+
+
 @router.get("/loadComments/{video_id}", response_model=List[VideoComment])
-@lru_cache(maxsize=100, ttl=3600)
 async def load_comments(video_id: str):
     """加载视频评论"""
-    comments = await video_service.get_video_comments(video_id)
+    comments = await comment_service.get_comments(video_id)
     if not comments:
         raise HTTPException(status_code=404, detail="无法加载评论")
     return comments
 
 
+@router.get("/comments/{video_id}", response_model=CommentPage)
+async def get_comment_page(
+        video_id: str,
+        cursor: Optional[str] = Query(None, description="分页游标，使用上一页返回的 next_cursor"),
+        limit: int = Query(settings.COMMENT_PAGE_SIZE, description="每页数量", ge=1, le=100),
+        expand_replies: int = Query(0, description="同时加载当前页前N个有回复的评论的回复", ge=0)
+):
+    """分页加载视频评论，可选地一并加载热门评论的回复"""
+    try:
+        page = await comment_service.get_comment_page(video_id, cursor, limit, expand_replies)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not page.total:
+        raise HTTPException(status_code=404, detail="无法加载评论")
+    return page
+
+
 @router.get("/loadReplies/{comment_id}", response_model=List[CommentReply])
-@lru_cache(maxsize=100, ttl=3600)
 async def load_replies(comment_id: str):
     """加载评论回复"""
-    replies = await video_service.get_comment_replies(comment_id)
+    replies = await comment_service.get_replies(comment_id)
     if not replies:
         raise HTTPException(status_code=404, detail="无法加载回复")
     return replies
@@ -117,6 +235,9 @@ async def stream_video(url: str, request: Request = None):
 
     print(range_header)
 
+    # 播放期间为视频流预留带宽：请求上游期间由这里预留，发送响应期间由响应体生成器预留，
+    # 两处都在 finally 中释放，客户端断开或发送出错时也不会遗留预留
+    bandwidth_limiter.stream_started()
     try:
         async with httpx.AsyncClient(proxies=proxy) as client:
             # 如果有Range头，则将其转发到目标服务器
@@ -143,12 +264,22 @@ async def stream_video(url: str, request: Request = None):
             if "content-length" in response.headers:
                 resp_headers["content-length"] = response.headers["content-length"]
 
+            async def body():
+                bandwidth_limiter.stream_started()
+                try:
+                    async for chunk in response.aiter_bytes():
+                        yield chunk
+                finally:
+                    bandwidth_limiter.stream_finished()
+
             # 返回流式响应
             return StreamingResponse(
-                response.aiter_bytes(),
+                body(),
                 headers=resp_headers,
                 status_code=status_code,
                 media_type=media_type
             )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"视频流获取失败: {str(e)}")
+    finally:
+        bandwidth_limiter.stream_finished()
@@ -22,5 +22,10 @@ api_router.include_router(
 async def shutdown_event():
     """应用关闭时的清理操作"""
     logger.info("应用关闭，清理连接池资源...")
+    # 停止正在进行的下载，进度保存后重启时恢复
+    await download_manager.scheduler.stop()
+    await download_manager.broadcaster.stop()
     # 关闭所有HTTP客户端连接
     await download_manager.close_http_clients()
+    # 关闭数据库连接
+    await download_manager.close_db()
@@ -56,6 +56,59 @@ class Settings(BaseModel):
 
     CLOUDFLARE_BYPASS_SERVICE_URL: str = os.getenv("CLOUDFLARE_BYPASS_SERVICE_URL", "")
 
+    # 预取设置
+    PREFETCH_ENABLED: bool = os.getenv("PREFETCH_ENABLED", "True").lower() in ("true", "1", "t")
+    PREFETCH_RELATED_COUNT: int = int(os.getenv("PREFETCH_RELATED_COUNT", "3"))
+    PREFETCH_QUEUE_SIZE: int = int(os.getenv("PREFETCH_QUEUE_SIZE", "50"))
+    PREFETCH_MAX_PER_MINUTE: int = int(os.getenv("PREFETCH_MAX_PER_MINUTE", "20"))
+    PREFETCH_IDLE_DELAY: float = float(os.getenv("PREFETCH_IDLE_DELAY", "1.0"))
+
+    # 批量请求设置
+    BATCH_DETAIL_CONCURRENCY: int = int(os.getenv("BATCH_DETAIL_CONCURRENCY", "4"))
+    BATCH_SEARCH_CONCURRENCY: int = int(os.getenv("BATCH_SEARCH_CONCURRENCY", "4"))
+    BATCH_SEARCH_MAX_PAGES: int = int(os.getenv("BATCH_SEARCH_MAX_PAGES", "50"))
+
+    # 发行日历设置
+    CALENDAR_CURRENT_TTL: int = int(os.getenv("CALENDAR_CURRENT_TTL", "3600"))
+    CALENDAR_PAST_TTL: int = int(os.getenv("CALENDAR_PAST_TTL", str(7 * 86400)))
+    CALENDAR_WARM_INTERVAL: int = int(os.getenv("CALENDAR_WARM_INTERVAL", "3000"))
+
+    # 新番预告设置
+    PREVIEW_CURRENT_TTL: int = int(os.getenv("PREVIEW_CURRENT_TTL", "3600"))
+    PREVIEW_PAST_TTL: int = int(os.getenv("PREVIEW_PAST_TTL", str(30 * 86400)))
+    PREVIEW_PREFETCH_HOURS: str = os.getenv("PREVIEW_PREFETCH_HOURS", "3-6")
+    PREVIEW_PREFETCH_CHECK_INTERVAL: int = int(os.getenv("PREVIEW_PREFETCH_CHECK_INTERVAL", "1800"))
+
+    # 评论设置
+    COMMENT_PAGE_SIZE: int = int(os.getenv("COMMENT_PAGE_SIZE", "20"))
+    COMMENT_MAX_EXPAND_REPLIES: int = int(os.getenv("COMMENT_MAX_EXPAND_REPLIES", "10"))
+    COMMENT_REPLY_CONCURRENCY: int = int(os.getenv("COMMENT_REPLY_CONCURRENCY", "4"))
+
+    # 本地视频目录设置
+    CATALOG_FLUSH_INTERVAL: float = float(os.getenv("CATALOG_FLUSH_INTERVAL", "5"))
+    LOCAL_SEARCH_PAGE_SIZE: int = int(os.getenv("LOCAL_SEARCH_PAGE_SIZE", "30"))
+
+    # 目录爬虫设置
+    CRAWLER_ENABLED: bool = os.getenv("CRAWLER_ENABLED", "True").lower() in ("true", "1", "t")
+    CRAWLER_PAGE_DELAY: float = float(os.getenv("CRAWLER_PAGE_DELAY", "30"))
+    CRAWLER_PAGES_PER_RUN: int = int(os.getenv("CRAWLER_PAGES_PER_RUN", "20"))
+    CRAWLER_RUN_INTERVAL: int = int(os.getenv("CRAWLER_RUN_INTERVAL", "3600"))
+    CRAWLER_EARLIEST_YEAR: int = int(os.getenv("CRAWLER_EARLIEST_YEAR", "2000"))
+
+    # 下载设置
+    DOWNLOAD_PROGRESS_FLUSH_INTERVAL: float = float(os.getenv("DOWNLOAD_PROGRESS_FLUSH_INTERVAL", "2"))
+    MAX_ACTIVE_DOWNLOADS: int = int(os.getenv("MAX_ACTIVE_DOWNLOADS", "3"))
+    DOWNLOAD_RESUME_STAGGER: float = float(os.getenv("DOWNLOAD_RESUME_STAGGER", "5"))
+    DOWNLOAD_RATE_LIMIT: float = float(os.getenv("DOWNLOAD_RATE_LIMIT", "0"))
+    DOWNLOAD_PER_RATE_LIMIT: float = float(os.getenv("DOWNLOAD_PER_RATE_LIMIT", "0"))
+    STREAMING_RESERVED_SHARE: float = float(os.getenv("STREAMING_RESERVED_SHARE", "0.3"))
+    DOWNLOAD_INITIAL_CONNECTIONS: int = int(os.getenv("DOWNLOAD_INITIAL_CONNECTIONS", "4"))
+    DOWNLOAD_MAX_CONNECTIONS_PER_HOST: int = int(os.getenv("DOWNLOAD_MAX_CONNECTIONS_PER_HOST", "16"))
+    DOWNLOAD_BUFFER_SIZE: int = int(os.getenv("DOWNLOAD_BUFFER_SIZE", str(1024 * 1024)))
+    DOWNLOAD_MEMORY_LIMIT: int = int(os.getenv("DOWNLOAD_MEMORY_LIMIT", str(64 * 1024 * 1024)))
+    DOWNLOAD_WS_INTERVAL: float = float(os.getenv("DOWNLOAD_WS_INTERVAL", "0.2"))
+    DOWNLOAD_WS_QUEUE_SIZE: int = int(os.getenv("DOWNLOAD_WS_QUEUE_SIZE", "8"))
+
     # 日志设置
     LOG_PATH: Path = Path(os.getenv("LOG_PATH", str(backend_root / "logs")))
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
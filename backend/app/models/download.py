@@ -7,6 +7,7 @@ from datetime import datetime
 class DownloadStatus(str, Enum):
     """下载状态枚举"""
     PENDING = "pending"
+    QUEUED = "queued"
     DOWNLOADING = "downloading"
     PAUSED = "paused"
     COMPLETED = "completed"
@@ -20,6 +21,7 @@ class DownloadSegment(BaseModel):
     end: int
     downloaded: int = 0
     status: str = DownloadStatus.PENDING
+    checksum: Optional[int] = 0  # 已下载部分的 CRC32，随写入接续计算；为空表示未知（旧版本的分段记录）
 
 
 class DownloadRequest(BaseModel):
@@ -27,12 +29,33 @@ class DownloadRequest(BaseModel):
     video_id: str
     filename: Optional[str] = None
     force: Optional[bool] = False
+    priority: Optional[int] = 0  # 排队优先级，数值越小越优先
 
 
 class DownloadAction(BaseModel):
     """下载操作模型"""
     video_id: str
-    action: str  # 'pause', 'resume', 'cancel', 'retry', 'delete'
+    action: str  # 'pause', 'resume', 'cancel', 'retry', 'delete', 'verify'
+
+
+class DownloadQueueUpdate(BaseModel):
+    """调整下载队列模型"""
+    video_id: str
+    priority: Optional[int] = None  # 新的优先级，数值越小越优先
+    position: Optional[int] = None  # 移动到的排队位置（从1开始）
+
+
+class BandwidthSettings(BaseModel):
+    """带宽限制设置模型，未传入的项保持不变"""
+    global_limit: Optional[float] = None  # 所有下载的总限速（字节/秒），0 表示不限速
+    default_download_limit: Optional[float] = None  # 单个下载的默认限速（字节/秒），0 表示不限速
+    streaming_reserve: Optional[float] = None  # 有视频播放时预留给播放的全局带宽比例（0-1）
+
+
+class DownloadRateLimit(BaseModel):
+    """单个下载限速模型"""
+    video_id: str
+    limit: Optional[float] = None  # 限速（字节/秒），0 表示不限速，为空时恢复默认值
 
 
 class DownloadProgress(BaseModel):
@@ -51,6 +74,8 @@ class DownloadProgress(BaseModel):
     completed_at: Optional[datetime] = None
     retry_count: int = 0
     max_retries: int = 3
+    queue_position: Optional[int] = None  # 排队位置（从1开始），仅排队中时有值
+    rate_limit: Optional[float] = None  # 当前生效的限速（字节/秒），不限速时为空
     segments: Optional[List[DownloadSegment]] = None
 
 
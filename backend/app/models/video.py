@@ -15,6 +15,15 @@ class VideoStreamUrl(BaseModel):
     url: str
 
 
+class VideoStreamInfo(BaseModel):
+    """视频播放流信息模型，仅包含播放/下载所需的字段"""
+    video_id: str
+    cover_url: Optional[str] = ""
+    default_video_url: Optional[str] = ""
+    stream_urls: List[VideoStreamUrl] = []
+    expires_at: Optional[int] = Field(default=None, description="签名链接的过期时间戳（秒），未知时为空")
+
+
 class VideoStudio(BaseModel):
     """视频制作商/发行商模型"""
     name: str
@@ -48,6 +57,7 @@ class VideoPreview(VideoBase):
     like_rate: Optional[str] = ""
     like_count: Optional[int] = 0
     studio: Optional[VideoStudio] = None
+    release_date: Optional[str] = Field(default="", description="卡片上显示的日期（YYYY-MM-DD），没有时为空")
 
 
 class VideoDetail(VideoPreview):
@@ -80,6 +90,28 @@ class HomeData(BaseModel):
     error: Optional[str] = None
 
 
+class PreviewVideo(BaseModel):
+    """新番预告中的单个视频"""
+    title: str
+    video_id: Optional[str] = Field("", description="已上线时对应的视频ID")
+    subtitle: Optional[str] = ""
+    cover_url: Optional[str] = ""
+    release_date: Optional[str] = Field("", description="预计发行日期，格式 yyyy-mm-dd")
+    studio: Optional[str] = ""
+    description: Optional[str] = ""
+    tags: List[str] = []
+    trailer_url: Optional[str] = Field("", description="预告片地址")
+
+
+class MonthlyPreviews(BaseModel):
+    """月度新番预告"""
+    year: int
+    month: int
+    total: int = 0
+    videos: List[PreviewVideo] = []
+    generated_at: Optional[datetime] = None
+
+
 class VideoComment(BaseModel):
     """视频评论模型"""
     comment_id: Optional[str] = ""
@@ -100,6 +132,19 @@ class CommentReply(BaseModel):
     like_count: Optional[int] = 0
 
 
+class CommentThread(VideoComment):
+    """评论及其回复，replies 为 None 表示回复未加载"""
+    replies: Optional[List[CommentReply]] = None
+
+
+class CommentPage(BaseModel):
+    """评论分页结果"""
+    video_id: str
+    total: int = 0
+    next_cursor: Optional[str] = Field(None, description="下一页游标，为空表示没有更多评论")
+    comments: List[CommentThread] = []
+
+
 class SearchCombination(BaseModel):
     """搜索组合模型"""
     video_types: List[str] = Field(default_factory=list, description="视频类型选项")
@@ -107,6 +152,14 @@ class SearchCombination(BaseModel):
     sort: List[str] = Field(default_factory=list, description="排序方式选项")
 
 
+class SearchSuggestion(BaseModel):
+    """搜索联想建议模型"""
+    name: str
+    kind: str = Field(..., description="建议类型：tag（标签）、genre（视频类型）、studio（发行商）")
+    category: Optional[str] = Field("", description="标签所属分类")
+    popularity: int = Field(0, description="本地目录中的视频数量")
+
+
 class SearchResults(BaseModel):
     """搜索结果模型"""
     total_pages: int = 0
@@ -114,3 +167,32 @@ class SearchResults(BaseModel):
     basic_videos: List[VideoBase] = []
     detailed_videos: List[VideoPreview] = []
     has_next: bool = False
+
+
+class VideoDetailBatchRequest(BaseModel):
+    """批量获取视频详情请求模型"""
+    video_ids: List[str] = Field(..., min_length=1, max_length=100, description="视频ID列表")
+
+
+class VideoDetailBatchItem(BaseModel):
+    """批量获取视频详情的单条结果"""
+    video_id: str
+    cached: bool = False
+    detail: Optional[VideoDetail] = None
+    error: Optional[str] = None
+
+
+class CalendarDay(BaseModel):
+    """发行日历中的单日数据"""
+    date: str
+    videos: List[VideoPreview] = []
+
+
+class ReleaseCalendar(BaseModel):
+    """月度发行日历模型"""
+    year: int
+    month: int
+    total: int = 0
+    days: List[CalendarDay] = Field(default_factory=list, description="按日期升序排列的每日视频")
+    undated_videos: List[VideoPreview] = Field(default_factory=list, description="无法确定日期的视频")
+    generated_at: Optional[datetime] = None
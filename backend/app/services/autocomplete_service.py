@@ -0,0 +1,128 @@
+import asyncio
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+from app.models.video import SearchCombination, SearchSuggestion
+from app.config import logger
+from app.services.cache_service import cache_service
+from app.services.catalog_service import catalog_service
+from app.utils.chinese_converter import convert_batch
+
+
+class AutocompleteIndex:
+    """
+    前缀索引
+
+    所有名称的简体和繁体形式（小写）组成一个有序数组，前缀查询用 bisect 定位起点后顺序扫描。
+    构建完成后只读，替换时整体替换，无需加锁。
+    """
+
+    def __init__(self, suggestions: List[SearchSuggestion], variants: List[List[str]]):
+        """
+        Args:
+            suggestions: 所有候选建议
+            variants: 与 suggestions 一一对应，每个候选可被匹配的名称形式
+        """
+        self.suggestions = suggestions
+        keys = {
+            (self.normalize(variant), index)
+            for index, names in enumerate(variants)
+            for variant in names if variant
+        }
+        self.keys: List[Tuple[str, int]] = sorted(keys)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return text.strip().lower()
+
+    def search(self, prefix: str, limit: int, kind: Optional[str] = None) -> List[SearchSuggestion]:
+        """前缀查询，按热度降序、名称长度升序返回"""
+        prefix = self.normalize(prefix)
+        if not prefix:
+            return []
+        matched = set()
+        position = bisect_left(self.keys, (prefix, -1))
+        while position < len(self.keys) and self.keys[position][0].startswith(prefix):
+            matched.add(self.keys[position][1])
+            position += 1
+
+        results = [self.suggestions[index] for index in matched]
+        if kind:
+            results = [suggestion for suggestion in results if suggestion.kind == kind]
+        results.sort(key=lambda suggestion: (-suggestion.popularity, len(suggestion.name), suggestion.name))
+        return results[:limit]
+
+    def __len__(self):
+        return len(self.suggestions)
+
+
+class AutocompleteService:
+    """
+    搜索联想服务
+
+    基于搜索组合（视频类型、标签）和本地目录中的发行商构建前缀索引，热度取自本地目录。
+    搜索组合缓存（24小时）刷新后，下一次查询时在后台重建索引，重建完成前继续使用旧索引。
+    """
+
+    def __init__(self):
+        self.index: Optional[AutocompleteIndex] = None
+        self._source: Optional[SearchCombination] = None
+        self._rebuild_lock = asyncio.Lock()
+
+    async def suggest(self, prefix: str, limit: int = 10, kind: Optional[str] = None) -> List[SearchSuggestion]:
+        """获取前缀联想建议"""
+        index = await self._get_index()
+        return index.search(prefix, limit, kind) if index else []
+
+    async def _get_index(self) -> Optional[AutocompleteIndex]:
+        """返回当前索引，搜索组合已刷新时重建"""
+        combination = await cache_service.get_search_combination()
+        if combination is self._source and self.index is not None:
+            return self.index
+
+        if self._rebuild_lock.locked() and self.index is not None:
+            # 其他请求正在重建，先使用旧索引
+            return self.index
+
+        async with self._rebuild_lock:
+            if combination is not self._source or self.index is None:
+                self.index = await self._build_index(combination)
+                self._source = combination
+        return self.index
+
+    @staticmethod
+    async def _build_index(combination: SearchCombination) -> AutocompleteIndex:
+        """根据搜索组合和目录热度构建索引"""
+        popularity = await catalog_service.get_popularity()
+
+        candidates: Dict[Tuple[str, str], SearchSuggestion] = {}
+        for name in combination.video_types:
+            candidates[("genre", name)] = SearchSuggestion(name=name, kind="genre")
+        for category, tags in combination.tags.items():
+            for name in tags:
+                candidates[("tag", name)] = SearchSuggestion(name=name, kind="tag", category=category)
+        # 目录中出现过的标签也加入（搜索组合之外的标签没有分类）
+        for name in popularity["tag"]:
+            candidates.setdefault(("tag", name), SearchSuggestion(name=name, kind="tag"))
+        for name in popularity["studio"]:
+            candidates[("studio", name)] = SearchSuggestion(name=name, kind="studio")
+
+        suggestions = list(candidates.values())
+        for suggestion in suggestions:
+            suggestion.popularity = popularity.get(suggestion.kind, {}).get(suggestion.name, 0)
+
+        # 每个名称同时支持简体和繁体形式匹配
+        names = [suggestion.name for suggestion in suggestions]
+        simplified = convert_batch(names, to_simple=True)
+        traditional = convert_batch(names, to_simple=False)
+
+        index = AutocompleteIndex(
+            suggestions,
+            [[name, simplified[i], traditional[i]] for i, name in enumerate(names)]
+        )
+        logger.info(f"搜索联想索引已重建: {len(index)} 个候选")
+        return index
+
+
+# 全局单例
+autocomplete_service = AutocompleteService()
@@ -0,0 +1,217 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Collection
+
+from app.models.video import *
+from app.config import settings, logger
+from app.services.video_service import VideoService
+from app.utils.ttl_lru_cache import LRUCache
+from app.utils.chinese_converter import convert_dict
+from app.utils.locale import DEFAULT_LOCALE, DETAIL_FIELDS, HOME_FIELDS, NO_FIELDS, localize
+
+
+class CacheService:
+    """
+    视频数据共享缓存，接口和后台预取共用同一份详情/搜索缓存
+
+    缓存值为 {语言区域: 结果}，上游结果只在加载时转换一次简繁两个版本，读取时直接按语言区域取用。
+    """
+
+    def __init__(self):
+        self.video_service = VideoService()
+        self.home_cache = LRUCache(maxsize=1, ttl=1800)  # 只缓存1个首页数据，过期时间30分钟
+        self.detail_cache = LRUCache(maxsize=100, ttl=3600)  # 缓存100个视频详情，过期时间1小时
+        self.search_cache = LRUCache(maxsize=100, ttl=86400)  # 缓存100个搜索结果，过期时间24小时
+        self.combination_cache = LRUCache(maxsize=1, ttl=86400)  # 只缓存1个搜索组合，过期时间24小时
+
+    @staticmethod
+    def detail_key(video_id: str) -> str:
+        """视频详情缓存键"""
+        return f"detail:{video_id}"
+
+    @staticmethod
+    def search_key(query: Optional[str] = None,
+                   genre: Optional[str] = None,
+                   tags: Optional[List[str]] = None,
+                   broad: Optional[bool] = False,
+                   sort: Optional[str] = None,
+                   year: Optional[int] = None,
+                   month: Optional[int] = None,
+                   page: int = 1) -> str:
+        """搜索结果缓存键，参数统一转换为繁体，简繁体搜索共用同一份缓存"""
+        query, genre, tags, sort = convert_dict(
+            {"query": query, "genre": genre, "tags": tags, "sort": sort}, to_simple=False
+        ).values()
+        tags_part = "-".join(tags or [])
+        return f"search:{query or ''}:{genre or ''}:{tags_part}:{broad or False}:{sort or ''}:{year or ''}:{month or ''}:{page}"
+
+    def has_video_detail(self, video_id: str) -> bool:
+        """视频详情是否已在缓存中"""
+        return self.detail_cache.contains(self.detail_key(video_id))
+
+    def has_search_results(self, **params) -> bool:
+        """搜索结果是否已在缓存中"""
+        return self.search_cache.contains(self.search_key(**params))
+
+    @staticmethod
+    async def _load_localized(loader: Callable[[], Awaitable[Any]],
+                              fields: Optional[Collection[str]] = None) -> Dict[str, Any]:
+        """请求上游并转换出所有语言区域的版本，fields 为需要转换的字段"""
+        return localize(await loader(), fields)
+
+    def peek_video_detail(self, video_id: str, locale: str = DEFAULT_LOCALE) -> Optional[VideoDetail]:
+        """读取已缓存的视频详情，不触发加载"""
+        variants = self.detail_cache.peek(self.detail_key(video_id))
+        return variants[locale] if variants else None
+
+    async def get_home_data(self, locale: str = DEFAULT_LOCALE) -> HomeData:
+        """获取首页数据，缓存30分钟"""
+        variants = await self.home_cache.get_or_load(
+            "home",
+            lambda: self._load_localized(self.video_service.get_home_data, HOME_FIELDS)
+        )
+        return variants[locale]
+
+    async def get_video_detail(self, video_id: str, locale: str = DEFAULT_LOCALE) -> VideoDetail:
+        """获取视频详情，优先读取缓存，并发的相同未命中只请求一次上游"""
+        variants = await self.detail_cache.get_or_load(
+            self.detail_key(video_id),
+            lambda: self._load_localized(lambda: self.video_service.get_video_detail(video_id), DETAIL_FIELDS),
+            # 解析失败的详情不缓存，避免预取失败污染缓存
+            cacheable=lambda variants: bool(variants[DEFAULT_LOCALE].title)
+        )
+        return variants[locale]
+
+    async def search_videos(self, refresh: bool = False, locale: str = DEFAULT_LOCALE, **params) -> SearchResults:
+        """
+        搜索视频，优先读取缓存；参数简繁体均可，统一转换为繁体请求上游
+
+        Args:
+            refresh: 为True时跳过缓存读取，强制请求上游并更新缓存
+            locale: 返回结果的语言区域
+            params: 搜索参数
+        """
+        params = convert_dict(params, to_simple=False)
+        cache_method = self.search_cache.load if refresh else self.search_cache.get_or_load
+        variants = await cache_method(
+            self.search_key(**params),
+            lambda: self._load_localized(lambda: self.video_service.search_videos(**params), NO_FIELDS),
+            # 请求失败或没有结果的空页不缓存，避免一次上游失败被缓存24小时
+            cacheable=lambda variants: bool(variants[DEFAULT_LOCALE].detailed_videos or variants[DEFAULT_LOCALE].basic_videos)
+        )
+        return variants[locale]
+
+    async def get_search_combination(self, locale: str = DEFAULT_LOCALE) -> SearchCombination:
+        """获取搜索组合（类型、标签、排序方式），缓存24小时"""
+        variants = await self.combination_cache.get_or_load(
+            "search_combination",
+            lambda: self._load_localized(self.video_service.get_search_combination),
+            # 获取失败的空结果不缓存
+            cacheable=lambda variants: bool(variants[DEFAULT_LOCALE].video_types or variants[DEFAULT_LOCALE].tags)
+        )
+        return variants[locale]
+
+    async def iter_video_details(self, video_ids: List[str],
+                                 concurrency: Optional[int] = None,
+                                 locale: str = DEFAULT_LOCALE) -> AsyncIterator[VideoDetailBatchItem]:
+        """
+        批量获取视频详情，按完成顺序逐个产出
+
+        缓存命中的视频立即产出，未命中的视频以有限并发请求上游。
+        """
+        concurrency = concurrency or settings.BATCH_DETAIL_CONCURRENCY
+        # 去重并保持顺序
+        video_ids = list(dict.fromkeys(video_ids))
+
+        missing_ids = []
+        for video_id in video_ids:
+            cached = self.detail_cache.get(self.detail_key(video_id))
+            if cached is not None:
+                yield VideoDetailBatchItem(video_id=video_id, cached=True, detail=cached[locale])
+            else:
+                missing_ids.append(video_id)
+
+        if not missing_ids:
+            return
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(video_id: str) -> VideoDetailBatchItem:
+            async with semaphore:
+                try:
+                    video = await self.get_video_detail(video_id, locale)
+                    if not video or not video.title:
+                        return VideoDetailBatchItem(video_id=video_id, error="视频不存在或获取失败")
+                    return VideoDetailBatchItem(video_id=video_id, detail=video)
+                except Exception as e:
+                    logger.error(f"批量获取视频详情失败: video_id={video_id}, {str(e)}")
+                    return VideoDetailBatchItem(video_id=video_id, error=str(e))
+
+        tasks = [asyncio.create_task(fetch(video_id)) for video_id in missing_ids]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # 客户端提前断开时取消剩余任务
+            for task in tasks:
+                task.cancel()
+
+    async def iter_search_pages(self, params: Dict[str, Any], page_start: int = 1,
+                                page_end: Optional[int] = None,
+                                concurrency: Optional[int] = None,
+                                refresh: bool = False,
+                                locale: str = DEFAULT_LOCALE) -> AsyncIterator[SearchResults]:
+        """
+        获取多页搜索结果，按完成顺序逐页产出
+
+        先请求第一页获得总页数，其余页以有限并发同时请求。
+        产出的每页 detailed_videos 已按 video_id 去重（跨页只保留首次出现）。
+
+        Args:
+            params: 搜索参数（不含page）
+            page_start: 起始页码
+            page_end: 结束页码（包含），默认到最后一页
+            concurrency: 并发请求数
+            refresh: 为True时跳过缓存读取，强制请求上游
+            locale: 返回结果的语言区域
+        """
+        concurrency = concurrency or settings.BATCH_SEARCH_CONCURRENCY
+        seen_ids = set()
+
+        def dedupe(results: SearchResults) -> SearchResults:
+            videos = []
+            for video in results.detailed_videos:
+                if video.video_id not in seen_ids:
+                    seen_ids.add(video.video_id)
+                    videos.append(video)
+            return results.model_copy(update={"detailed_videos": videos})
+
+        first_page = await self.search_videos(refresh=refresh, locale=locale, **dict(params, page=page_start))
+        yield dedupe(first_page)
+
+        last_page = first_page.total_pages
+        if page_end is not None:
+            last_page = min(last_page, page_end)
+        if last_page <= page_start:
+            return
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(page: int) -> SearchResults:
+            async with semaphore:
+                try:
+                    return await self.search_videos(refresh=refresh, locale=locale, **dict(params, page=page))
+                except Exception as e:
+                    logger.error(f"获取搜索结果失败: page={page}, {str(e)}")
+                    return SearchResults(page=page)
+
+        tasks = [asyncio.create_task(fetch(page)) for page in range(page_start + 1, last_page + 1)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield dedupe(await next_done)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+# 全局单例，所有接口和后台任务共享同一份缓存
+cache_service = CacheService()
@@ -0,0 +1,144 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from app.models.video import ReleaseCalendar, CalendarDay, VideoPreview
+from app.config import settings, logger
+from app.services.cache_service import cache_service
+from app.utils.ttl_lru_cache import LRUCache
+from app.utils.periodic_task import PeriodicTask
+from app.utils.locale import DEFAULT_LOCALE, NO_FIELDS, localize
+
+
+class CalendarService:
+    """
+    月度发行日历服务
+
+    基于搜索接口的 year/month 过滤并发获取整月所有页，按日期分组。
+    过去月份的数据基本不再变化，缓存较长时间；当月数据缓存较短时间，
+    并由后台任务定期预热当月和上个月。
+    """
+
+    # 按发行时间排序
+    SORT_BY_RELEASE = "最新上市"
+
+    def __init__(self):
+        self.calendar_cache = LRUCache(maxsize=24, ttl=settings.CALENDAR_CURRENT_TTL)
+        self.warm_task = PeriodicTask(
+            "发行日历预热",
+            self.warm_recent_months,
+            interval=settings.CALENDAR_WARM_INTERVAL,
+            initial_delay=30
+        )
+
+    @staticmethod
+    def calendar_key(year: int, month: int, genre: Optional[str] = None) -> str:
+        """日历缓存键"""
+        return f"calendar:{year}:{month}:{genre or ''}"
+
+    @staticmethod
+    def is_past_month(year: int, month: int) -> bool:
+        """是否为已经结束的月份"""
+        now = datetime.now()
+        return (year, month) < (now.year, now.month)
+
+    def calendar_ttl(self, year: int, month: int) -> int:
+        """过去月份长TTL，当月（及未来月份）短TTL"""
+        return settings.CALENDAR_PAST_TTL if self.is_past_month(year, month) else settings.CALENDAR_CURRENT_TTL
+
+    async def get_release_calendar(self, year: int, month: int, genre: Optional[str] = None,
+                                   refresh: bool = False, locale: str = DEFAULT_LOCALE) -> ReleaseCalendar:
+        """
+        获取月度发行日历
+
+        Args:
+            year: 年份
+            month: 月份
+            genre: 视频类型过滤
+            refresh: 为True时跳过缓存，重新抓取整月数据
+            locale: 返回结果的语言区域
+        """
+        key = self.calendar_key(year, month, genre)
+        ttl = self.calendar_ttl(year, month)
+
+        async def loader():
+            return localize(await self._build_calendar(year, month, genre, refresh), NO_FIELDS)
+
+        if refresh:
+            variants = await self.calendar_cache.load(key, loader, ttl=ttl)
+        else:
+            variants = await self.calendar_cache.get_or_load(key, loader, ttl=ttl)
+        return variants[locale]
+
+    async def _build_calendar(self, year: int, month: int, genre: Optional[str],
+                              refresh: bool) -> ReleaseCalendar:
+        """并发抓取整月所有页并按日期分组"""
+        params = {
+            "query": None,
+            "genre": genre,
+            "tags": None,
+            "broad": False,
+            "sort": self.SORT_BY_RELEASE,
+            "year": year,
+            "month": month,
+        }
+        # 当月数据每次都要获取最新的分页，过去月份可以复用已缓存的分页
+        refresh_pages = refresh or not self.is_past_month(year, month)
+
+        videos: List[VideoPreview] = []
+        async for results in cache_service.iter_search_pages(
+                params, page_end=settings.BATCH_SEARCH_MAX_PAGES, refresh=refresh_pages):
+            videos.extend(results.detailed_videos)
+
+        days, undated = self._group_by_date(videos)
+        logger.info(f"生成发行日历: {year}-{month:02d}, 共 {len(videos)} 个视频, {len(days)} 天有发行, "
+                    f"{len(undated)} 个无法确定日期")
+        # 大部分视频都没有日期时，通常是卡片日期格式变化导致 _CARD_DATE_PATTERN 匹配失败
+        if videos and len(undated) * 2 > len(videos):
+            logger.warning(f"发行日历中无法确定日期的视频过多: {year}-{month:02d}, {len(undated)}/{len(videos)}，"
+                           f"请使用 scripts/check_card_dates.py 检查卡片日期解析")
+
+        return ReleaseCalendar(
+            year=year,
+            month=month,
+            total=len(videos),
+            days=[CalendarDay(date=date, videos=day_videos) for date, day_videos in sorted(days.items())],
+            undated_videos=undated,
+            generated_at=datetime.now()
+        )
+
+    @staticmethod
+    def _group_by_date(videos: List[VideoPreview]) -> Tuple[Dict[str, List[VideoPreview]], List[VideoPreview]]:
+        """按日期分组，卡片上没有日期时尝试使用已缓存的视频详情"""
+        days: Dict[str, List[VideoPreview]] = defaultdict(list)
+        undated: List[VideoPreview] = []
+        for video in videos:
+            date = video.release_date
+            if not date:
+                detail = cache_service.peek_video_detail(video.video_id)
+                upload_date = detail.upload_date if detail else None
+                if isinstance(upload_date, datetime):
+                    date = upload_date.strftime("%Y-%m-%d")
+                elif upload_date:
+                    date = str(upload_date)[:10]
+            if date:
+                days[date].append(video)
+            else:
+                undated.append(video)
+        return days, undated
+
+    async def warm_recent_months(self):
+        """预热当月和上个月的日历"""
+        now = datetime.now()
+        previous_year, previous_month = (now.year, now.month - 1) if now.month > 1 else (now.year - 1, 12)
+
+        # 当月数据变化快，每次都刷新
+        await self.get_release_calendar(now.year, now.month, refresh=True)
+
+        # 上个月只在缓存失效时重新生成
+        if not self.calendar_cache.contains(self.calendar_key(previous_year, previous_month)):
+            await self.get_release_calendar(previous_year, previous_month)
+
+
+# 全局单例
+calendar_service = CalendarService()
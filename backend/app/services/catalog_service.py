@@ -0,0 +1,539 @@
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+import aiosqlite
+
+from app.models.video import VideoBase, VideoPreview, VideoDetail, VideoStudio, SearchResults
+from app.config import settings, logger
+from app.utils.periodic_task import PeriodicTask
+from app.utils.chinese_converter import to_simplified, convert_batch, convert_any
+from app.utils.locale import DETAIL_FIELDS
+
+
+class CatalogService:
+    """
+    本地视频目录
+
+    收集所有抓取到的视频卡片和详情，定期在后台批量写入 SQLite，
+    让列表标题、封面等预览级信息不必再请求上游。
+    同时维护一个 FTS5 全文索引（标题、副标题、简介、标签、发行商），用于离线搜索。
+    """
+
+    # 全文索引的列及其在 bm25 排序中的权重
+    SEARCH_COLUMNS = ("title", "subtitle", "description", "tags", "studio")
+    SEARCH_WEIGHTS = (10.0, 5.0, 1.0, 3.0, 3.0)
+    # trigram 分词器要求 MATCH 的词至少3个字符，更短的词使用 LIKE
+    MIN_MATCH_LENGTH = 3
+
+    def __init__(self):
+        self.db_path = settings.DB_PATH / "catalog.db"
+        self.downloads_db_path = settings.DB_PATH / "downloads.db"
+        self.initialized = False
+        self.fts_enabled = False
+        # 共用的数据库长连接，在 init_db 中打开
+        self.db: Optional[aiosqlite.Connection] = None
+
+        # 待写入的数据，同一视频只保留最新一次
+        self.pending_previews: Dict[str, VideoBase] = {}
+        self.pending_details: Dict[str, VideoDetail] = {}
+        self._flush_lock = asyncio.Lock()
+
+        self.flush_task = PeriodicTask("视频目录写入", self.flush, interval=settings.CATALOG_FLUSH_INTERVAL)
+
+    async def init_db(self):
+        """初始化目录数据库，打开共用的长连接"""
+        if self.db is None:
+            self.db = await aiosqlite.connect(self.db_path, cached_statements=256)
+            self.db.row_factory = aiosqlite.Row
+            # WAL 模式下后台写入不阻塞查询
+            await self.db.execute("PRAGMA journal_mode=WAL")
+            await self.db.execute("PRAGMA synchronous=NORMAL")
+            await self.db.execute("PRAGMA busy_timeout=5000")
+            # 附加下载数据库，用于只搜索已下载的视频（ATTACH 不能在事务中执行，连接打开时执行一次）
+            await self.db.execute("ATTACH DATABASE ? AS downloads_db", (str(self.downloads_db_path),))
+        await self.db.executescript("""
+        CREATE TABLE IF NOT EXISTS studios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            icon_url TEXT,
+            query TEXT,
+            last_seen TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS video_types (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            query TEXT
+        );
+        CREATE TABLE IF NOT EXISTS tags (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            query TEXT
+        );
+        CREATE TABLE IF NOT EXISTS videos (
+            video_id TEXT PRIMARY KEY,
+            title TEXT,
+            cover_url TEXT,
+            duration TEXT,
+            view_count INTEGER DEFAULT 0,
+            like_rate TEXT,
+            like_count INTEGER DEFAULT 0,
+            release_date TEXT,
+            subtitle TEXT,
+            description TEXT,
+            upload_date TEXT,
+            studio_id INTEGER REFERENCES studios(id),
+            type_id INTEGER REFERENCES video_types(id),
+            has_detail INTEGER DEFAULT 0,
+            first_seen TIMESTAMP,
+            last_seen TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS video_tags (
+            video_id TEXT NOT NULL,
+            tag_id INTEGER NOT NULL REFERENCES tags(id),
+            PRIMARY KEY (video_id, tag_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_videos_studio ON videos(studio_id);
+        CREATE INDEX IF NOT EXISTS idx_video_tags_tag ON video_tags(tag_id);
+        """)
+        await self.db.commit()
+        await self._init_search_index(self.db)
+        self.initialized = True
+        await self.import_downloads()
+
+    async def _init_search_index(self, conn):
+        """创建全文索引表，索引为空而目录已有数据时整体重建"""
+        try:
+            # 索引行的 rowid 与 videos 表的 rowid 一致
+            await conn.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS video_search USING fts5(
+                {", ".join(self.SEARCH_COLUMNS)}, tokenize='trigram'
+            )
+            """)
+            await conn.commit()
+        except aiosqlite.OperationalError as e:
+            # SQLite 版本过低（< 3.34）不支持 trigram 分词器，退化为 LIKE 搜索
+            logger.warning(f"全文索引不可用，离线搜索将使用LIKE匹配: {str(e)}")
+            return
+        self.fts_enabled = True
+
+        async with conn.execute("SELECT (SELECT count(*) FROM videos), (SELECT count(*) FROM video_search)") as cursor:
+            video_count, indexed_count = await cursor.fetchone()
+        if video_count and not indexed_count:
+            async with conn.execute("SELECT video_id FROM videos") as cursor:
+                video_ids = [row[0] for row in await cursor.fetchall()]
+            await self._index_videos(conn, video_ids)
+            await conn.commit()
+            logger.info(f"全文索引重建完成: {len(video_ids)} 个视频")
+
+    async def import_downloads(self):
+        """将下载列表中的视频导入目录，使下载库可以离线搜索"""
+        if not self.downloads_db_path.exists():
+            return
+        try:
+            async with aiosqlite.connect(self.downloads_db_path) as db:
+                async with db.execute("SELECT video_id, title, cover_url FROM downloads") as cursor:
+                    rows = await cursor.fetchall()
+        except aiosqlite.OperationalError:
+            # 下载表尚未创建
+            return
+        self.record_videos([
+            VideoBase(video_id=video_id, title=title or "", cover_url=cover_url or "")
+            for video_id, title, cover_url in rows
+        ])
+
+    def record_videos(self, videos: List[Optional[VideoBase]]):
+        """记录抓取到的视频卡片（不阻塞，后台批量写入）"""
+        for video in videos:
+            if not video or not video.video_id:
+                continue
+            existing = self.pending_previews.get(video.video_id)
+            # 同一视频多次出现时，在信息更完整的卡片上补充新的非空字段
+            if existing is not None and (isinstance(existing, VideoPreview) or not isinstance(video, VideoPreview)):
+                video = existing.model_copy(update=self._non_empty_fields(video, existing))
+            self.pending_previews[video.video_id] = video
+
+    @staticmethod
+    def _non_empty_fields(source: VideoBase, target: VideoBase) -> Dict:
+        """取出source中target也有的非空字段"""
+        return {
+            name: value for name, value in source
+            if name in target.model_fields and value not in (None, "", 0)
+        }
+
+    def record_detail(self, video: VideoDetail):
+        """记录抓取到的视频详情，连同其中的系列和相关视频"""
+        if not video or not video.title:
+            return
+        self.pending_details[video.video_id] = video
+        self.record_videos(video.series_videos or [])
+        self.record_videos(video.detailed_related_videos)
+        self.record_videos(video.basic_related_videos)
+
+    async def flush(self):
+        """将待写入的数据批量写入数据库"""
+        if not self.initialized or not (self.pending_previews or self.pending_details):
+            return
+
+        async with self._flush_lock:
+            previews, self.pending_previews = self.pending_previews, {}
+            pending_details, self.pending_details = self.pending_details, {}
+            # 详情中已包含预览信息，无需重复写入
+            for video_id in pending_details:
+                previews.pop(video_id, None)
+            # 抓取结果为上游原文，类型、标签等以简体存储，标题保持原文（全文索引另行转换）
+            details = dict(zip(pending_details, convert_any(list(pending_details.values()), fields=DETAIL_FIELDS)))
+
+            now = datetime.now()
+            db = self.db
+            try:
+                await self._upsert_studios(db, list(previews.values()) + list(details.values()), now)
+                await self._upsert_previews(db, list(previews.values()), now)
+                await self._upsert_details(db, list(details.values()), now)
+                await self._index_videos(db, list(previews) + list(details))
+                await db.commit()
+                logger.debug(f"视频目录写入完成: 预览 {len(previews)} 条, 详情 {len(details)} 条")
+            except Exception as e:
+                logger.error(f"视频目录写入失败: {str(e)}")
+                await db.rollback()
+                # 放回待写入数据等待下次写入，期间记录的新数据优先
+                for video_id, video in previews.items():
+                    self.pending_previews.setdefault(video_id, video)
+                for video_id, video in pending_details.items():
+                    self.pending_details.setdefault(video_id, video)
+
+    async def close_db(self):
+        """写入剩余的数据并关闭数据库连接"""
+        await self.flush_task.stop()
+        if self.db is not None:
+            await self.flush()
+            await self.db.close()
+            self.db = None
+            self.initialized = False
+
+    async def _upsert_studios(self, db, videos: List[VideoBase], now: datetime):
+        """批量写入发行商"""
+        studios: Dict[str, VideoStudio] = {}
+        for video in videos:
+            studio = getattr(video, "studio", None)
+            if studio and studio.name:
+                studios[studio.name] = studio
+        if not studios:
+            return
+        await db.executemany(
+            """
+            INSERT INTO studios (name, icon_url, query, last_seen) VALUES (?, ?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET
+                icon_url = COALESCE(NULLIF(excluded.icon_url, ''), studios.icon_url),
+                query = COALESCE(NULLIF(excluded.query, ''), studios.query),
+                last_seen = excluded.last_seen
+            """,
+            [(studio.name, studio.icon_url or "", studio.query or "", now) for studio in studios.values()]
+        )
+
+    async def _upsert_previews(self, db, videos: List[VideoBase], now: datetime):
+        """批量写入视频卡片，空字段不覆盖已有数据"""
+        if not videos:
+            return
+        rows = []
+        for video in videos:
+            studio = getattr(video, "studio", None)
+            rows.append((
+                video.video_id,
+                video.title or "",
+                video.cover_url or "",
+                getattr(video, "duration", "") or "",
+                getattr(video, "view_count", 0) or 0,
+                getattr(video, "like_rate", "") or "",
+                getattr(video, "like_count", 0) or 0,
+                getattr(video, "release_date", "") or "",
+                studio.name if studio else None,
+                now,
+                now,
+            ))
+        await db.executemany(
+            """
+            INSERT INTO videos (video_id, title, cover_url, duration, view_count, like_rate, like_count,
+                                release_date, studio_id, first_seen, last_seen)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, (SELECT id FROM studios WHERE name = ?), ?, ?)
+            ON CONFLICT(video_id) DO UPDATE SET
+                title = COALESCE(NULLIF(excluded.title, ''), videos.title),
+                cover_url = COALESCE(NULLIF(excluded.cover_url, ''), videos.cover_url),
+                duration = COALESCE(NULLIF(excluded.duration, ''), videos.duration),
+                view_count = MAX(excluded.view_count, COALESCE(videos.view_count, 0)),
+                like_rate = COALESCE(NULLIF(excluded.like_rate, ''), videos.like_rate),
+                like_count = MAX(excluded.like_count, COALESCE(videos.like_count, 0)),
+                release_date = COALESCE(NULLIF(excluded.release_date, ''), videos.release_date),
+                studio_id = COALESCE(excluded.studio_id, videos.studio_id),
+                last_seen = excluded.last_seen
+            """,
+            rows
+        )
+
+    async def _upsert_details(self, db, videos: List[VideoDetail], now: datetime):
+        """批量写入视频详情，包括类型和标签"""
+        if not videos:
+            return
+
+        video_types = {video.video_type.name: video.video_type for video in videos
+                       if video.video_type and video.video_type.name}
+        if video_types:
+            await db.executemany(
+                """
+                INSERT INTO video_types (name, query) VALUES (?, ?)
+                ON CONFLICT(name) DO UPDATE SET query = COALESCE(NULLIF(excluded.query, ''), video_types.query)
+                """,
+                [(video_type.name, video_type.query or "") for video_type in video_types.values()]
+            )
+
+        tags = {tag.name: tag for video in videos for tag in video.tags if tag.name}
+        if tags:
+            await db.executemany(
+                """
+                INSERT INTO tags (name, query) VALUES (?, ?)
+                ON CONFLICT(name) DO UPDATE SET query = COALESCE(NULLIF(excluded.query, ''), tags.query)
+                """,
+                [(tag.name, tag.query or "") for tag in tags.values()]
+            )
+
+        await db.executemany(
+            """
+            INSERT INTO videos (video_id, title, cover_url, duration, view_count, like_rate, like_count,
+                                subtitle, description, upload_date, studio_id, type_id, has_detail,
+                                first_seen, last_seen)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?,
+                    (SELECT id FROM studios WHERE name = ?), (SELECT id FROM video_types WHERE name = ?), 1, ?, ?)
+            ON CONFLICT(video_id) DO UPDATE SET
+                title = COALESCE(NULLIF(excluded.title, ''), videos.title),
+                cover_url = COALESCE(NULLIF(excluded.cover_url, ''), videos.cover_url),
+                duration = COALESCE(NULLIF(excluded.duration, ''), videos.duration),
+                view_count = MAX(excluded.view_count, COALESCE(videos.view_count, 0)),
+                like_rate = COALESCE(NULLIF(excluded.like_rate, ''), videos.like_rate),
+                like_count = MAX(excluded.like_count, COALESCE(videos.like_count, 0)),
+                subtitle = excluded.subtitle,
+                description = excluded.description,
+                upload_date = COALESCE(excluded.upload_date, videos.upload_date),
+                studio_id = COALESCE(excluded.studio_id, videos.studio_id),
+                type_id = COALESCE(excluded.type_id, videos.type_id),
+                has_detail = 1,
+                last_seen = excluded.last_seen
+            """,
+            [(
+                video.video_id,
+                video.title or "",
+                video.cover_url or "",
+                video.duration or "",
+                video.view_count or 0,
+                video.like_rate or "",
+                video.like_count or 0,
+                video.subtitle or "",
+                video.description or "",
+                video.upload_date.strftime("%Y-%m-%d") if isinstance(video.upload_date, datetime) else None,
+                video.studio.name if video.studio else None,
+                video.video_type.name if video.video_type else None,
+                now,
+                now,
+            ) for video in videos]
+        )
+
+        # 标签关系整体替换
+        video_ids = [(video.video_id,) for video in videos]
+        await db.executemany("DELETE FROM video_tags WHERE video_id = ?", video_ids)
+        await db.executemany(
+            "INSERT OR IGNORE INTO video_tags (video_id, tag_id) SELECT ?, id FROM tags WHERE name = ?",
+            [(video.video_id, tag.name) for video in videos for tag in video.tags if tag.name]
+        )
+
+    async def _index_videos(self, db, video_ids: List[str]):
+        """重建指定视频的全文索引行，索引文本统一转换为简体"""
+        if not self.fts_enabled or not video_ids:
+            return
+        rows = []
+        for start in range(0, len(video_ids), 500):
+            chunk = video_ids[start:start + 500]
+            placeholders = ", ".join("?" for _ in chunk)
+            async with db.execute(
+                f"""
+                SELECT v.rowid, v.title, v.subtitle, v.description,
+                       (SELECT group_concat(t.name, ' ') FROM video_tags vt JOIN tags t ON t.id = vt.tag_id
+                        WHERE vt.video_id = v.video_id),
+                       s.name
+                FROM videos v LEFT JOIN studios s ON v.studio_id = s.id
+                WHERE v.video_id IN ({placeholders})
+                """,
+                chunk
+            ) as cursor:
+                rows.extend(await cursor.fetchall())
+        if not rows:
+            return
+
+        converted = convert_batch([value or "" for row in rows for value in row[1:]])
+
+        width = len(self.SEARCH_COLUMNS)
+        await db.executemany("DELETE FROM video_search WHERE rowid = ?", [(row[0],) for row in rows])
+        await db.executemany(
+            f"INSERT INTO video_search (rowid, {', '.join(self.SEARCH_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+            [(row[0], *converted[i * width:(i + 1) * width]) for i, row in enumerate(rows)]
+        )
+
+    async def search(self, query: str, genre: Optional[str] = None, tags: Optional[List[str]] = None,
+                     downloaded_only: bool = False, page: int = 1) -> SearchResults:
+        """
+        离线搜索本地目录
+
+        Args:
+            query: 搜索关键词，多个词以空格分隔，要求全部命中
+            genre: 视频类型过滤
+            tags: 标签过滤，要求全部命中
+            downloaded_only: 只搜索已加入下载列表的视频
+            page: 页码
+        """
+        if not self.initialized:
+            return SearchResults(page=page)
+
+        terms = to_simplified(query or "").split()
+        match_terms = [term for term in terms if len(term) >= self.MIN_MATCH_LENGTH] if self.fts_enabled else []
+        like_terms = [term for term in terms if term not in match_terms]
+
+        conditions, params = [], []
+        if self.fts_enabled:
+            source = "video_search f JOIN videos v ON v.rowid = f.rowid"
+            text_columns = [f"f.{column}" for column in self.SEARCH_COLUMNS]
+        else:
+            source = "videos v"
+            text_columns = ["v.title", "v.subtitle", "v.description", "s.name"]
+        if match_terms:
+            conditions.append("video_search MATCH ?")
+            params.append(" ".join('"' + term.replace('"', '""') + '"' for term in match_terms))
+        for term in like_terms:
+            pattern = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            conditions.append("(" + " OR ".join(f"{column} LIKE ? ESCAPE '\\'" for column in text_columns) + ")")
+            params.extend([pattern] * len(text_columns))
+        if genre:
+            conditions.append("v.type_id = (SELECT id FROM video_types WHERE name = ?)")
+            params.append(genre)
+        for tag in tags or []:
+            conditions.append(
+                "EXISTS (SELECT 1 FROM video_tags vt JOIN tags t ON t.id = vt.tag_id "
+                "WHERE vt.video_id = v.video_id AND t.name = ?)"
+            )
+            params.append(tag)
+        if downloaded_only:
+            conditions.append("v.video_id IN (SELECT video_id FROM downloads_db.downloads)")
+        if not conditions:
+            return SearchResults(page=page)
+
+        where = " AND ".join(conditions)
+        if match_terms:
+            order = f"bm25(video_search, {', '.join(str(weight) for weight in self.SEARCH_WEIGHTS)})"
+        else:
+            order = "v.view_count DESC"
+        page_size = settings.LOCAL_SEARCH_PAGE_SIZE
+
+        async with self.db.execute(
+            f"SELECT count(*) FROM {source} LEFT JOIN studios s ON v.studio_id = s.id WHERE {where}",
+            params
+        ) as cursor:
+            total = (await cursor.fetchone())[0]
+        async with self.db.execute(
+            f"""
+            SELECT v.*, s.name AS studio_name, s.icon_url AS studio_icon_url, s.query AS studio_query
+            FROM {source} LEFT JOIN studios s ON v.studio_id = s.id
+            WHERE {where}
+            ORDER BY {order}
+            LIMIT ? OFFSET ?
+            """,
+            [*params, page_size, (page - 1) * page_size]
+        ) as cursor:
+            rows = await cursor.fetchall()
+
+        total_pages = (total + page_size - 1) // page_size
+        return SearchResults(
+            total_pages=total_pages,
+            page=page,
+            detailed_videos=[self._row_to_preview(row) for row in rows],
+            has_next=page < total_pages
+        )
+
+    async def get_videos(self, video_ids: List[str]) -> Dict[str, VideoPreview]:
+        """批量查询视频预览信息，不请求上游"""
+        result: Dict[str, VideoPreview] = {}
+        missing_ids = []
+        for video_id in dict.fromkeys(video_ids):
+            pending = self.pending_details.get(video_id) or self.pending_previews.get(video_id)
+            if isinstance(pending, VideoPreview):
+                result[video_id] = VideoPreview(**pending.model_dump(include=set(VideoPreview.model_fields)))
+            else:
+                missing_ids.append(video_id)
+
+        if not missing_ids or not self.initialized:
+            return result
+
+        placeholders = ", ".join("?" for _ in missing_ids)
+        async with self.db.execute(
+            f"""
+            SELECT v.*, s.name AS studio_name, s.icon_url AS studio_icon_url, s.query AS studio_query
+            FROM videos v LEFT JOIN studios s ON v.studio_id = s.id
+            WHERE v.video_id IN ({placeholders})
+            """,
+            missing_ids
+        ) as cursor:
+            for row in await cursor.fetchall():
+                result[row["video_id"]] = self._row_to_preview(row)
+        return result
+
+    async def get_known_ids(self, video_ids: List[str], before: datetime) -> Set[str]:
+        """查询在指定时间之前就已进入目录的视频ID"""
+        if not video_ids or not self.initialized:
+            return set()
+        placeholders = ", ".join("?" for _ in video_ids)
+        async with self.db.execute(
+            f"SELECT video_id FROM videos WHERE video_id IN ({placeholders}) AND first_seen < ?",
+            [*video_ids, before]
+        ) as cursor:
+            return {row[0] for row in await cursor.fetchall()}
+
+    async def get_popularity(self) -> Dict[str, Dict[str, int]]:
+        """统计目录中各标签、类型、发行商的视频数量"""
+        queries = {
+            "tag": "SELECT t.name, count(*) FROM video_tags vt JOIN tags t ON t.id = vt.tag_id GROUP BY t.id",
+            "genre": "SELECT vt.name, count(*) FROM videos v JOIN video_types vt ON vt.id = v.type_id GROUP BY vt.id",
+            "studio": "SELECT s.name, count(*) FROM videos v JOIN studios s ON s.id = v.studio_id GROUP BY s.id",
+        }
+        result: Dict[str, Dict[str, int]] = {kind: {} for kind in queries}
+        if not self.initialized:
+            return result
+        for kind, query in queries.items():
+            async with self.db.execute(query) as cursor:
+                result[kind] = {name: count for name, count in await cursor.fetchall()}
+        return result
+
+    async def get_video(self, video_id: str) -> Optional[VideoPreview]:
+        """查询单个视频预览信息，不请求上游"""
+        return (await self.get_videos([video_id])).get(video_id)
+
+    @staticmethod
+    def _row_to_preview(row) -> VideoPreview:
+        """数据库行转换为预览模型"""
+        studio = None
+        if row["studio_name"]:
+            studio = VideoStudio(
+                name=row["studio_name"],
+                icon_url=row["studio_icon_url"] or "",
+                query=row["studio_query"] or ""
+            )
+        return VideoPreview(
+            video_id=row["video_id"],
+            title=row["title"] or "",
+            cover_url=row["cover_url"] or "",
+            duration=row["duration"] or "",
+            view_count=row["view_count"] or 0,
+            like_rate=row["like_rate"] or "",
+            like_count=row["like_count"] or 0,
+            studio=studio,
+            release_date=row["release_date"] or row["upload_date"] or ""
+        )
+
+
+# 全局单例
+catalog_service = CatalogService()
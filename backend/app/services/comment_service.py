@@ -0,0 +1,119 @@
+import asyncio
+from typing import List, Optional
+
+from app.models.video import VideoComment, CommentReply, CommentThread, CommentPage
+from app.config import settings, logger
+from app.services.video_service import VideoService
+from app.utils.ttl_lru_cache import LRUCache
+
+
+class CommentService:
+    """
+    评论服务
+
+    评论列表整体解析一次后缓存，按游标分页返回；可选地并发预取当前页前N个有回复的评论的回复，
+    回复与 /loadReplies 共用同一份缓存。
+    """
+
+    def __init__(self):
+        self.video_service = VideoService()
+        self.comments_cache = LRUCache(maxsize=100, ttl=3600)  # 缓存100个视频的评论，过期时间1小时
+        self.replies_cache = LRUCache(maxsize=500, ttl=3600)  # 缓存500个评论的回复，过期时间1小时
+
+    async def get_comments(self, video_id: str) -> List[VideoComment]:
+        """获取视频的全部评论"""
+        return await self.comments_cache.get_or_load(
+            f"comments:{video_id}",
+            lambda: self.video_service.get_video_comments(video_id),
+            # 空结果可能是获取失败，不缓存
+            cacheable=bool
+        )
+
+    async def get_replies(self, comment_id: str) -> List[CommentReply]:
+        """获取评论的全部回复"""
+        return await self.replies_cache.get_or_load(
+            f"replies:{comment_id}",
+            lambda: self.video_service.get_comment_replies(comment_id),
+            cacheable=bool
+        )
+
+    async def get_comment_page(self, video_id: str, cursor: Optional[str] = None, limit: Optional[int] = None,
+                               expand_replies: int = 0) -> CommentPage:
+        """
+        分页获取评论
+
+        Args:
+            video_id: 视频ID
+            cursor: 上一页返回的 next_cursor，为空时从第一条开始
+            limit: 每页数量
+            expand_replies: 并发预取当前页前N个有回复的评论的回复
+        """
+        limit = limit or settings.COMMENT_PAGE_SIZE
+
+        comments = await self.get_comments(video_id)
+        offset = self._resolve_cursor(comments, cursor)
+        end = offset + limit
+        threads = [CommentThread(**comment.model_dump()) for comment in comments[offset:end]]
+
+        expand_replies = min(expand_replies, settings.COMMENT_MAX_EXPAND_REPLIES)
+        if expand_replies > 0:
+            await self._expand_replies(threads, expand_replies)
+
+        return CommentPage(
+            video_id=video_id,
+            total=len(comments),
+            next_cursor=self._make_cursor(comments, end) if end < len(comments) else None,
+            comments=threads
+        )
+
+    @staticmethod
+    def _make_cursor(comments: List[VideoComment], end: int) -> str:
+        """游标格式为 "偏移量:上一页最后一条评论ID"，评论列表刷新后以评论ID重新定位"""
+        return f"{end}:{comments[end - 1].comment_id or ''}"
+
+    @staticmethod
+    def _resolve_cursor(comments: List[VideoComment], cursor: Optional[str]) -> int:
+        """
+        将游标解析为当前评论列表中的起始位置
+
+        缓存刷新后评论可能增删导致偏移量错位，此时按评论ID在新列表中重新定位；
+        找不到该评论时游标已失效，抛出 ValueError 由客户端从第一页重新加载
+        """
+        if not cursor:
+            return 0
+        offset_text, _, comment_id = cursor.partition(":")
+        try:
+            offset = max(int(offset_text), 0)
+        except ValueError:
+            raise ValueError(f"无效的游标: {cursor}")
+
+        # 没有评论ID时无法校验，按偏移量继续
+        if not comment_id:
+            return offset
+        if 0 < offset <= len(comments) and comments[offset - 1].comment_id == comment_id:
+            return offset
+        for index, comment in enumerate(comments):
+            if comment.comment_id == comment_id:
+                return index + 1
+        raise ValueError(f"游标已失效，请重新加载评论: {cursor}")
+
+    async def _expand_replies(self, threads: List[CommentThread], count: int):
+        """以有限并发加载前 count 个有回复的评论的回复"""
+        targets = [thread for thread in threads if thread.comment_id and thread.reply_count][:count]
+        if not targets:
+            return
+        semaphore = asyncio.Semaphore(settings.COMMENT_REPLY_CONCURRENCY)
+
+        async def load(thread: CommentThread):
+            async with semaphore:
+                try:
+                    thread.replies = await self.get_replies(thread.comment_id)
+                except Exception as e:
+                    # 单个回复加载失败不影响整页，replies 保持 None，客户端可单独加载
+                    logger.warning(f"加载评论回复失败: comment_id={thread.comment_id}, {str(e)}")
+
+        await asyncio.gather(*(load(thread) for thread in targets))
+
+
+# 全局单例
+comment_service = CommentService()
@@ -0,0 +1,183 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+from urllib.parse import urlparse
+
+import httpx
+
+from app.config import logger
+
+
+class HostState:
+    """单个下载主机的连接控制状态"""
+
+    def __init__(self, limit: float, throughput: float = 0.0):
+        self.limit = limit  # 允许的并发连接数
+        self.throughput = throughput  # 上一个统计窗口的总吞吐量（字节/秒）
+        self.in_use = 0
+        self.waiting = 0  # 等待名额的请求数
+        self.condition = asyncio.Condition()
+        # 当前统计窗口
+        self.window_start = time.monotonic()
+        self.window_bytes = 0
+        self.window_errors = 0
+        self.window_peak = 0  # 窗口内同时使用的最大连接数
+        self.increased = False  # 上一次调整是否为增加
+        self.last_decrease = 0.0
+        self.dirty = False
+
+    @property
+    def allowed(self) -> int:
+        return max(1, int(self.limit))
+
+
+class HostConnectionController:
+    """
+    按下载主机的自适应连接数控制（AIMD）
+
+    下载过程中按固定窗口统计每个主机的总吞吐量和错误：
+    - 出现 429/5xx 或连接中断时，连接数减半（乘性减），一个窗口内最多减一次；
+    - 连接数已用满且吞吐量比上一个窗口明显提升时，连接数加一（加性增）；
+    - 上一次增加连接后吞吐量反而下降时，撤销这次增加。
+
+    同一主机的所有下载共用连接数上限，学习到的连接数保存在数据库中，重启后继续使用。
+    """
+
+    WINDOW = 5.0  # 统计窗口（秒）
+    IMPROVEMENT = 1.05  # 吞吐量至少提升5%才继续增加连接
+    THROTTLE_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, initial_limit: int, max_limit: int):
+        self.initial_limit = max(1, initial_limit)
+        self.max_limit = max(self.initial_limit, max_limit)
+        self.hosts: Dict[str, HostState] = {}
+
+    @staticmethod
+    def host_of(url: str) -> str:
+        return urlparse(url).netloc
+
+    def _state(self, host: str) -> HostState:
+        state = self.hosts.get(host)
+        if state is None:
+            state = self.hosts[host] = HostState(self.initial_limit)
+        return state
+
+    def limit(self, url: str) -> int:
+        """主机当前允许的并发连接数"""
+        return self._state(self.host_of(url)).allowed
+
+    def has_spare(self, url: str) -> bool:
+        """主机是否还有空闲的连接名额（没有请求在等待），用于下载过程中增加连接"""
+        state = self._state(self.host_of(url))
+        return state.in_use + state.waiting < state.allowed
+
+    @asynccontextmanager
+    async def connection(self, url: str):
+        """占用主机的一个连接名额，超出上限时等待"""
+        state = self._state(self.host_of(url))
+        async with state.condition:
+            state.waiting += 1
+            try:
+                await state.condition.wait_for(lambda: state.in_use < state.allowed)
+            finally:
+                state.waiting -= 1
+            if state.in_use == 0:
+                # 空闲后重新开始统计，避免空闲时间拉低吞吐量
+                state.window_start = time.monotonic()
+                state.window_bytes = 0
+            state.in_use += 1
+            state.window_peak = max(state.window_peak, state.in_use)
+        try:
+            yield
+        finally:
+            async with state.condition:
+                state.in_use -= 1
+                state.condition.notify_all()
+
+    def record_bytes(self, url: str, amount: int):
+        """记录收到的数据量"""
+        host = self.host_of(url)
+        state = self._state(host)
+        state.window_bytes += amount
+        self._maybe_adjust(host, state)
+
+    def record_status(self, url: str, status_code: int):
+        """记录异常的响应状态码，限流和服务端错误视为拥塞信号"""
+        if status_code in self.THROTTLE_STATUS:
+            self._record_error(url)
+
+    def record_failure(self, url: str, error: Exception):
+        """记录请求失败，连接中断和超时（包括被包装过的）视为拥塞信号"""
+        while error is not None:
+            if isinstance(error, httpx.TransportError):
+                self._record_error(url)
+                return
+            error = error.__cause__ or error.__context__
+
+    def _record_error(self, url: str):
+        host = self.host_of(url)
+        state = self._state(host)
+        state.window_errors += 1
+        self._maybe_adjust(host, state)
+
+    def _maybe_adjust(self, host: str, state: HostState):
+        now = time.monotonic()
+        elapsed = now - state.window_start
+        if state.window_errors:
+            # 拥塞信号立即生效，不等窗口结束；同一波错误在一个窗口内只减一次
+            if now - state.last_decrease >= self.WINDOW:
+                state.limit = max(1.0, state.limit / 2)
+                state.last_decrease = now
+                logger.info(f"下载主机 {host} 出现限流或连接错误，连接数降为 {state.allowed}")
+            state.increased = False
+        elif elapsed >= self.WINDOW:
+            throughput = state.window_bytes / elapsed
+            if state.increased and throughput < state.throughput:
+                # 增加连接没有带来提升，撤销
+                state.limit = max(1.0, state.limit - 1)
+                state.increased = False
+            elif (state.window_peak >= state.allowed and state.allowed < self.max_limit
+                  and throughput >= state.throughput * self.IMPROVEMENT):
+                state.limit = min(self.max_limit, state.limit + 1)
+                state.increased = True
+            else:
+                state.increased = False
+            state.throughput = throughput
+        else:
+            return
+
+        state.window_start = now
+        state.window_bytes = 0
+        state.window_errors = 0
+        state.window_peak = state.in_use
+        state.dirty = True
+
+    def load(self, rows: List[Tuple[str, float, float]]):
+        """从数据库记录恢复各主机的连接数"""
+        for host, limit, throughput in rows:
+            self.hosts[host] = HostState(min(self.max_limit, max(1.0, limit)), throughput or 0.0)
+
+    def take_dirty(self) -> List[Tuple[str, float, float, datetime]]:
+        """取出有变化的主机状态，用于写入数据库"""
+        now = datetime.now()
+        rows = []
+        for host, state in self.hosts.items():
+            if state.dirty:
+                state.dirty = False
+                rows.append((host, state.limit, state.throughput, now))
+        return rows
+
+    def mark_dirty(self, hosts: Iterable[str]):
+        """写入数据库失败时重新标记，下次写入时取当时的最新状态"""
+        for host in hosts:
+            state = self.hosts.get(host)
+            if state is not None:
+                state.dirty = True
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {
+            host: {"connections": state.allowed, "in_use": state.in_use, "throughput": round(state.throughput, 2)}
+            for host, state in self.hosts.items()
+        }
@@ -0,0 +1,206 @@
+import asyncio
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+import aiosqlite
+
+from app.config import settings, logger
+from app.services.video_service import VideoService
+from app.services.catalog_service import catalog_service
+from app.utils.chinese_converter import convert_dict
+from app.utils.cloudflare_bypass import cf_bypasser
+from app.utils.periodic_task import PeriodicTask
+
+
+class CrawlerService:
+    """
+    后台目录爬虫
+
+    以严格限速、空闲优先的方式翻页抓取搜索列表，抓到的视频通过 VideoService
+    自动写入本地目录。每个任务的位置（查询条件、页码）保存在目录数据库中，重启后继续。
+
+    每轮执行两类任务：
+    - 增量任务：按上传时间倒序翻页，遇到整页都是本轮开始前已知的视频即停止；
+    - 回填任务：按月份从近到远逐月抓取历史发行列表，已完成的月份不再重复抓取。
+    """
+
+    INCREMENTAL_SORT = "最新上传"
+    BACKFILL_SORT = "最新上市"
+    INCREMENTAL_JOB = "incremental"
+    # 连续多少次获取到空列表后认为任务已结束
+    MAX_EMPTY_ATTEMPTS = 3
+
+    def __init__(self):
+        self.video_service = VideoService()
+        self.enabled = settings.CRAWLER_ENABLED
+        self.page_delay = settings.CRAWLER_PAGE_DELAY
+        self.pages_per_run = settings.CRAWLER_PAGES_PER_RUN
+        self.earliest_year = settings.CRAWLER_EARLIEST_YEAR
+        self.run_task = PeriodicTask(
+            "目录爬虫",
+            self.run,
+            interval=settings.CRAWLER_RUN_INTERVAL,
+            initial_delay=60
+        )
+        self.stats = {"pages": 0, "videos": 0, "failed": 0}
+
+    async def init_db(self):
+        """在目录数据库中创建检查点表"""
+        async with aiosqlite.connect(catalog_service.db_path) as conn:
+            await conn.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_checkpoints (
+                job TEXT PRIMARY KEY,
+                params TEXT,
+                page INTEGER DEFAULT 1,
+                finished INTEGER DEFAULT 0,
+                failures INTEGER DEFAULT 0,
+                updated_at TIMESTAMP
+            )
+            """)
+            await conn.commit()
+
+    def start(self):
+        """启动后台爬虫"""
+        if self.enabled:
+            self.run_task.start()
+
+    async def stop(self):
+        """停止后台爬虫"""
+        await self.run_task.stop()
+
+    async def get_checkpoint(self, job: str) -> Tuple[int, bool, int]:
+        """读取任务检查点，返回 (下一页页码, 是否已完成, 连续失败次数)"""
+        async with aiosqlite.connect(catalog_service.db_path) as db:
+            async with db.execute(
+                "SELECT page, finished, failures FROM crawl_checkpoints WHERE job = ?", (job,)
+            ) as cursor:
+                row = await cursor.fetchone()
+        if not row:
+            return 1, False, 0
+        return row[0], bool(row[1]), row[2] or 0
+
+    async def save_checkpoint(self, job: str, params: Dict[str, Any], page: int, finished: bool = False,
+                              failures: int = 0):
+        """保存任务检查点"""
+        async with aiosqlite.connect(catalog_service.db_path) as db:
+            await db.execute(
+                """
+                INSERT INTO crawl_checkpoints (job, params, page, finished, failures, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(job) DO UPDATE SET
+                    params = excluded.params,
+                    page = excluded.page,
+                    finished = excluded.finished,
+                    failures = excluded.failures,
+                    updated_at = excluded.updated_at
+                """,
+                (job, json.dumps(params, ensure_ascii=False), page, int(finished), failures, datetime.now())
+            )
+            await db.commit()
+
+    async def run(self):
+        """执行一轮抓取：先增量任务，剩余页数额度用于回填历史月份"""
+        run_start = datetime.now()
+        budget = self.pages_per_run
+
+        # 增量任务中断时从检查点继续
+        page, _, failures = await self.get_checkpoint(self.INCREMENTAL_JOB)
+        params = self._search_params(sort=self.INCREMENTAL_SORT)
+        used = await self._crawl(self.INCREMENTAL_JOB, params, budget, start_page=page, failures=failures,
+                                 stop_before=run_start)
+        budget -= used
+
+        for year, month in self._backfill_months():
+            if budget <= 0:
+                break
+            job = f"month:{year}-{month:02d}"
+            page, finished, failures = await self.get_checkpoint(job)
+            if finished:
+                continue
+            params = self._search_params(sort=self.BACKFILL_SORT, year=year, month=month)
+            budget -= await self._crawl(job, params, budget, start_page=page, failures=failures)
+
+        logger.info(f"目录爬虫本轮完成: 抓取 {self.pages_per_run - budget} 页, 累计 {self.stats}")
+
+    async def _crawl(self, job: str, params: Dict[str, Any], budget: int, start_page: int = 1,
+                     failures: int = 0, stop_before: Optional[datetime] = None) -> int:
+        """
+        翻页抓取一个任务，返回实际抓取的页数
+
+        Args:
+            job: 任务名称（检查点键）
+            params: 搜索参数（不含page）
+            budget: 本次最多抓取的页数
+            start_page: 起始页码
+            failures: 该任务此前连续失败的次数
+            stop_before: 设置时，遇到整页视频都在该时间之前已知则提前结束（增量任务）
+        """
+        page = start_page
+        used = 0
+        while used < budget:
+            await asyncio.sleep(self.page_delay)
+            await cf_bypasser.wait_until_idle(settings.PREFETCH_IDLE_DELAY)
+
+            results = await self.video_service.search_videos(**convert_dict(dict(params, page=page), to_simple=False))
+            used += 1
+            video_ids = [video.video_id for video in results.detailed_videos + results.basic_videos]
+
+            if not video_ids:
+                # 抓取失败和空列表无法区分：保留检查点下一轮重试，连续多次为空才认为任务已结束
+                failures += 1
+                self.stats["failed"] += 1
+                finished = failures >= self.MAX_EMPTY_ATTEMPTS
+                await self.save_checkpoint(job, params, 1 if finished else page,
+                                           finished=finished and stop_before is None,
+                                           failures=0 if finished else failures)
+                logger.warning(f"目录爬虫未获取到视频: {job} 第{page}页, 连续 {failures} 次")
+                return used
+
+            failures = 0
+            self.stats["pages"] += 1
+            self.stats["videos"] += len(video_ids)
+
+            reached_known = False
+            if stop_before and video_ids:
+                known_ids = await catalog_service.get_known_ids(video_ids, stop_before)
+                reached_known = len(known_ids) == len(video_ids)
+
+            if not results.has_next or reached_known:
+                # 增量任务完成后下一轮从第一页重新开始，回填任务标记为已完成
+                await self.save_checkpoint(job, params, 1, finished=stop_before is None)
+                logger.info(f"目录爬虫任务完成: {job}, 结束于第{page}页")
+                return used
+
+            page += 1
+            await self.save_checkpoint(job, params, page)
+        return used
+
+    def _backfill_months(self):
+        """从上个月开始向前遍历到最早年份的所有月份"""
+        now = datetime.now()
+        year, month = now.year, now.month
+        while year >= self.earliest_year:
+            month -= 1
+            if month == 0:
+                year, month = year - 1, 12
+            if year < self.earliest_year:
+                break
+            yield year, month
+
+    @staticmethod
+    def _search_params(sort: str, year: Optional[int] = None, month: Optional[int] = None) -> Dict[str, Any]:
+        """构造搜索参数"""
+        return {
+            "query": None,
+            "genre": None,
+            "tags": None,
+            "broad": False,
+            "sort": sort,
+            "year": year,
+            "month": month,
+        }
+
+
+# 全局单例
+crawler_service = CrawlerService()
@@ -0,0 +1,176 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from app.config import logger
+
+
+class QueuedDownload(BaseModel):
+    """排队中的下载"""
+    video_id: str
+    priority: int = 0
+    resume: bool = False
+    # 事件循环时间，早于该时间不启动（用于启动时错开恢复）
+    not_before: float = 0.0
+
+
+class DownloadScheduler:
+    """
+    全局下载调度器
+
+    同时进行的下载数量不超过 max_active，其余下载按优先级（数值越小越优先）排队，
+    同优先级先进先出，队列中的顺序可以手动调整。一个下载结束（完成、失败或取消）后启动队首的下一个。
+    """
+
+    def __init__(self, runner: Callable[[str, bool], Awaitable[None]], max_active: int,
+                 on_queue_changed: Optional[Callable[[], Awaitable[None]]] = None):
+        """
+        Args:
+            runner: 执行一个下载的异步函数，参数为视频ID和是否断点续传
+            max_active: 最大同时下载数
+            on_queue_changed: 队列顺序变化后的回调，用于广播排队位置
+        """
+        self.runner = runner
+        self.max_active = max(1, max_active)
+        self.on_queue_changed = on_queue_changed
+        self.queue: List[QueuedDownload] = []
+        self.active: Dict[str, asyncio.Task] = {}
+
+    def is_active(self, video_id: str) -> bool:
+        return video_id in self.active
+
+    def is_queued(self, video_id: str) -> bool:
+        return any(item.video_id == video_id for item in self.queue)
+
+    def is_scheduled(self, video_id: str) -> bool:
+        """正在下载或排队中"""
+        return self.is_active(video_id) or self.is_queued(video_id)
+
+    def position(self, video_id: str) -> Optional[int]:
+        """排队位置（从1开始），不在队列中时返回None"""
+        for index, item in enumerate(self.queue):
+            if item.video_id == video_id:
+                return index + 1
+        return None
+
+    def enqueue(self, video_id: str, priority: int = 0, resume: bool = False, delay: float = 0.0) -> Optional[int]:
+        """
+        加入下载队列，已在队列或正在下载时忽略
+
+        Args:
+            video_id: 视频ID
+            priority: 优先级，数值越小越优先
+            resume: 是否断点续传
+            delay: 至少等待多少秒后才开始下载
+
+        Returns:
+            排队位置，直接开始下载时返回None
+        """
+        if self.is_scheduled(video_id):
+            return self.position(video_id)
+        item = QueuedDownload(
+            video_id=video_id,
+            priority=priority,
+            resume=resume,
+            not_before=asyncio.get_event_loop().time() + delay
+        )
+        self._insert(item)
+        self._pump()
+        return self.position(video_id)
+
+    def remove(self, video_id: str) -> bool:
+        """从队列中移除（不影响正在进行的下载）"""
+        for index, item in enumerate(self.queue):
+            if item.video_id == video_id:
+                del self.queue[index]
+                return True
+        return False
+
+    async def cancel(self, video_id: str) -> bool:
+        """结束正在进行的下载任务并释放名额（如暂停时），等待任务退出"""
+        task = self.active.get(video_id)
+        if task is None:
+            return False
+        task.cancel()
+        await asyncio.wait([task])
+        return True
+
+    def reorder(self, video_id: str, priority: Optional[int] = None, position: Optional[int] = None) -> bool:
+        """
+        调整排队中的下载
+
+        Args:
+            video_id: 视频ID
+            priority: 新的优先级，按优先级重新插入
+            position: 移动到指定位置（从1开始），优先于 priority
+        """
+        item = next((item for item in self.queue if item.video_id == video_id), None)
+        if item is None:
+            return False
+        self.queue.remove(item)
+        if priority is not None:
+            item.priority = priority
+        if position is not None:
+            index = min(max(position, 1), len(self.queue) + 1) - 1
+            # 手动调整位置后取相邻项的优先级，之后按优先级插入的下载不会打乱这个顺序
+            neighbour = self.queue[index] if index < len(self.queue) else (self.queue[-1] if self.queue else None)
+            if neighbour is not None:
+                item.priority = neighbour.priority
+            self.queue.insert(index, item)
+        else:
+            self._insert(item)
+        return True
+
+    def _insert(self, item: QueuedDownload):
+        """按优先级插入，同优先级排在已有项之后"""
+        index = len(self.queue)
+        while index > 0 and self.queue[index - 1].priority > item.priority:
+            index -= 1
+        self.queue.insert(index, item)
+
+    def _pump(self):
+        """有空闲名额时启动队首的下载"""
+        while self.queue and len(self.active) < self.max_active:
+            item = self.queue.pop(0)
+            self.active[item.video_id] = asyncio.create_task(self._run(item))
+        if self.on_queue_changed:
+            asyncio.create_task(self.on_queue_changed())
+
+    async def _run(self, item: QueuedDownload):
+        try:
+            delay = item.not_before - asyncio.get_event_loop().time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self.runner(item.video_id, item.resume)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"下载任务异常结束: {item.video_id}, {str(e)}")
+        finally:
+            self.active.pop(item.video_id, None)
+            self._pump()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "max_active": self.max_active,
+            "active": list(self.active),
+            "queued": [item.video_id for item in self.queue],
+        }
+
+    async def stop(self, timeout: float = 10.0):
+        """
+        取消所有正在进行的下载任务（进度已由下载管理器保存，重启后恢复）
+
+        Args:
+            timeout: 最多等待下载任务结束的秒数，超时后不再等待，避免阻塞服务关闭
+        """
+        tasks = list(self.active.values())
+        self.queue.clear()
+        if not tasks:
+            return
+        for task in tasks:
+            task.cancel()
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        if pending:
+            logger.warning(f"{len(pending)} 个下载任务在 {timeout} 秒内未能结束")
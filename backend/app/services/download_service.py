@@ -2,15 +2,22 @@ import asyncio
 import os
 import time
 import math
-import json
 from typing import Dict, Optional, List, Set, Any
-from fastapi import WebSocket
 from datetime import datetime
 import httpx
 import aiosqlite
 from app.models.download import DownloadStatus, DownloadSegment, DownloadProgress
 from app.services.video_service import VideoService
+from app.services.download_scheduler import DownloadScheduler
+from app.services.connection_controller import HostConnectionController
+from app.services.progress_broadcaster import ProgressBroadcaster
 from app.config import settings, logger
+from app.utils.locale import DEFAULT_LOCALE, DETAIL_FIELDS, to_locale
+from app.utils.periodic_task import PeriodicTask
+from app.utils.bandwidth_limiter import bandwidth_limiter
+from app.utils.file_writer import DownloadFileWriter
+from app.utils.buffer_pool import BufferPool
+from app.utils.checksum import verify_executor, combine_segments, format_checksum, file_crc32, find_corrupt_segments
 import aiofiles
 import aiofiles.os
 from urllib.parse import urlparse
@@ -21,19 +28,23 @@ class DownloadManager:
     
     def __init__(self):
         self.active_downloads: Dict[str, DownloadProgress] = {}
-        self.websocket_connections: Set[WebSocket] = set()
         self.pause_events: Dict[str, asyncio.Event] = {}
         self.cancel_events: Dict[str, bool] = {}
         self.video_service = VideoService()
+        self.bandwidth_limiter = bandwidth_limiter
+        # 正在下载的文件写入器，每个下载一个文件描述符
+        self.file_writers: Dict[str, DownloadFileWriter] = {}
+        # 全局调度器：限制同时进行的下载数量，其余排队
+        self.scheduler = DownloadScheduler(
+            self._run_download,
+            max_active=settings.MAX_ACTIVE_DOWNLOADS,
+            on_queue_changed=self.broadcast_queue
+        )
         
         # 配置参数
-        # chunk_size: 每次从HTTP连接读取的数据块大小，影响内存使用和请求频率
-        # 值越大，单次请求获取的数据越多，但占用内存也越多
-        self.chunk_size = 1024 * 1024 * 4  # 4MB，调小以提高响应速度
-        
-        # buffer_size: 写入文件前在内存中累积的数据量
-        # 较大的缓冲区可以减少磁盘I/O操作次数，提高性能
-        self.buffer_size = 1024 * 1024 * 8   # 8MB
+        # buffer_pool: 所有下载连接共用的缓冲池，数据在缓冲区中累积满后写入文件
+        # 缓冲区总内存受预算限制，用完时读取方等待，不再额外分配
+        self.buffer_pool = BufferPool(settings.DOWNLOAD_BUFFER_SIZE, settings.DOWNLOAD_MEMORY_LIMIT)
         
         # max_segments: 最大并发下载段数，影响并行度
         # 值越大并行度越高，但会增加系统和网络负载
@@ -43,6 +54,10 @@ class DownloadManager:
         # 用于计算文件应该分成多少段，防止段过小导致性能下降
         # 文件总大小必须大于min_segment_size*2才会使用分段下载
         self.min_segment_size = 1024 * 1024 * 64  # 20MB，调小以适应更多文件使用分段下载
+
+        # min_split_size: 空闲连接拆分其他段时，拆出的两部分各自的最小大小
+        # 剩余范围太小时拆分带来的新请求开销大于收益
+        self.min_split_size = 1024 * 1024 * 16  # 16MB
         
         # max_retries: 下载失败时的最大重试次数
         # 增加此值可以提高下载成功率，但可能导致长时间卡在失败的下载上
@@ -57,157 +72,344 @@ class DownloadManager:
         self.progress_update_interval = 0.2  # 减少间隔提高实时性
         
         # 自适应参数
-        self.bandwidth_samples = []  # 存储带宽样本用于自适应调整
-        self.segment_adjust_threshold = 5  # 需要多少个样本才考虑调整段数
+        # 按下载主机学习的并发连接数，同一主机的所有下载共用
+        self.connection_controller = HostConnectionController(
+            initial_limit=settings.DOWNLOAD_INITIAL_CONNECTIONS,
+            max_limit=settings.DOWNLOAD_MAX_CONNECTIONS_PER_HOST
+        )
         self.connection_pool_size = 20  # HTTP连接池大小
-        self.ws_batch_updates = True  # 启用WebSocket批量更新
-        self.ws_throttle_interval = 0.1  # WebSocket节流间隔(秒)
-        self.last_ws_update_time = {}  # 记录每个下载最后一次WS更新时间
+        # WebSocket进度广播：按周期合并所有下载的变化，每个客户端独立发送
+        self.broadcaster = ProgressBroadcaster(
+            lambda: self.active_downloads,
+            interval=settings.DOWNLOAD_WS_INTERVAL,
+            max_queue=settings.DOWNLOAD_WS_QUEUE_SIZE
+        )
         
         # 连接池
         self.http_clients = {}  # 存储基于域名的HTTP客户端连接池
         
         # 数据库路径
         self.db_path = settings.DB_PATH / "downloads.db"
+        # 整个进程共用的数据库长连接，在 init_db 中打开
+        self.db: Optional[aiosqlite.Connection] = None
+        # 按更新的列缓存SQL文本，相同文本可复用连接上已编译的语句
+        self._update_statements: Dict[tuple, str] = {}
+
+        # 进度写入日志：内存中只保留每个视频最新的待写入字段，按固定间隔批量写入；
+        # 状态变更时立即写入，避免每次进度更新都单独提交一次事务
+        self.pending_updates: Dict[str, Dict[str, Any]] = {}
+        # 待写入的分段表，写入时取各段当时的状态
+        self.pending_segments: Dict[str, List[DownloadSegment]] = {}
+        self._flush_lock = asyncio.Lock()
+        self.flush_task = PeriodicTask(
+            "下载进度写入",
+            self.flush_updates,
+            interval=settings.DOWNLOAD_PROGRESS_FLUSH_INTERVAL
+        )
 
     
     async def init_db(self):
-        """初始化数据库"""
-        async with aiosqlite.connect(self.db_path) as conn:
-            await conn.execute("""
-            CREATE TABLE IF NOT EXISTS downloads (
-                video_id TEXT PRIMARY KEY,
-                filename TEXT NOT NULL,
-                title TEXT,
-                cover_url TEXT,
-                url TEXT NOT NULL,
-                total_size INTEGER,
-                downloaded INTEGER DEFAULT 0,
-                status TEXT DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                completed_at TIMESTAMP,
-                error_message TEXT,
-                retry_count INTEGER DEFAULT 0,
-                max_retries INTEGER DEFAULT 3
-            )
-            """)
-            await conn.commit()
+        """初始化数据库，打开共用的长连接"""
+        if self.db is None:
+            # sqlite3 在连接上缓存预编译语句，长连接下重复执行的SQL无需重新编译
+            self.db = await aiosqlite.connect(self.db_path, cached_statements=256)
+            self.db.row_factory = aiosqlite.Row
+            # WAL 模式下读写互不阻塞；WAL 下 synchronous=NORMAL 只在检查点时同步磁盘，
+            # 断电时最多丢失最近的几次进度更新，不会损坏数据库
+            await self.db.execute("PRAGMA journal_mode=WAL")
+            await self.db.execute("PRAGMA synchronous=NORMAL")
+            await self.db.execute("PRAGMA busy_timeout=5000")
+
+        await self.db.execute("""
+        CREATE TABLE IF NOT EXISTS downloads (
+            video_id TEXT PRIMARY KEY,
+            filename TEXT NOT NULL,
+            title TEXT,
+            cover_url TEXT,
+            url TEXT NOT NULL,
+            total_size INTEGER,
+            downloaded INTEGER DEFAULT 0,
+            status TEXT DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            completed_at TIMESTAMP,
+            error_message TEXT,
+            retry_count INTEGER DEFAULT 0,
+            max_retries INTEGER DEFAULT 3,
+            checksum TEXT
+        )
+        """)
+        # 分段下载的分段表，重启后只需下载未完成的字节范围
+        await self.db.execute("""
+        CREATE TABLE IF NOT EXISTS download_segments (
+            video_id TEXT NOT NULL,
+            segment_index INTEGER NOT NULL,
+            range_start INTEGER NOT NULL,
+            range_end INTEGER NOT NULL,
+            downloaded INTEGER DEFAULT 0,
+            status TEXT DEFAULT 'pending',
+            checksum INTEGER,
+            PRIMARY KEY (video_id, segment_index)
+        )
+        """)
+        # 各下载主机学习到的并发连接数
+        await self.db.execute("""
+        CREATE TABLE IF NOT EXISTS host_connections (
+            host TEXT PRIMARY KEY,
+            connections REAL NOT NULL,
+            throughput REAL DEFAULT 0,
+            updated_at TIMESTAMP
+        )
+        """)
+        # 旧版本创建的表补上校验值列
+        await self._ensure_column("downloads", "checksum", "TEXT")
+        await self._ensure_column("download_segments", "checksum", "INTEGER")
+        await self.db.commit()
+        async with self.db.execute("SELECT host, connections, throughput FROM host_connections") as cursor:
+            self.connection_controller.load([tuple(row) for row in await cursor.fetchall()])
+        self.flush_task.start()
+
+    async def _ensure_column(self, table: str, column: str, definition: str):
+        """表中缺少指定列时添加"""
+        async with self.db.execute(f"PRAGMA table_info({table})") as cursor:
+            columns = [row['name'] for row in await cursor.fetchall()]
+        if column not in columns:
+            await self.db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    async def close_db(self):
+        """写入剩余的进度并关闭数据库连接"""
+        await self.flush_task.stop()
+        if self.db is not None:
+            await self.flush_updates()
+            await self.db.commit()
+            await self.db.close()
+            self.db = None
     
     async def get_download_history(self) -> List[Dict[str, Any]]:
         """获取下载历史"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute(
-                "SELECT * FROM downloads ORDER BY created_at DESC"
-            ) as cursor:
-                rows = await cursor.fetchall()
-                return [dict(row) for row in rows]
+        await self.flush_updates()
+        async with self.db.execute(
+            "SELECT * FROM downloads ORDER BY created_at DESC"
+        ) as cursor:
+            rows = await cursor.fetchall()
+            return [dict(row) for row in rows]
 
     async def load_downloads(self):
-        """从数据库加载下载历史"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute(
-                "SELECT * FROM downloads WHERE status IN ('downloading', 'paused') ORDER BY created_at DESC"
-            ) as cursor:
-                rows = await cursor.fetchall()
-                for row in rows:
-                    video_id = row['video_id']
-                    # 安全地获取列值，处理可能不存在的列
-                    retry_count = 0
-                    if 'retry_count' in row.keys():
-                        retry_count = row['retry_count']
-                    
-                    max_retries = 3
-                    if 'max_retries' in row.keys():
-                        max_retries = row['max_retries']
-                    
-                    self.active_downloads[video_id] = DownloadProgress(
-                        video_id=video_id,
-                        filename=row['filename'],
-                        title=row['title'],
-                        cover_url=row['cover_url'],
-                        total_size=row['total_size'] or 0,
-                        downloaded=row['downloaded'] or 0,
-                        status=row['status'],
-                        speed=0.0,
-                        error_message=row['error_message'],
-                        url=row['url'],
-                        created_at=row['created_at'],
-                        completed_at=row['completed_at'],
-                        retry_count=retry_count,
-                        max_retries=max_retries
-                    )
-                    # 恢复暂停状态
-                    if row['status'] == DownloadStatus.PAUSED:
-                        self.pause_events[video_id] = asyncio.Event()
-                        self.pause_events[video_id].clear()
-                    elif row['status'] == DownloadStatus.DOWNLOADING:
-                        self.pause_events[video_id] = asyncio.Event()
-                        self.pause_events[video_id].set()
-                        # 重新启动下载
-                        output_path = settings.DOWNLOAD_PATH / row['filename']
-                        asyncio.create_task(
-                            self.download_file(
-                                video_id,
-                                row['url'],
-                                output_path,
-                                resume=True
-                            )
-                        )
+        """从数据库加载下载历史，未完成的下载重新排队，启动时错开恢复"""
+        async with self.db.execute(
+            "SELECT * FROM downloads WHERE status IN ('downloading', 'pending', 'queued', 'paused') "
+            "ORDER BY status = 'downloading' DESC, created_at ASC"
+        ) as cursor:
+            rows = await cursor.fetchall()
 
-    async def broadcast_progress(self, video_id: str):
-        """向所有连接的客户端广播下载进度，使用节流控制更新频率"""
-        if video_id not in self.active_downloads:
+        resume_index = 0
+        for row in rows:
+            video_id = row['video_id']
+            # 安全地获取列值，处理可能不存在的列
+            retry_count = 0
+            if 'retry_count' in row.keys():
+                retry_count = row['retry_count']
+                
+            max_retries = 3
+            if 'max_retries' in row.keys():
+                max_retries = row['max_retries']
+                
+            self.active_downloads[video_id] = DownloadProgress(
+                video_id=video_id,
+                filename=row['filename'],
+                title=row['title'],
+                cover_url=row['cover_url'],
+                total_size=row['total_size'] or 0,
+                downloaded=row['downloaded'] or 0,
+                status=row['status'],
+                speed=0.0,
+                error_message=row['error_message'],
+                url=row['url'],
+                created_at=row['created_at'],
+                completed_at=row['completed_at'],
+                retry_count=retry_count,
+                max_retries=max_retries,
+                segments=await self.load_segments(video_id)
+            )
+            # 恢复暂停状态
+            if row['status'] == DownloadStatus.PAUSED:
+                self.pause_events[video_id] = asyncio.Event()
+                self.pause_events[video_id].clear()
+            else:
+                # 重新排队，前 max_active 个下载依次间隔启动，避免同时发起大量连接
+                await self.queue_download(
+                    video_id,
+                    resume=True,
+                    delay=min(resume_index, self.scheduler.max_active) * settings.DOWNLOAD_RESUME_STAGGER
+                )
+                resume_index += 1
+
+    async def load_segments(self, video_id: str) -> Optional[List[DownloadSegment]]:
+        """读取保存的分段表，未完成的段重置为待下载"""
+        async with self.db.execute(
+            "SELECT range_start, range_end, downloaded, status, checksum FROM download_segments "
+            "WHERE video_id = ? ORDER BY segment_index",
+            (video_id,)
+        ) as cursor:
+            rows = await cursor.fetchall()
+        if not rows:
+            return None
+        return [
+            DownloadSegment(
+                start=row['range_start'],
+                end=row['range_end'],
+                downloaded=row['downloaded'] or 0,
+                status=DownloadStatus.COMPLETED if row['status'] == DownloadStatus.COMPLETED else DownloadStatus.PENDING,
+                checksum=row['checksum']
+            )
+            for row in rows
+        ]
+
+    def update_segments(self, video_id: str, segments: List[DownloadSegment]):
+        """将分段表加入进度写入日志"""
+        self.pending_segments[video_id] = segments
+
+    async def queue_download(self, video_id: str, priority: int = 0, resume: bool = False, delay: float = 0.0):
+        """将下载加入调度队列，有空闲名额时立即开始"""
+        download = self.active_downloads[video_id]
+        download.status = DownloadStatus.QUEUED
+        download.speed = 0.0
+        await self.update_db(video_id, status=DownloadStatus.QUEUED)
+        self.scheduler.enqueue(video_id, priority=priority, resume=resume, delay=delay)
+
+    async def _run_download(self, video_id: str, resume: bool):
+        """调度器启动下载时调用"""
+        download = self.active_downloads.get(video_id)
+        if download is None or download.status != DownloadStatus.QUEUED:
+            # 排队期间已被删除、取消或暂停
             return
-            
-        # 检查是否需要更新（节流控制）
-        current_time = asyncio.get_event_loop().time()
-        last_update = self.last_ws_update_time.get(video_id, 0)
-        if current_time - last_update < self.ws_throttle_interval and self.active_downloads[video_id].status == DownloadStatus.DOWNLOADING:
-            # 如果间隔太小且不是关键状态变更，则跳过此次更新
+        download.status = DownloadStatus.DOWNLOADING
+        download.queue_position = None
+        await self.update_db(video_id, status=DownloadStatus.DOWNLOADING)
+        await self.broadcast_progress(video_id)
+
+        if video_id not in self.pause_events:
+            self.pause_events[video_id] = asyncio.Event()
+        self.pause_events[video_id].set()
+        await self.download_file(video_id, download.url, settings.DOWNLOAD_PATH / download.filename, resume=resume)
+
+    async def broadcast_queue(self):
+        """广播所有排队中下载的排队位置"""
+        for video_id, download in list(self.active_downloads.items()):
+            if download.status != DownloadStatus.QUEUED:
+                continue
+            position = self.scheduler.position(video_id)
+            if position != download.queue_position:
+                download.queue_position = position
+                await self.broadcast_progress(video_id)
+
+    async def reorder_download(self, video_id: str, priority: Optional[int] = None,
+                               position: Optional[int] = None) -> bool:
+        """调整排队中下载的优先级或位置"""
+        if not self.scheduler.reorder(video_id, priority=priority, position=position):
+            return False
+        await self.broadcast_queue()
+        return True
+
+    async def set_bandwidth_limit(self, video_id: str, limit: Optional[float]) -> bool:
+        """设置单个下载的限速（字节/秒），None 恢复默认值"""
+        if video_id not in self.active_downloads:
+            return False
+        self.bandwidth_limiter.set_download_limit(video_id, limit)
+        self.active_downloads[video_id].rate_limit = self.bandwidth_limiter.effective_limit(video_id)
+        await self.broadcast_progress(video_id)
+        return True
+
+    async def broadcast_progress(self, video_id: str):
+        """标记下载进度有变化，由广播器在下一个周期合并发送给所有客户端"""
+        self.broadcaster.mark(video_id)
+
+    async def update_db(self, video_id: str, **kwargs):
+        """
+        更新数据库中的下载记录
+
+        更新先合并到进度写入日志中，由后台任务批量写入；包含状态变更时立即写入。
+        """
+        self.pending_updates.setdefault(video_id, {}).update(kwargs)
+        if "status" in kwargs:
+            await self.flush_updates()
+
+    async def flush_updates(self):
+        """将进度写入日志中的所有待写入记录在一个事务中批量写入"""
+        host_rows = self.connection_controller.take_dirty() if self.db is not None else []
+        if self.db is None or not (self.pending_updates or self.pending_segments or host_rows):
             return
-            
-        # 更新最后更新时间
-        self.last_ws_update_time[video_id] = current_time
-            
-        progress_data = self.active_downloads[video_id].dict()
-        progress_data['speed'] = round(progress_data['speed'], 2)
-        
-        # 确保datetime对象被转换为ISO格式字符串
-        if isinstance(progress_data['created_at'], datetime):
-            progress_data['created_at'] = progress_data['created_at'].isoformat()
-        if 'completed_at' in progress_data and isinstance(progress_data['completed_at'], datetime):
-            progress_data['completed_at'] = progress_data['completed_at'].isoformat()
-            
-        message = json.dumps(progress_data)
-        
-        # 使用批处理发送以减少WebSocket压力
-        failed_connections = []
-        for websocket in self.websocket_connections:
+
+        async with self._flush_lock:
+            updates, self.pending_updates = self.pending_updates, {}
+            segment_maps, self.pending_segments = self.pending_segments, {}
+            # 按更新的列分组，每组一次 executemany
+            groups: Dict[tuple, List[list]] = {}
+            for video_id, fields in updates.items():
+                columns = tuple(sorted(fields))
+                groups.setdefault(columns, []).append([*(fields[k] for k in columns), video_id])
+            # 分段在下载过程中持续变化，这里取当前状态的快照
+            segment_rows = [
+                (video_id, index, segment.start, segment.end, segment.downloaded, segment.status, segment.checksum)
+                for video_id, segments in segment_maps.items()
+                for index, segment in enumerate(segments)
+            ]
+
             try:
-                await websocket.send_text(message)
+                # 先把文件数据同步到磁盘，再写入分段进度，崩溃后记录的进度不会超过磁盘上的数据
+                for video_id in segment_maps:
+                    writer = self.file_writers.get(video_id)
+                    if writer is not None:
+                        await writer.sync()
+                for columns, rows in groups.items():
+                    await self.db.executemany(self._update_statement(columns), rows)
+                if segment_maps:
+                    await self.db.executemany(
+                        """
+                        INSERT INTO download_segments (video_id, segment_index, range_start, range_end, downloaded, status, checksum)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(video_id, segment_index) DO UPDATE SET
+                            range_start = excluded.range_start,
+                            range_end = excluded.range_end,
+                            downloaded = excluded.downloaded,
+                            status = excluded.status,
+                            checksum = excluded.checksum
+                        """,
+                        segment_rows
+                    )
+                    # 分段表重建后段数可能变少，删除多余的旧段
+                    await self.db.executemany(
+                        "DELETE FROM download_segments WHERE video_id = ? AND segment_index >= ?",
+                        [(video_id, len(segments)) for video_id, segments in segment_maps.items()]
+                    )
+                if host_rows:
+                    await self.db.executemany(
+                        """
+                        INSERT INTO host_connections (host, connections, throughput, updated_at) VALUES (?, ?, ?, ?)
+                        ON CONFLICT(host) DO UPDATE SET
+                            connections = excluded.connections,
+                            throughput = excluded.throughput,
+                            updated_at = excluded.updated_at
+                        """,
+                        host_rows
+                    )
+                await self.db.commit()
             except Exception as e:
-                failed_connections.append(websocket)
-                logger.error(f"WebSocket发送失败: {str(e)}")
-                
-        # 移除失败的连接
-        for ws in failed_connections:
-            try:
-                self.websocket_connections.remove(ws)
-            except:
-                pass
+                logger.error(f"下载进度写入失败: {str(e)}")
+                await self.db.rollback()
+                # 放回日志等待下次写入，期间产生的新值优先
+                for video_id, fields in updates.items():
+                    self.pending_updates[video_id] = {**fields, **self.pending_updates.get(video_id, {})}
+                for video_id, segments in segment_maps.items():
+                    self.pending_segments.setdefault(video_id, segments)
+                self.connection_controller.mark_dirty(host for host, *_ in host_rows)
 
-    async def update_db(self, video_id: str, **kwargs):
-        """更新数据库中的下载记录"""
-        set_clause = ", ".join(f"{k} = ?" for k in kwargs.keys())
-        values = list(kwargs.values())
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                f"UPDATE downloads SET {set_clause} WHERE video_id = ?",
-                [*values, video_id]
-            )
-            await db.commit()
+    def _update_statement(self, columns: tuple) -> str:
+        """按更新的列缓存SQL文本"""
+        statement = self._update_statements.get(columns)
+        if statement is None:
+            set_clause = ", ".join(f"{k} = ?" for k in columns)
+            statement = self._update_statements[columns] = f"UPDATE downloads SET {set_clause} WHERE video_id = ?"
+        return statement
     
     async def download_file(self, video_id: str, url: str, output_path, resume: bool = False):
         """下载文件并更新进度"""
@@ -291,7 +493,7 @@ class DownloadManager:
             use_segmented_download = accept_ranges and total_size > self.min_segment_size * 2
             
             # 使用自适应分段算法
-            optimal_segments = self.calculate_optimal_segments(total_size)
+            optimal_segments = self.calculate_optimal_segments(url, total_size)
             logger.info(f"文件大小: {total_size} 字节, 自适应计算最佳段数: {optimal_segments}")
             
             if use_segmented_download:
@@ -323,35 +525,15 @@ class DownloadManager:
                 self.pause_events.pop(video_id, None)
                 self.cancel_events.pop(video_id, None)
                 
-    def calculate_optimal_segments(self, file_size: int) -> int:
+    def calculate_optimal_segments(self, url: str, file_size: int) -> int:
         """
-        根据文件大小和历史带宽动态计算最佳分段数
-        
-        自适应算法策略:
-        1. 文件越大，段数越多
-        2. 根据以往下载速度动态调整
-        3. 控制每个段的大小在合理范围内
-        4. 考虑系统资源限制
+        计算分段数（即下载连接数）
+
+        取文件大小允许的段数（每段不小于 min_segment_size）与下载主机当前允许的连接数中较小的一个，
+        主机的连接数由连接控制器在下载过程中根据吞吐量和错误自适应调整。
         """
-        # 默认基于文件大小的初始值
-        base_segments = min(
-            self.max_segments,  # 不超过最大限制
-            max(1, file_size // (self.min_segment_size))  # 至少保证每段大小合理
-        )
-        
-        # 如果有足够的带宽样本，考虑调整
-        if len(self.bandwidth_samples) >= self.segment_adjust_threshold:
-            avg_bandwidth = sum(self.bandwidth_samples) / len(self.bandwidth_samples)
-            
-            # 带宽较高时增加并发度，带宽较低时减少并发度
-            # 以5MB/s为基准带宽
-            base_bandwidth = 5 * 1024 * 1024  # 5MB/s
-            bandwidth_factor = min(2.0, max(0.5, avg_bandwidth / base_bandwidth))
-            
-            adjusted_segments = round(base_segments * bandwidth_factor)
-            return min(self.max_segments, max(1, adjusted_segments))
-            
-        return base_segments
+        by_size = max(1, file_size // self.min_segment_size)
+        return max(1, min(by_size, self.max_segments, self.connection_controller.limit(url)))
 
     async def segmented_download(self, video_id: str, url: str, output_path, total_size: int, resume: bool = False, num_segments: int = None):
         """使用分段并发下载，支持自适应分段"""
@@ -359,7 +541,6 @@ class DownloadManager:
             # 初始化时间和计数器
             last_update_time = asyncio.get_event_loop().time()
             last_downloaded = 0
-            start_time = asyncio.get_event_loop().time()
             
             # 使用传入的段数或计算最佳段数
             if num_segments is None:
@@ -370,11 +551,17 @@ class DownloadManager:
             logger.info(f"文件大小: {total_size} 字节, 使用 {num_segments} 个下载段, 每段大小约 {segment_size} 字节")
             
             # 如果是恢复下载，检查哪些段已经完成
-            if resume and hasattr(self.active_downloads[video_id], 'segments') and self.active_downloads[video_id].segments:
-                segments = self.active_downloads[video_id].segments
+            segments = self.active_downloads[video_id].segments if resume else None
+            if segments and not self._segments_resumable(segments, output_path, total_size):
+                logger.warning(f"视频 {video_id} 的分段记录与文件不一致，重新下载")
+                segments = None
+
+            if segments:
                 # 计算已下载量
                 total_downloaded = sum(seg.downloaded for seg in segments)
                 self.active_downloads[video_id].downloaded = total_downloaded
+                logger.info(f"视频 {video_id} 从分段记录恢复下载, 已下载 {total_downloaded} 字节")
+                self.file_writers[video_id] = await DownloadFileWriter.open(output_path)
             else:
                 # 创建新段，使用优化的段大小分配
                 segments = []
@@ -419,22 +606,23 @@ class DownloadManager:
                 # 更新下载对象
                 self.active_downloads[video_id].segments = segments
                 
-                # 创建空文件
-                with open(output_path, "wb") as f:
-                    f.seek(total_size - 1)
-                    f.write(b'\0')
+                # 创建文件并预分配空间
+                writer = await DownloadFileWriter.open(output_path, truncate=True)
+                self.file_writers[video_id] = writer
+                await writer.preallocate(total_size)
+
+                # 分段表立即写入，之后随进度批量更新
+                self.active_downloads[video_id].downloaded = 0
+                self.update_segments(video_id, segments)
+                await self.flush_updates()
             
-            # 创建下载任务，使用信号量控制并发
-            semaphore = asyncio.Semaphore(num_segments)
-            tasks = []
-            for i, segment in enumerate(segments):
-                if segment.status != "completed":
-                    task = asyncio.create_task(
-                        self.download_segment(
-                            video_id, url, output_path, segment, i, semaphore
-                        )
-                    )
-                    tasks.append(task)
+            # 下载连接每下载完一段后领取下一段，没有待下载的段时拆分剩余最多的段，直到整个文件下载完成；
+            # 下载过程中连接控制器提高了主机的连接数时，增加下载连接
+            claimed: Set[int] = set()
+            tasks = {
+                asyncio.create_task(self.segment_worker(video_id, url, output_path, segments, claimed))
+                for _ in range(num_segments)
+            }
             
             # 定时更新进度
             update_progress_task = asyncio.create_task(
@@ -443,15 +631,35 @@ class DownloadManager:
                 )
             )
             
-            # 等待所有下载任务完成
-            await asyncio.gather(*tasks)
-            
-            # 取消更新进度任务
-            update_progress_task.cancel()
+            try:
+                # 等待所有下载连接结束
+                while tasks:
+                    done, tasks = await asyncio.wait(tasks, timeout=self.progress_update_interval)
+                    for task in done:
+                        task.result()
+                    if (tasks and len(tasks) < self.max_segments and not self.cancel_events.get(video_id)
+                            and self.connection_controller.has_spare(url)
+                            and self._has_spare_work(segments, claimed)):
+                        tasks.add(asyncio.create_task(
+                            self.segment_worker(video_id, url, output_path, segments, claimed)
+                        ))
+                        logger.debug(f"视频 {video_id} 增加下载连接，当前 {len(tasks)} 个")
+            finally:
+                # 被取消或出错时结束其余下载连接，等待它们退出后再关闭文件
+                for task in tasks:
+                    task.cancel()
+                if tasks:
+                    await asyncio.wait(tasks)
+                # 取消更新进度任务
+                update_progress_task.cancel()
             
             # 检查是否所有段都已完成
             all_completed = all(segment.status == "completed" for segment in segments)
+            self.update_segments(video_id, segments)
             if all_completed:
+                # 数据同步到磁盘后再标记完成
+                await self.file_writers.pop(video_id).close()
+                checksum = await self._file_checksum(output_path, segments)
                 total_downloaded = total_size
                 self.active_downloads[video_id].status = DownloadStatus.COMPLETED
                 self.active_downloads[video_id].downloaded = total_downloaded
@@ -460,19 +668,11 @@ class DownloadManager:
                     video_id,
                     status=DownloadStatus.COMPLETED,
                     downloaded=total_downloaded,
-                    completed_at=completed_at
+                    completed_at=completed_at,
+                    checksum=checksum
                 )
                 self.active_downloads[video_id].completed_at = completed_at
                 
-                # 计算带宽样本并存储
-                elapsed_time = asyncio.get_event_loop().time() - start_time
-                if elapsed_time > 0:
-                    bandwidth = total_size / elapsed_time  # bytes/second
-                    # 保留最新的10个样本
-                    self.bandwidth_samples.append(bandwidth)
-                    if len(self.bandwidth_samples) > 10:
-                        self.bandwidth_samples.pop(0)
-                
             else:
                 # 如果有段下载失败，整体下载失败
                 self.active_downloads[video_id].status = DownloadStatus.ERROR
@@ -487,7 +687,93 @@ class DownloadManager:
                 
         except Exception as e:
             raise Exception(f"分段下载失败: {str(e)}")
+        finally:
+            writer = self.file_writers.pop(video_id, None)
+            if writer is not None:
+                await writer.close()
     
+    async def segment_worker(self, video_id: str, url: str, output_path, segments: List[DownloadSegment],
+                             claimed: Set[int]):
+        """下载连接：依次领取待下载的段，没有时从其他连接正在下载的段中拆分出后半部分"""
+        while not self.cancel_events.get(video_id):
+            index = self._claim_segment(segments, claimed)
+            if index is None:
+                index = self._split_segment(video_id, segments, claimed)
+            if index is None:
+                return
+            try:
+                await self.download_segment(video_id, url, output_path, segments[index], index)
+            finally:
+                claimed.discard(index)
+
+    def _has_spare_work(self, segments: List[DownloadSegment], claimed: Set[int]) -> bool:
+        """是否有新的下载连接可以领取的工作：没有连接在下载的待下载段，或剩余足够拆分的段"""
+        in_flight = self.buffer_pool.buffer_size * 2
+        for index, segment in enumerate(segments):
+            if segment.status in ("completed", "error"):
+                continue
+            if index not in claimed:
+                return True
+            remaining = segment.end - (segment.start + segment.downloaded + in_flight) + 1
+            if remaining >= self.min_split_size * 2:
+                return True
+        return False
+
+    @staticmethod
+    def _claim_segment(segments: List[DownloadSegment], claimed: Set[int]) -> Optional[int]:
+        """领取一个没有连接在下载的待下载段"""
+        for index, segment in enumerate(segments):
+            if index not in claimed and segment.status not in ("completed", "error"):
+                claimed.add(index)
+                return index
+        return None
+
+    def _split_segment(self, video_id: str, segments: List[DownloadSegment], claimed: Set[int]) -> Optional[int]:
+        """
+        拆分剩余最多的正在下载的段，新段追加到分段表末尾并由当前连接领取
+
+        被拆分的段可能还有已接收但未计入 downloaded 的数据（缓冲区和正在读取的块），
+        拆分点在这部分数据之后，被拆分的连接读到新的结束位置时自行停止。
+        """
+        # 缓冲区中的数据加上正在处理的块（网络读取的块远小于缓冲区）
+        in_flight = self.buffer_pool.buffer_size * 2
+        victim, remaining = None, 0
+        for index in claimed:
+            segment = segments[index]
+            segment_remaining = segment.end - (segment.start + segment.downloaded + in_flight) + 1
+            if segment_remaining > remaining:
+                victim, remaining = segment, segment_remaining
+        if victim is None or remaining < self.min_split_size * 2:
+            return None
+
+        split_at = victim.end + 1 - remaining // 2
+        segments.append(DownloadSegment(start=split_at, end=victim.end))
+        victim.end = split_at - 1
+        index = len(segments) - 1
+        claimed.add(index)
+        logger.debug(f"视频 {video_id} 拆分分段: 新段 {index} 范围 {split_at}-{segments[index].end}")
+        return index
+
+    async def _file_checksum(self, output_path, segments: List[DownloadSegment]) -> str:
+        """由各段的校验值合并出整个文件的校验值，有段缺少校验值时重新读取文件计算"""
+        crc = combine_segments([(segment.start, segment.end, segment.checksum) for segment in segments])
+        if crc is None:
+            crc = await asyncio.get_running_loop().run_in_executor(verify_executor, file_crc32, output_path)
+        return format_checksum(crc)
+
+    @staticmethod
+    def _segments_resumable(segments: List[DownloadSegment], output_path, total_size: int) -> bool:
+        """分段记录是否可以用于恢复：文件存在且大小一致，分段首尾相接覆盖整个文件"""
+        if not os.path.exists(output_path) or os.path.getsize(output_path) != total_size:
+            return False
+        position = 0
+        # 拆分出的段追加在末尾，按起始位置检查
+        for segment in sorted(segments, key=lambda segment: segment.start):
+            if segment.start != position or segment.downloaded > segment.end - segment.start + 1:
+                return False
+            position = segment.end + 1
+        return position == total_size
+
     async def update_segmented_progress(self, video_id: str, segments: List[DownloadSegment], last_update_time, last_downloaded):
         """定期更新分段下载的进度"""
         try:
@@ -509,7 +795,9 @@ class DownloadManager:
                     speed = (downloaded - last_downloaded) / time_diff
                     self.active_downloads[video_id].speed = speed
                     self.active_downloads[video_id].downloaded = downloaded
+                    self.active_downloads[video_id].rate_limit = self.bandwidth_limiter.effective_limit(video_id)
                     await self.update_db(video_id, downloaded=downloaded)
+                    self.update_segments(video_id, segments)
                     last_update_time = current_time
                     last_downloaded = downloaded
                     await self.broadcast_progress(video_id)
@@ -520,100 +808,124 @@ class DownloadManager:
         except Exception as e:
             logger.error(f"更新进度错误: {str(e)}")
     
-    async def download_segment(self, video_id: str, url: str, output_path, segment: DownloadSegment, segment_index: int, semaphore: asyncio.Semaphore = None):
-        """下载指定段，使用连接池和信号量控制并发"""
+    async def download_segment(self, video_id: str, url: str, output_path, segment: DownloadSegment, segment_index: int):
+        """下载指定段，使用连接池复用连接"""
         max_retries = self.max_retries
         retries = 0
         backoff_time = 1  # 初始重试等待时间
         
-        # 使用信号量控制并发量
-        async with semaphore if semaphore else asyncio.nullcontext():
-            while retries < max_retries:
-                try:
-                    # 检查是否被取消
-                    if self.cancel_events.get(video_id):
-                        return
-                    
-                    # 等待暂停事件
-                    await self.pause_events[video_id].wait()
-                    
-                    # 计算实际起始位置
-                    actual_start = segment.start + segment.downloaded
-                    if actual_start > segment.end:
-                        # 段已下载完成
-                        segment.status = "completed"
-                        return
-                    
-                    # 设置请求头
-                    headers = {
-                        "Range": f"bytes={actual_start}-{segment.end}",
-                        "Connection": "keep-alive",  # 保持连接
-                        "Accept-Encoding": "identity"  # 避免压缩导致的问题
-                    }
-                    
+        while retries < max_retries:
+            try:
+                # 检查是否被取消
+                if self.cancel_events.get(video_id):
+                    return
+                
+                # 等待暂停事件
+                await self.pause_events[video_id].wait()
+                
+                # 计算实际起始位置
+                actual_start = segment.start + segment.downloaded
+                if actual_start > segment.end:
+                    # 段已下载完成
+                    segment.status = "completed"
+                    return
+                
+                # 设置请求头
+                headers = {
+                    "Range": f"bytes={actual_start}-{segment.end}",
+                    "Connection": "keep-alive",  # 保持连接
+                    "Accept-Encoding": "identity"  # 避免压缩导致的问题
+                }
+                
+                # 同一主机的并发连接数由连接控制器限制，名额只在请求期间占用，暂停和重试等待时不占用；
+                # 再从缓冲池取得缓冲区，内存预算用完时在这里等待
+                async with self.connection_controller.connection(url), self.buffer_pool.buffer() as buffer:
                     # 获取复用的HTTP客户端
                     client = await self.get_http_client(url)
                     
                     async with client.stream("GET", url, headers=headers) as response:
                         if response.status_code not in [200, 206]:
+                            self.connection_controller.record_status(url, response.status_code)
                             raise Exception(f"服务器返回错误状态码: {response.status_code}")
                         
                         segment.status = "downloading"
-                        buffer = bytearray()
                         
-                        # 使用aiofiles进行异步文件操作，提高性能
-                        async with aiofiles.open(output_path, "r+b") as f:
-                            await f.seek(actual_start)
-                            
-                            try:
-                                async for chunk in response.aiter_bytes(self.chunk_size):
-                                    # 检查是否被取消
-                                    if self.cancel_events.get(video_id):
-                                        return
-                                    
-                                    # 等待暂停事件
-                                    await self.pause_events[video_id].wait()
-                                    
-                                    buffer.extend(chunk)
-                                    if len(buffer) >= self.buffer_size:
-                                        await f.write(buffer)
-                                        segment.downloaded += len(buffer)
+                        # 所有分段共用下载的文件写入器，按偏移量写入
+                        writer = self.file_writers[video_id]
+
+                        try:
+                            async for chunk in response.aiter_bytes():
+                                # 检查是否被取消
+                                if self.cancel_events.get(video_id):
+                                    return
+                                
+                                # 暂停时断开连接，释放主机的连接名额
+                                if not self.pause_events[video_id].is_set():
+                                    break
+                                # 带宽限制
+                                await self.bandwidth_limiter.consume(video_id, len(chunk))
+                                self.connection_controller.record_bytes(url, len(chunk))
+                                
+                                # 段可能已被空闲连接拆分，超出当前结束位置的数据丢弃
+                                remaining = segment.end - segment.start + 1 - segment.downloaded - buffer.length
+                                data = memoryview(chunk)[:max(0, remaining)]
+                                while data:
+                                    data = buffer.fill(data)
+                                    if buffer.full:
+                                        segment.checksum = await writer.write(
+                                            segment.start + segment.downloaded, buffer.filled(), segment.checksum
+                                        )
+                                        segment.downloaded += buffer.length
                                         buffer.clear()
+                                if len(chunk) >= remaining:
+                                    break
+                            
+                            # 写入剩余buffer
+                            if buffer.length:
+                                segment.checksum = await writer.write(
+                                    segment.start + segment.downloaded, buffer.filled(), segment.checksum
+                                )
+                                segment.downloaded += buffer.length
                                 
-                                # 写入剩余buffer
-                                if buffer:
-                                    await f.write(buffer)
-                                    segment.downloaded += len(buffer)
-                                    
-                            except asyncio.CancelledError:
-                                # 处理取消请求
-                                return
-                        
-                        # 段下载完成
-                        segment.status = "completed"
-                        logger.success(f"视频 {video_id} 段 {segment_index} 下载完成")
-                        return
-                except Exception as e:
-                    retries += 1
-                    # 使用指数退避策略进行重试
-                    backoff_time = min(30, backoff_time * 1.5)  # 逐渐增加等待时间，但不超过30秒
-                    logger.warning(f"视频 {video_id} 段 {segment_index} 下载失败 (尝试 {retries}/{max_retries}, 等待 {backoff_time:.1f}s): {str(e)}")
-                    if retries >= max_retries:
-                        segment.status = "error"
-                        return
-                    await asyncio.sleep(backoff_time)  # 使用指数退避等待
-    
+                        except asyncio.CancelledError:
+                            # 任务被取消（如服务关闭）时继续向上抛出，不能当作段结束而被重新领取
+                            raise
+                
+                if not self.pause_events[video_id].is_set():
+                    # 暂停中断的请求不计入重试，继续后从已写入的位置重新请求
+                    continue
+                if segment.start + segment.downloaded <= segment.end:
+                    raise Exception("连接在段结束前断开")
+
+                # 段下载完成
+                segment.status = "completed"
+                logger.success(f"视频 {video_id} 段 {segment_index} 下载完成")
+                return
+            except Exception as e:
+                self.connection_controller.record_failure(url, e)
+                retries += 1
+                # 使用指数退避策略进行重试
+                backoff_time = min(30, backoff_time * 1.5)  # 逐渐增加等待时间，但不超过30秒
+                logger.warning(f"视频 {video_id} 段 {segment_index} 下载失败 (尝试 {retries}/{max_retries}, 等待 {backoff_time:.1f}s): {str(e)}")
+                if retries >= max_retries:
+                    segment.status = "error"
+                    return
+                await asyncio.sleep(backoff_time)  # 使用指数退避等待
+
     async def simple_download(self, video_id: str, url: str, output_path, total_size: int, resume: bool = False):
         """使用单线程下载（用于不支持范围请求的服务器），优化性能和稳定性"""
         last_update_time = asyncio.get_event_loop().time()
-        start_time = asyncio.get_event_loop().time()
         last_downloaded = 0
         downloaded = 0
-        mode = "ab" if resume else "wb"
+        # 整个文件的 CRC32，随写入接续计算
+        checksum = 0
         
         if resume:
             downloaded = os.path.getsize(output_path) if os.path.exists(output_path) else 0
             last_downloaded = downloaded
+            if downloaded > 0:
+                # 没有分段记录，已有部分的校验值只能读取文件计算
+                checksum = await asyncio.get_running_loop().run_in_executor(verify_executor, file_crc32, output_path)
             
         await self.broadcast_progress(video_id)
 
@@ -623,228 +935,318 @@ class DownloadManager:
             "Accept-Encoding": "identity"  # 避免压缩导致的问题
         }
         
-        if resume and downloaded > 0:
-            headers["Range"] = f"bytes={downloaded}-"
-        
         # 重试机制
         max_retries = self.max_retries
         retries = 0
         backoff_time = 1  # 初始重试等待时间
         
-        while retries <= max_retries:
-            try:
-                # 获取复用的HTTP客户端
-                client = await self.get_http_client(url)
+        # 不预分配空间，断点续传依据文件大小确定已下载量
+        writer = await DownloadFileWriter.open(output_path, truncate=not resume)
+        try:
+            while retries <= max_retries:
+                try:
+                    # 等待暂停事件
+                    await self.pause_events[video_id].wait()
+                    # 连接名额只在请求期间占用；再从缓冲池取得缓冲区，内存预算用完时在这里等待
+                    async with self.connection_controller.connection(url), self.buffer_pool.buffer() as buffer:
+                        # 获取复用的HTTP客户端
+                        client = await self.get_http_client(url)
+                        # 续传或重试时从已写入的位置继续
+                        if downloaded > 0:
+                            headers["Range"] = f"bytes={downloaded}-"
                 
-                async with client.stream("GET", url, headers=headers) as response:
-                    if response.status_code not in [200, 206]:
-                        raise Exception(f"服务器返回错误状态码: {response.status_code}")
-                    
-                    # 使用异步文件操作提高性能
-                    async with aiofiles.open(output_path, mode) as f:
-                        buffer = bytearray()
-                        try:
-                            async for chunk in response.aiter_bytes(self.chunk_size):
-                                # 检查是否被取消
-                                if self.cancel_events.get(video_id):
-                                    logger.info(f"检测到取消操作: {video_id}")
-                                    try:
-                                        os.remove(output_path)
-                                    except:
-                                        pass
-                                    self.active_downloads[video_id].status = DownloadStatus.CANCELLED
-                                    await self.update_db(video_id, status=DownloadStatus.CANCELLED)
-                                    await self.broadcast_progress(video_id)
-                                    return
+                        async with client.stream("GET", url, headers=headers) as response:
+                            if response.status_code not in [200, 206]:
+                                self.connection_controller.record_status(url, response.status_code)
+                                raise Exception(f"服务器返回错误状态码: {response.status_code}")
+                            if response.status_code == 200 and downloaded > 0:
+                                # 服务器忽略了范围请求，从头写入
+                                downloaded = last_downloaded = checksum = 0
+
+                            try:
+                                async for chunk in response.aiter_bytes():
+                                    # 检查是否被取消
+                                    if self.cancel_events.get(video_id):
+                                        logger.info(f"检测到取消操作: {video_id}")
+                                        try:
+                                            os.remove(output_path)
+                                        except:
+                                            pass
+                                        self.active_downloads[video_id].status = DownloadStatus.CANCELLED
+                                        await self.update_db(video_id, status=DownloadStatus.CANCELLED)
+                                        await self.broadcast_progress(video_id)
+                                        return
 
-                                # 检查下载ID是否仍然有效
-                                if video_id not in self.active_downloads:
-                                    raise Exception("下载任务已失效")
+                                    # 检查下载ID是否仍然有效
+                                    if video_id not in self.active_downloads:
+                                        raise Exception("下载任务已失效")
 
-                                # 等待暂停事件
-                                await self.pause_events[video_id].wait()
-                                
-                                buffer.extend(chunk)
-                                if len(buffer) >= self.buffer_size:
-                                    await f.write(buffer)
-                                    downloaded += len(buffer)
-                                    buffer.clear()
+                                    # 暂停时断开连接，释放主机的连接名额
+                                    if not self.pause_events[video_id].is_set():
+                                        break
+                                    # 带宽限制
+                                    await self.bandwidth_limiter.consume(video_id, len(chunk))
+                                    self.connection_controller.record_bytes(url, len(chunk))
+                            
+                                    data = memoryview(chunk)
+                                    while data:
+                                        data = buffer.fill(data)
+                                        if buffer.full:
+                                            checksum = await writer.write(downloaded, buffer.filled(), checksum)
+                                            downloaded += buffer.length
+                                            buffer.clear()
+                            
+                                    # 计算下载速度并使用节流更新进度
+                                    current_time = asyncio.get_event_loop().time()
+                                    time_diff = current_time - last_update_time
+                                    if time_diff >= self.progress_update_interval:
+                                        speed = (downloaded - last_downloaded) / time_diff
+                                        self.active_downloads[video_id].speed = speed
+                                        self.active_downloads[video_id].downloaded = downloaded
+                                        self.active_downloads[video_id].rate_limit = self.bandwidth_limiter.effective_limit(video_id)
                                 
-                                # 计算下载速度并使用节流更新进度
-                                current_time = asyncio.get_event_loop().time()
-                                time_diff = current_time - last_update_time
-                                if time_diff >= self.progress_update_interval:
-                                    speed = (downloaded - last_downloaded) / time_diff
-                                    self.active_downloads[video_id].speed = speed
-                                    self.active_downloads[video_id].downloaded = downloaded
+                                        # 优化数据库更新频率 - 只在进度变化明显时更新数据库
+                                        progress_percent = downloaded / total_size * 100 if total_size > 0 else 0
+                                        if progress_percent - (last_downloaded / total_size * 100 if total_size > 0 else 0) >= 1.0:
+                                            # 进度变化超过1%才更新数据库
+                                            await self.update_db(video_id, downloaded=downloaded)
                                     
-                                    # 优化数据库更新频率 - 只在进度变化明显时更新数据库
-                                    progress_percent = downloaded / total_size * 100 if total_size > 0 else 0
-                                    if progress_percent - (last_downloaded / total_size * 100 if total_size > 0 else 0) >= 1.0:
-                                        # 进度变化超过1%才更新数据库
-                                        await self.update_db(video_id, downloaded=downloaded)
-                                        
-                                    last_update_time = current_time
-                                    last_downloaded = downloaded
-                                    await self.broadcast_progress(video_id)
-                            
-                            # 写入剩余buffer
-                            if buffer:
-                                await f.write(buffer)
-                                downloaded += len(buffer)
+                                        last_update_time = current_time
+                                        last_downloaded = downloaded
+                                        await self.broadcast_progress(video_id)
+                        
+                                # 写入剩余buffer
+                                if buffer.length:
+                                    checksum = await writer.write(downloaded, buffer.filled(), checksum)
+                                    downloaded += buffer.length
 
-                            # 最后一次更新进度
-                            self.active_downloads[video_id].downloaded = downloaded
-                            await self.update_db(video_id, downloaded=downloaded)
-                            await self.broadcast_progress(video_id)
+                                # 最后一次更新进度
+                                self.active_downloads[video_id].downloaded = downloaded
+                                await self.update_db(video_id, downloaded=downloaded)
+                                await self.broadcast_progress(video_id)
 
-                        except Exception as chunk_error:
-                            raise Exception(f"下载数据时出错: {str(chunk_error)}")
-                    
-                    # 验证下载是否完整
-                    if total_size > 0 and downloaded != total_size:
-                        raise Exception(f"下载不完整: 已下载 {downloaded} 字节，总大小 {total_size} 字节")
-                    
-                    # 完成下载
-                    self.active_downloads[video_id].status = DownloadStatus.COMPLETED
-                    self.active_downloads[video_id].downloaded = total_size
-                    completed_at = datetime.now()
-                    await self.update_db(
-                        video_id,
-                        status=DownloadStatus.COMPLETED,
-                        downloaded=total_size,
-                        completed_at=completed_at
-                    )
-                    self.active_downloads[video_id].completed_at = completed_at
+                            except Exception as chunk_error:
+                                raise Exception(f"下载数据时出错: {str(chunk_error)}")
+
+                            if not self.pause_events[video_id].is_set():
+                                # 暂停中断的请求不计入重试，继续后从已写入的位置重新请求
+                                continue
+                
+                            # 验证下载是否完整
+                            if total_size > 0 and downloaded != total_size:
+                                raise Exception(f"下载不完整: 已下载 {downloaded} 字节，总大小 {total_size} 字节")
                     
-                    # 计算带宽样本并存储
-                    elapsed_time = asyncio.get_event_loop().time() - start_time
-                    if elapsed_time > 0:
-                        bandwidth = total_size / elapsed_time  # bytes/second
-                        # 保留最新的10个样本
-                        self.bandwidth_samples.append(bandwidth)
-                        if len(self.bandwidth_samples) > 10:
-                            self.bandwidth_samples.pop(0)
+                            # 数据同步到磁盘后再标记完成
+                            await writer.close()
+                        
+                            # 完成下载
+                            self.active_downloads[video_id].status = DownloadStatus.COMPLETED
+                            self.active_downloads[video_id].downloaded = total_size
+                            completed_at = datetime.now()
+                            await self.update_db(
+                                video_id,
+                                status=DownloadStatus.COMPLETED,
+                                downloaded=total_size,
+                                completed_at=completed_at,
+                                checksum=format_checksum(checksum)
+                            )
+                            self.active_downloads[video_id].completed_at = completed_at
                     
-                    await self.broadcast_progress(video_id)
+                            await self.broadcast_progress(video_id)
                     
-                    # 成功下载，不再重试
-                    return
+                            # 成功下载，不再重试
+                            return
                     
-            except Exception as e:
-                retries += 1
-                if retries > max_retries:
-                    raise Exception(f"单线程下载失败 (已重试 {retries-1} 次): {str(e)}")
+                except Exception as e:
+                    self.connection_controller.record_failure(url, e)
+                    retries += 1
+                    if retries > max_retries:
+                        raise Exception(f"单线程下载失败 (已重试 {retries-1} 次): {str(e)}")
                 
-                # 使用指数退避策略进行重试
-                backoff_time = min(30, backoff_time * 1.5)
-                logger.warning(f"视频 {video_id} 下载失败，等待 {backoff_time:.1f}s 后重试 ({retries}/{max_retries}): {str(e)}")
-                await asyncio.sleep(backoff_time)
+                    # 使用指数退避策略进行重试
+                    backoff_time = min(30, backoff_time * 1.5)
+                    logger.warning(f"视频 {video_id} 下载失败，等待 {backoff_time:.1f}s 后重试 ({retries}/{max_retries}): {str(e)}")
+                    await asyncio.sleep(backoff_time)
+        finally:
+            await writer.close()
 
     async def pause_download(self, video_id: str):
-        """暂停下载"""
+        """
+        暂停下载，排队中的下载移出队列
+
+        正在进行的下载结束下载任务，释放调度器的名额给排队中的下载，继续时重新排队并断点续传。
+        """
+        if video_id in self.active_downloads and self.scheduler.remove(video_id):
+            self.pause_events[video_id] = asyncio.Event()
         if video_id in self.pause_events:
             self.pause_events[video_id].clear()
-            self.active_downloads[video_id].status = DownloadStatus.PAUSED
+            download = self.active_downloads[video_id]
+            # 先标记暂停，下载任务结束时保留暂停事件
+            download.status = DownloadStatus.PAUSED
+            download.queue_position = None
+            download.speed = 0.0
+            if await self.scheduler.cancel(video_id):
+                # 下载任务已退出（文件已同步到磁盘），保存最终的分段进度用于续传
+                if download.segments:
+                    download.downloaded = sum(segment.downloaded for segment in download.segments)
+                    self.update_segments(video_id, download.segments)
+                await self.update_db(video_id, downloaded=download.downloaded)
             await self.update_db(video_id, status=DownloadStatus.PAUSED)
             await self.broadcast_progress(video_id)
+            await self.broadcast_queue()
             return True
         return False
 
     async def resume_download(self, video_id: str):
-        """继续下载"""
+        """继续下载：重新排队，轮到时断点续传"""
         if video_id in self.pause_events:
-            self.pause_events[video_id].set()
-            self.active_downloads[video_id].status = DownloadStatus.DOWNLOADING
-            await self.update_db(video_id, status=DownloadStatus.DOWNLOADING)
+            await self.queue_download(video_id, resume=True)
             await self.broadcast_progress(video_id)
             return True
         return False
 
     async def retry_download(self, video_id: str):
         """重试下载"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute(
-                "SELECT * FROM downloads WHERE video_id = ?",
-                (video_id,)
-            ) as cursor:
-                download = await cursor.fetchone()
-                if not download:
-                    return False
-                
-                # 检查重试次数是否已达上限
-                retry_count = download['retry_count'] + 1
-                max_retries = download['max_retries'] if download['max_retries'] else 3
-                
-                if retry_count > max_retries:
-                    # 更新错误信息
-                    await db.execute(
-                        "UPDATE downloads SET error_message = ? WHERE video_id = ?",
-                        (f"已达到最大重试次数 ({max_retries})", video_id)
-                    )
-                    await db.commit()
-                    if video_id in self.active_downloads:
-                        self.active_downloads[video_id].error_message = f"已达到最大重试次数 ({max_retries})"
-                    await self.broadcast_progress(video_id)
-                    return False
-                    
-                # 更新下载状态为 downloading 并增加重试计数
-                await db.execute(
-                    "UPDATE downloads SET status = ?, error_message = NULL, retry_count = ? WHERE video_id = ?",
-                    (DownloadStatus.DOWNLOADING, retry_count, video_id)
-                )
-                await db.commit()
-                
-                # 更新内存中的下载状态
-                if video_id in self.active_downloads:
-                    self.active_downloads[video_id].status = DownloadStatus.DOWNLOADING
-                    self.active_downloads[video_id].error_message = None
-                    self.active_downloads[video_id].retry_count = retry_count
-                else:
-                    # 如果active_downloads中不存在该ID，需要重新创建
-                    self.active_downloads[video_id] = DownloadProgress(
-                        video_id=video_id,
-                        filename=download['filename'],
-                        title=download['title'],
-                        cover_url=download['cover_url'],
-                        total_size=download['total_size'] or 0,
-                        downloaded=download['downloaded'] or 0,
-                        status=DownloadStatus.DOWNLOADING,
-                        speed=0.0,
-                        error_message=None,
-                        url=download['url'],
-                        created_at=download['created_at'],
-                        completed_at=None,
-                        retry_count=retry_count,
-                        max_retries=max_retries
-                    )
-                    
-                # 如果有暂停事件，设置它以继续下载
-                if video_id in self.pause_events:
-                    self.pause_events[video_id].set()
-                else:
-                    self.pause_events[video_id] = asyncio.Event()
-                    self.pause_events[video_id].set()
+        # 先读出记录再请求上游，不在查询游标打开期间等待网络
+        download = await self.check_existing_download(video_id)
+        if not download:
+            return False
+            
+        # 检查重试次数是否已达上限
+        retry_count = download['retry_count'] + 1
+        max_retries = download['max_retries'] if download['max_retries'] else 3
+            
+        if retry_count > max_retries:
+            # 更新错误信息
+            await self.update_db(video_id, error_message=f"已达到最大重试次数 ({max_retries})")
+            if video_id in self.active_downloads:
+                self.active_downloads[video_id].error_message = f"已达到最大重试次数 ({max_retries})"
+            await self.broadcast_progress(video_id)
+            return False
                 
-                # 启动重试下载任务
-                output_path = settings.DOWNLOAD_PATH / download["filename"]
-                asyncio.create_task(
-                    self.download_file(
-                        video_id,
-                        download["url"],
-                        output_path,
-                        resume=True
-                    )
-                )
+        download_url = await self._refresh_download_url(video_id, download["url"])
+
+        # 更新下载状态为 downloading 并增加重试计数
+        await self.update_db(
+            video_id,
+            error_message=None,
+            retry_count=retry_count,
+            url=download_url
+        )
+            
+        # 更新内存中的下载状态
+        if video_id in self.active_downloads:
+            self.active_downloads[video_id].error_message = None
+            self.active_downloads[video_id].retry_count = retry_count
+            self.active_downloads[video_id].url = download_url
+        else:
+            # 如果active_downloads中不存在该ID，需要重新创建
+            self.active_downloads[video_id] = DownloadProgress(
+                video_id=video_id,
+                filename=download['filename'],
+                title=download['title'],
+                cover_url=download['cover_url'],
+                total_size=download['total_size'] or 0,
+                downloaded=download['downloaded'] or 0,
+                status=DownloadStatus.QUEUED,
+                speed=0.0,
+                error_message=None,
+                url=download_url,
+                created_at=download['created_at'],
+                completed_at=None,
+                retry_count=retry_count,
+                max_retries=max_retries,
+                segments=await self.load_segments(video_id)
+            )
                 
-                await self.broadcast_progress(video_id)
-                return True
+        # 重新排队，从已下载的部分继续
+        await self.queue_download(video_id, resume=True)
+        await self.broadcast_progress(video_id)
+        return True
+
+    async def _refresh_download_url(self, video_id: str, url: str) -> str:
+        """签名下载链接可能已过期，通过快速路径刷新地址，失败时沿用原地址"""
+        stream_info = await self.video_service.resolve_stream_urls(video_id)
+        if stream_info:
+            return self._get_best_stream_url(stream_info.stream_urls) or url
+        return url
+
+    async def verify_download(self, video_id: str) -> Dict[str, Any]:
+        """
+        校验已完成的下载
+
+        在线程池中按段重新计算文件的 CRC32，与下载时记录的值比较，损坏的段重置后重新排队下载，
+        其余部分保留。没有分段记录的下载与整个文件的校验值比较，不一致时重新下载整个文件。
+        """
+        download = await self.check_existing_download(video_id)
+        if not download:
+            return {"status": "error", "message": "下载记录不存在"}
+        if download['status'] != DownloadStatus.COMPLETED:
+            return {"status": "error", "message": "下载尚未完成"}
+        file_path = settings.DOWNLOAD_PATH / download['filename']
+        if not os.path.exists(file_path):
+            return {"status": "error", "message": "文件不存在"}
+
+        loop = asyncio.get_running_loop()
+        segments = await self.load_segments(video_id)
+        if segments and any(segment.checksum is not None for segment in segments):
+            corrupt = await loop.run_in_executor(
+                verify_executor,
+                find_corrupt_segments,
+                file_path,
+                [(segment.start, segment.end, segment.checksum) for segment in segments]
+            )
+            if not corrupt:
+                return {"status": "success", "message": "文件校验通过", "corrupt_segments": []}
+            for index in corrupt:
+                segment = segments[index]
+                segment.downloaded = 0
+                segment.checksum = 0
+                segment.status = DownloadStatus.PENDING
+            logger.warning(f"视频 {video_id} 校验发现 {len(corrupt)} 个损坏的段，重新下载: {corrupt}")
+        elif download['checksum']:
+            crc = await loop.run_in_executor(verify_executor, file_crc32, file_path)
+            if format_checksum(crc) == download['checksum']:
+                return {"status": "success", "message": "文件校验通过", "corrupt_segments": []}
+            corrupt, segments = None, None
+            logger.warning(f"视频 {video_id} 校验失败，重新下载整个文件")
+            # 文件大小正确时下载会直接视为已完成，先删除损坏的文件
+            os.remove(file_path)
+        else:
+            return {"status": "error", "message": "下载没有记录校验值"}
+
+        downloaded = sum(segment.downloaded for segment in segments) if segments else 0
+        # 下载完成后签名链接通常已过期，重新下载前刷新
+        download_url = await self._refresh_download_url(video_id, download['url'])
+        self.active_downloads[video_id] = DownloadProgress(
+            video_id=video_id,
+            filename=download['filename'],
+            title=download['title'],
+            cover_url=download['cover_url'],
+            total_size=download['total_size'] or 0,
+            downloaded=downloaded,
+            status=DownloadStatus.QUEUED,
+            speed=0.0,
+            url=download_url,
+            created_at=download['created_at'],
+            retry_count=download['retry_count'] or 0,
+            max_retries=download['max_retries'] or 3,
+            segments=segments
+        )
+        if segments:
+            self.update_segments(video_id, segments)
+        await self.update_db(video_id, downloaded=downloaded, completed_at=None, checksum=None, error_message=None,
+                             url=download_url)
+        # 有分段记录时断点续传，只下载被重置的段
+        await self.queue_download(video_id, resume=segments is not None)
+        await self.broadcast_progress(video_id)
+        return {"status": "success", "message": "文件已损坏，重新下载损坏的部分", "corrupt_segments": corrupt}
 
     async def cancel_download(self, video_id: str):
         """取消下载"""
-        # 设置取消标志
+        # 设置取消标志，排队中的下载移出队列
         self.cancel_events[video_id] = True
+        self.scheduler.remove(video_id)
         
         # 解除暂停以便取消操作能够进行
         if video_id in self.pause_events:
@@ -857,6 +1259,7 @@ class DownloadManager:
         if video_id in self.active_downloads:
             self.active_downloads[video_id].status = DownloadStatus.CANCELLED
             self.active_downloads[video_id].speed = 0  # 重置下载速度
+            self.active_downloads[video_id].queue_position = None
             
             # 立即广播状态变化
             await self.broadcast_progress(video_id)
@@ -873,77 +1276,82 @@ class DownloadManager:
 
     async def check_existing_download(self, video_id: str) -> Optional[Dict[str, Any]]:
         """检查是否存在相同的下载"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute(
-                "SELECT * FROM downloads WHERE video_id = ?",
-                (video_id,)
-            ) as cursor:
-                row = await cursor.fetchone()
-                if row:
-                    return dict(row)
+        await self.flush_updates()
+        async with self.db.execute(
+            "SELECT * FROM downloads WHERE video_id = ?",
+            (video_id,)
+        ) as cursor:
+            row = await cursor.fetchone()
+            if row:
+                return dict(row)
         return None
 
     async def delete_download(self, video_id: str) -> bool:
         """删除下载记录和文件"""
         try:
             # 先检查下载是否处于活跃状态，如果是，先尝试取消
-            if video_id in self.active_downloads and self.active_downloads[video_id].status in ['downloading', 'paused', 'pending']:
+            if video_id in self.active_downloads and self.active_downloads[video_id].status in ['downloading', 'paused', 'pending', 'queued']:
                 logger.info(f"删除前自动取消下载: {video_id}")
                 await self.cancel_download(video_id)
                 # 等待一会儿确保取消操作完成
                 await asyncio.sleep(1)
             
-            async with aiosqlite.connect(self.db_path) as db:
-                # 获取文件名
-                async with db.execute(
-                    "SELECT filename, status FROM downloads WHERE video_id = ?",
-                    (video_id,)
-                ) as cursor:
-                    row = await cursor.fetchone()
-                    if not row:
-                        return False  # 记录不存在
+            # 获取文件名
+            async with self.db.execute(
+                "SELECT filename, status FROM downloads WHERE video_id = ?",
+                (video_id,)
+            ) as cursor:
+                row = await cursor.fetchone()
+                if not row:
+                    return False  # 记录不存在
                         
-                    filename = row[0]
-                    status = row[1]
+                filename = row[0]
+                status = row[1]
                     
-                    # 删除文件（如果是部分下载的文件也要删除）
-                    file_path = settings.DOWNLOAD_PATH / filename
-                    try:
-                        if await aiofiles.os.path.exists(file_path):
-                            await aiofiles.os.remove(file_path)
-                            logger.info(f"删除文件成功: {file_path}")
-                    except Exception as file_error:
-                        logger.error(f"删除文件失败: {str(file_error)}")
-                        # 继续删除数据库记录，即使文件删除失败
+                # 删除文件（如果是部分下载的文件也要删除）
+                file_path = settings.DOWNLOAD_PATH / filename
+                try:
+                    if await aiofiles.os.path.exists(file_path):
+                        await aiofiles.os.remove(file_path)
+                        logger.info(f"删除文件成功: {file_path}")
+                except Exception as file_error:
+                    logger.error(f"删除文件失败: {str(file_error)}")
+                    # 继续删除数据库记录，即使文件删除失败
                 
-                # 删除数据库记录
-                await db.execute("DELETE FROM downloads WHERE video_id = ?", (video_id,))
-                await db.commit()
-                logger.info(f"从数据库删除下载记录: {video_id}")
-
-                # 清理内存中的记录
-                if video_id in self.active_downloads:
-                    del self.active_downloads[video_id]
-                if video_id in self.pause_events:
-                    self.pause_events[video_id].set()  # 解除暂停
-                    del self.pause_events[video_id]
-                if video_id in self.cancel_events:
-                    del self.cancel_events[video_id]
-                # 清理速度计算数据
-                if hasattr(self, 'speedSmoother') and self.speedSmoother:
-                    self.speedSmoother.clearHistory(video_id)
+            # 删除数据库记录，丢弃尚未写入的进度
+            self.pending_updates.pop(video_id, None)
+            self.pending_segments.pop(video_id, None)
+            await self.db.execute("DELETE FROM downloads WHERE video_id = ?", (video_id,))
+            await self.db.execute("DELETE FROM download_segments WHERE video_id = ?", (video_id,))
+            await self.db.commit()
+            logger.info(f"从数据库删除下载记录: {video_id}")
 
-                return True
+            # 清理内存中的记录
+            if video_id in self.active_downloads:
+                del self.active_downloads[video_id]
+                # 通知客户端移除
+                self.broadcaster.mark(video_id)
+            if video_id in self.pause_events:
+                self.pause_events[video_id].set()  # 解除暂停
+                del self.pause_events[video_id]
+            if video_id in self.cancel_events:
+                del self.cancel_events[video_id]
+            self.bandwidth_limiter.remove_download(video_id)
+            # 清理速度计算数据
+            if hasattr(self, 'speedSmoother') and self.speedSmoother:
+                self.speedSmoother.clearHistory(video_id)
+
+            return True
         except Exception as e:
             logger.error(f"删除下载失败: {str(e)}")
             return False
 
-    async def start_download(self, video_id: str, force: bool = False):
+    async def start_download(self, video_id: str, force: bool = False, priority: int = 0):
         """
         启动下载
         :param video_id: 视频ID
         :param force: 是否强制重新下载已存在的视频
+        :param priority: 排队优先级，数值越小越优先
         """
         # 先检查是否有相同ID的下载记录
         existing_download = await self.check_existing_download(video_id)
@@ -963,6 +1371,8 @@ class DownloadManager:
             video_detail = await self.video_service.get_video_detail(video_id)
             if not video_detail:
                 return {"status": "error", "message": "视频不存在或获取失败"}
+            # 副标题等字段使用简体，标题保持上游原文
+            video_detail = to_locale(video_detail, DEFAULT_LOCALE, DETAIL_FIELDS)
             
             # 选择最佳的下载URL
             best_url = self._get_best_stream_url(video_detail.stream_urls)
@@ -978,30 +1388,29 @@ class DownloadManager:
             # 确保文件名唯一
             filename = f"{video_id}_{filename}.mp4"
             
-            # 创建下载记录
-            file_path = settings.DOWNLOAD_PATH / filename
-            
             # 预下载封面到本地（不阻塞主流程）
             # 如果下载失败也不影响视频下载，用户访问时会自动重试
             asyncio.create_task(self.download_cover(video_id, video_detail.cover_url))
             
             # 写入数据库（
-            async with aiosqlite.connect(self.db_path) as conn:
-                await conn.execute(
-                    "INSERT OR REPLACE INTO downloads (video_id, title, filename, cover_url, url, status, total_size, downloaded, retry_count) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                    (
-                        video_id, 
-                        video_detail.title, 
-                        filename, 
-                        video_detail.cover_url, 
-                        best_url, 
-                        DownloadStatus.PENDING,
-                        0,
-                        0,
-                        0
-                    )
+            self.pending_updates.pop(video_id, None)
+            self.pending_segments.pop(video_id, None)
+            await self.db.execute("DELETE FROM download_segments WHERE video_id = ?", (video_id,))
+            await self.db.execute(
+                "INSERT OR REPLACE INTO downloads (video_id, title, filename, cover_url, url, status, total_size, downloaded, retry_count) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    video_id, 
+                    video_detail.title, 
+                    filename, 
+                    video_detail.cover_url, 
+                    best_url, 
+                    DownloadStatus.PENDING,
+                    0,
+                    0,
+                    0
                 )
-                await conn.commit()
+            )
+            await self.db.commit()
             
             # 创建下载进度对象
             self.active_downloads[video_id] = DownloadProgress(
@@ -1017,13 +1426,13 @@ class DownloadManager:
                 created_at=datetime.now()
             )
             
-            # 广播初始状态
+            # 加入下载队列并广播初始状态
+            await self.queue_download(video_id, priority=priority)
             await self.broadcast_progress(video_id)
             
-            # 启动下载任务
-            asyncio.create_task(self.download_file(video_id, best_url, file_path))
-            
-            return {"status": "success", "message": "已开始下载"}
+            if self.scheduler.is_active(video_id):
+                return {"status": "success", "message": "已开始下载"}
+            return {"status": "success", "message": f"已加入下载队列，排在第 {self.scheduler.position(video_id)} 位"}
         except Exception as e:
             logger.error(f"启动下载失败: {str(e)}")
             return {"status": "error", "message": f"启动下载失败: {str(e)}"}
@@ -0,0 +1,145 @@
+import asyncio
+import itertools
+import time
+from typing import Any, Dict, Optional, Set, Tuple
+
+from app.models.video import SearchResults, VideoDetail
+from app.config import settings, logger
+from app.services.cache_service import cache_service
+from app.utils.cloudflare_bypass import cf_bypasser
+
+
+class PrefetchService:
+    """
+    预测性预取服务
+
+    根据用户浏览的详情页和搜索结果，在上游空闲时以低优先级预取
+    系列下一集、前K个相关视频详情以及下一页搜索结果，填充共享缓存。
+    """
+
+    # 预取优先级（数值越小越优先）
+    PRIORITY_NEXT_EPISODE = 0
+    PRIORITY_NEXT_PAGE = 1
+    PRIORITY_RELATED = 2
+
+    def __init__(self):
+        self.enabled = settings.PREFETCH_ENABLED
+        self.related_count = settings.PREFETCH_RELATED_COUNT
+        self.max_per_minute = settings.PREFETCH_MAX_PER_MINUTE
+        self.idle_delay = settings.PREFETCH_IDLE_DELAY
+
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue(maxsize=settings.PREFETCH_QUEUE_SIZE)
+        self.pending_keys: Set[str] = set()  # 已排队的任务键，避免重复排队
+        self._sequence = itertools.count()  # 同优先级按入队顺序处理
+        self._worker: Optional[asyncio.Task] = None
+
+        # 预算窗口：每分钟最多预取 max_per_minute 个
+        self._window_start = 0.0
+        self._window_count = 0
+
+        self.stats = {"queued": 0, "dropped": 0, "fetched": 0, "failed": 0}
+
+    def start(self):
+        """启动后台预取任务"""
+        if not self.enabled or self._worker:
+            return
+        self._worker = asyncio.create_task(self._run())
+        logger.info("预取服务已启动")
+
+    async def stop(self):
+        """停止后台预取任务"""
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def on_video_detail(self, video: VideoDetail):
+        """用户打开详情页后，预取系列下一集和前K个相关视频"""
+        if not self.enabled or not video or not video.title:
+            return
+
+        # 系列视频中当前视频的下一集
+        series_ids = [item.video_id for item in video.series_videos or []]
+        if video.video_id in series_ids:
+            index = series_ids.index(video.video_id)
+            if index + 1 < len(series_ids):
+                self._enqueue_detail(series_ids[index + 1], self.PRIORITY_NEXT_EPISODE)
+
+        # 相关视频（优先详细相关视频，其次基础相关视频）
+        related = video.detailed_related_videos or video.basic_related_videos
+        for item in related[:self.related_count]:
+            self._enqueue_detail(item.video_id, self.PRIORITY_RELATED)
+
+    def on_search(self, params: Dict[str, Any], results: SearchResults):
+        """用户搜索后，预取下一页搜索结果"""
+        if not self.enabled or not results or not results.has_next:
+            return
+
+        next_params = dict(params, page=params.get("page", 1) + 1)
+        if cache_service.has_search_results(**next_params):
+            return
+        self._enqueue(self.PRIORITY_NEXT_PAGE, cache_service.search_key(**next_params), "search", next_params)
+
+    def _enqueue_detail(self, video_id: str, priority: int):
+        """排队预取视频详情"""
+        if not video_id or cache_service.has_video_detail(video_id):
+            return
+        self._enqueue(priority, cache_service.detail_key(video_id), "detail", video_id)
+
+    def _enqueue(self, priority: int, key: str, kind: str, payload: Any):
+        """加入预取队列，队列已满时直接丢弃"""
+        if key in self.pending_keys:
+            return
+        try:
+            self.queue.put_nowait((priority, next(self._sequence), key, kind, payload))
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            return
+        self.pending_keys.add(key)
+        self.stats["queued"] += 1
+
+    async def _wait_for_budget(self):
+        """等待预算窗口，超出每分钟预取上限时休眠到下一个窗口"""
+        now = time.monotonic()
+        if now - self._window_start >= 60:
+            self._window_start = now
+            self._window_count = 0
+        if self._window_count >= self.max_per_minute:
+            await asyncio.sleep(60 - (now - self._window_start))
+            self._window_start = time.monotonic()
+            self._window_count = 0
+        self._window_count += 1
+
+    async def _run(self):
+        """后台预取循环"""
+        while True:
+            item: Tuple = await self.queue.get()
+            _, _, key, kind, payload = item
+            try:
+                await self._wait_for_budget()
+                await cf_bypasser.wait_until_idle(self.idle_delay)
+
+                if kind == "detail":
+                    if not cache_service.has_video_detail(payload):
+                        await cache_service.get_video_detail(payload)
+                elif kind == "search":
+                    if not cache_service.has_search_results(**payload):
+                        await cache_service.search_videos(**payload)
+
+                self.stats["fetched"] += 1
+                logger.debug(f"预取完成: {key}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.warning(f"预取失败: {key}, {str(e)}")
+            finally:
+                self.pending_keys.discard(key)
+                self.queue.task_done()
+
+
+# 全局单例
+prefetch_service = PrefetchService()
@@ -3,13 +3,227 @@ from DrissionPage.common import make_session_ele
 from app.models.video import *
 from app.config import settings, logger
 from app.utils.cloudflare_bypass import cf_bypasser
+from app.utils.ttl_lru_cache import LRUCache
+from app.utils.periodic_task import PeriodicTask
+from app.utils.locale import DEFAULT_LOCALE, DETAIL_FIELDS, localize
 
+import asyncio
 import re
 import json
 
+# 预告卡片中的日期，如 2024-10-25、2024/10/25、2024年10月25日
+_DATE_PATTERN = re.compile(r'(\d{4})\s*[-/年]\s*(\d{1,2})\s*[-/月]\s*(\d{1,2})')
+# 只有月日的日期，如 10月25日、10/25
+_MONTH_DAY_PATTERN = re.compile(r'(\d{1,2})\s*[/月]\s*(\d{1,2})\s*日?')
+_VIDEO_ID_PATTERN = re.compile(r'watch\?v=(\d+)')
+
 
 class PreviewService:
+    """
+    新番预告服务
+
+    抓取并解析站点的月度新番预告页（/previews/yyyymm）。页面解析在线程池中进行，不阻塞事件循环；
+    结果按月份缓存（已结束的月份长期缓存，当月及以后的月份短期缓存），并转换好简繁两个版本。
+    后台任务在低峰时段预取当月和下个月的预告。
+    """
+
     def __init__(self):
         """初始化视频预览服务"""
         self.cf_bypasser = cf_bypasser
+        self.previews_cache = LRUCache(maxsize=24, ttl=settings.PREVIEW_CURRENT_TTL)
+        self.prefetch_hours = self._parse_hours(settings.PREVIEW_PREFETCH_HOURS)
+        self.last_prefetch_date = None
+        self.prefetch_task = PeriodicTask(
+            "新番预告预取",
+            self.prefetch_upcoming,
+            interval=settings.PREVIEW_PREFETCH_CHECK_INTERVAL,
+            initial_delay=60
+        )
+
+    @staticmethod
+    def _parse_hours(hours: str) -> range:
+        """解析低峰时段配置，如 "3-6" 表示 3:00 到 6:59"""
+        try:
+            start, _, end = hours.partition("-")
+            return range(int(start), int(end or start) + 1)
+        except ValueError:
+            logger.warning(f"无效的新番预告预取时段配置: {hours}，使用默认值 3-6")
+            return range(3, 7)
+
+    @staticmethod
+    def previews_key(year: int, month: int) -> str:
+        """预告缓存键"""
+        return f"previews:{year}{month:02d}"
+
+    @staticmethod
+    def is_past_month(year: int, month: int) -> bool:
+        """是否为已经结束的月份"""
+        now = datetime.now()
+        return (year, month) < (now.year, now.month)
+
+    def previews_ttl(self, year: int, month: int) -> int:
+        """已结束的月份预告不再变化，长TTL；当月及以后的月份短TTL"""
+        return settings.PREVIEW_PAST_TTL if self.is_past_month(year, month) else settings.PREVIEW_CURRENT_TTL
+
+    async def get_monthly_previews(self, year: int, month: int, refresh: bool = False,
+                                   locale: str = DEFAULT_LOCALE) -> MonthlyPreviews:
+        """
+        获取月度新番预告
+
+        Args:
+            year: 年份
+            month: 月份
+            refresh: 为True时跳过缓存，重新抓取
+            locale: 返回结果的语言区域
+        """
+        key = self.previews_key(year, month)
+        ttl = self.previews_ttl(year, month)
+
+        async def loader():
+            return localize(await self._fetch_previews(year, month), DETAIL_FIELDS)
+
+        # 抓取失败（没有任何视频）不缓存
+        cacheable = lambda variants: bool(variants[DEFAULT_LOCALE].videos)
+        if refresh:
+            variants = await self.previews_cache.load(key, loader, ttl=ttl, cacheable=cacheable)
+        else:
+            variants = await self.previews_cache.get_or_load(key, loader, ttl=ttl, cacheable=cacheable)
+        return variants[locale]
+
+    async def _fetch_previews(self, year: int, month: int) -> MonthlyPreviews:
+        """请求预告页并在线程池中解析"""
+        previews_url = f"{settings.HANIME_BASE_URL}/previews/{year}{month:02d}"
+        try:
+            page_content = await self.cf_bypasser.get_request(previews_url)
+        except Exception as e:
+            logger.error(f"获取新番预告失败: {year}-{month:02d}, {str(e)}")
+            page_content = ""
+
+        videos = []
+        if page_content:
+            videos = await asyncio.to_thread(self._parse_previews, page_content, year)
+        logger.info(f"获取新番预告: {year}-{month:02d}, 共 {len(videos)} 个")
+        return MonthlyPreviews(
+            year=year,
+            month=month,
+            total=len(videos),
+            videos=videos,
+            generated_at=datetime.now()
+        )
+
+    def _parse_previews(self, page_content: str, year: int) -> List[PreviewVideo]:
+        """解析预告页中的所有预告卡片"""
+        page_ele = make_session_ele(page_content)
+
+        # 每个预告以标题为锚点，向上找到包含该标题的卡片容器
+        title_eles = page_ele.s_eles(
+            "xpath://*[contains(@class, 'preview')]//*[self::h4 or self::h3][normalize-space()]")
+        videos = []
+        seen_titles = set()
+        for title_ele in title_eles:
+            try:
+                video = self._parse_preview_card(title_ele, year)
+            except Exception as e:
+                logger.warning(f"解析新番预告卡片失败: {str(e)}")
+                continue
+            if video and video.title not in seen_titles:
+                seen_titles.add(video.title)
+                videos.append(video)
+        return videos
+
+    def _parse_preview_card(self, title_ele, year: int) -> Optional[PreviewVideo]:
+        """从标题元素所在的卡片中提取预告信息"""
+        title = title_ele.text.strip()
+        if not title:
+            return None
+        card = self._find_card(title_ele)
+
+        subtitle_ele = title_ele.s_ele("xpath:./following-sibling::*[self::h5 or self::h6][1]")
+        subtitle = subtitle_ele.text.strip() if subtitle_ele else ""
+
+        cover_ele = card.s_ele("xpath:.//img[@src]")
+        cover_url = cover_ele.attr("src") if cover_ele else ""
+
+        trailer_ele = card.s_ele("xpath:.//video//source[@src] | .//video[@src]")
+        trailer_url = trailer_ele.attr("src") if trailer_ele else ""
+
+        link_ele = card.s_ele("xpath:.//a[contains(@href, 'watch?v=')]")
+        video_id_match = _VIDEO_ID_PATTERN.search(link_ele.attr("href") or "") if link_ele else None
+
+        tag_eles = card.s_eles("xpath:.//*[contains(@class, 'tag')][not(*)]")
+        tags = [tag_ele.text.strip().lstrip("#").strip() for tag_ele in tag_eles if tag_ele.text.strip()]
+
+        description_ele = card.s_ele("xpath:.//*[contains(@class, 'description') or contains(@class, 'caption')]")
+        description = description_ele.text.strip() if description_ele else ""
+
+        card_text = card.text or ""
+        return PreviewVideo(
+            title=title,
+            video_id=video_id_match.group(1) if video_id_match else "",
+            subtitle=subtitle,
+            cover_url=cover_url,
+            release_date=self._parse_release_date(card_text, year),
+            studio=self._parse_studio(card),
+            description=description,
+            tags=list(dict.fromkeys(tags)),
+            trailer_url=trailer_url
+        )
+
+    @staticmethod
+    def _find_card(title_ele):
+        """从标题向上找到只包含这一个标题的最外层容器，即该预告的卡片"""
+        card = title_ele.parent()
+        while True:
+            parent = card.parent()
+            if not parent or parent.tag in ("body", "html"):
+                return card
+            if len(parent.s_eles("xpath:.//*[self::h4 or self::h3][normalize-space()]")) > 1:
+                return card
+            card = parent
+
+    @staticmethod
+    def _parse_release_date(text: str, year: int) -> str:
+        """提取发行日期，只有月日时使用页面所属年份"""
+        match = _DATE_PATTERN.search(text)
+        if match:
+            return f"{int(match.group(1)):04d}-{int(match.group(2)):02d}-{int(match.group(3)):02d}"
+        match = _MONTH_DAY_PATTERN.search(text)
+        if match and 1 <= int(match.group(1)) <= 12:
+            return f"{year:04d}-{int(match.group(1)):02d}-{int(match.group(2)):02d}"
+        return ""
+
+    @staticmethod
+    def _parse_studio(card) -> str:
+        """提取制作商：优先使用发行商搜索链接，其次使用“製作商”之后的文本"""
+        studio_ele = card.s_ele("xpath:.//a[contains(@href, 'query=') or contains(@href, 'artist')]")
+        if studio_ele and studio_ele.text.strip():
+            return studio_ele.text.strip()
+        match = re.search(r'(?:製作商|制作商|製作|制作)\s*[:：]?\s*(\S+)', card.text or "")
+        return match.group(1) if match else ""
+
+    async def prefetch_upcoming(self):
+        """低峰时段每天预取一次当月和下个月的预告"""
+        now = datetime.now()
+        if now.hour not in self.prefetch_hours or self.last_prefetch_date == now.date():
+            return
+
+        next_year, next_month = (now.year, now.month + 1) if now.month < 12 else (now.year + 1, 1)
+        completed = True
+        for year, month in ((now.year, now.month), (next_year, next_month)):
+            await self.cf_bypasser.wait_until_idle(settings.PREFETCH_IDLE_DELAY)
+            try:
+                previews = await self.get_monthly_previews(year, month, refresh=True)
+            except Exception as e:
+                logger.warning(f"预取新番预告失败: {year}-{month:02d}, {str(e)}")
+                completed = False
+                continue
+            # 空结果不会写入缓存，低峰时段内下次检查时重试
+            if not previews.videos:
+                completed = False
+
+        if completed:
+            self.last_prefetch_date = now.date()
+
 
+# 全局单例
+preview_service = PreviewService()
@@ -0,0 +1,256 @@
+import asyncio
+import json
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import WebSocket
+
+from app.config import logger
+from app.models.download import DownloadProgress
+from app.utils.periodic_task import PeriodicTask
+
+
+def serialize_progress(progress: DownloadProgress) -> Dict[str, Any]:
+    """转换为可以直接编码为JSON的字典"""
+    data = progress.model_dump(mode="json")
+    data['speed'] = round(data['speed'], 2)
+    return data
+
+
+def encode_frame(frame: Dict[str, Any]) -> str:
+    return json.dumps(frame, ensure_ascii=False, separators=(",", ":"))
+
+
+class ClientConnection:
+    """一个 WebSocket 客户端：有界发送队列，由独立的发送任务发送，发送慢不影响其他客户端"""
+
+    def __init__(self, websocket: WebSocket, max_queue: int):
+        self.websocket = websocket
+        self.max_queue = max_queue
+        # 订阅的下载，None 表示订阅全部
+        self.video_ids: Optional[Set[str]] = None
+        self.queue: Deque[str] = deque()
+        self.wakeup = asyncio.Event()
+        # 需要发送完整快照：新连接，或积压过多丢弃了中间帧
+        self.resync = True
+        self.dropped = 0
+        self.task: Optional[asyncio.Task] = None
+
+    def push(self, frame: str):
+        """加入发送队列，不等待发送完成"""
+        if self.resync:
+            # 快照在发送时生成，已包含这一帧的变化
+            return
+        if len(self.queue) >= self.max_queue:
+            # 客户端跟不上：丢弃积压的中间帧，之后用一个完整快照重新同步
+            self.dropped += len(self.queue) + 1
+            self.queue.clear()
+            self.resync = True
+        else:
+            self.queue.append(frame)
+        self.wakeup.set()
+
+
+class ProgressBroadcaster:
+    """
+    下载进度广播
+
+    - 下载进度变化时只做标记，由后台任务每个周期统一收集一次；
+    - 与客户端已知的状态比较，只发送变化的字段，所有下载的变化合并为一个增量帧，编码一次后发送给所有客户端；
+    - 每个客户端有独立的有界发送队列，积压过多时丢弃中间帧，之后发送完整快照重新同步；
+    - 客户端可以订阅全部下载或指定的视频ID，按订阅分组路由，相同订阅内容的帧只编码一次。
+
+    帧格式（只包含客户端订阅的下载）：
+    - {"type": "snapshot", "seq": n, "downloads": {video_id: 完整进度}}
+    - {"type": "delta", "seq": n, "downloads": {video_id: 变化的字段}, "removed": [video_id]}
+    """
+
+    def __init__(self, source: Callable[[], Dict[str, DownloadProgress]], interval: float, max_queue: int):
+        """
+        Args:
+            source: 返回当前所有下载进度的函数
+            interval: 广播周期（秒）
+            max_queue: 每个客户端最多积压的帧数
+        """
+        self.source = source
+        self.max_queue = max(1, max_queue)
+        self.clients: Dict[WebSocket, ClientConnection] = {}
+        # 订阅全部下载的客户端，以及按视频ID的订阅者集合
+        self.all_subscribers: Set[ClientConnection] = set()
+        self.topics: Dict[str, Set[ClientConnection]] = {}
+        self.changed: Set[str] = set()
+        # 客户端已知的状态，即截至最近一个增量帧的各下载进度，快照由此生成
+        self.state: Dict[str, Dict[str, Any]] = {}
+        self.seq = 0
+        self._snapshot: Optional[Tuple[int, str]] = None
+        self.frames = 0
+        self.task = PeriodicTask("下载进度广播", self.flush, interval=interval)
+
+    def mark(self, video_id: str):
+        """标记下载进度有变化，下一个周期广播"""
+        self.changed.add(video_id)
+
+    def connect(self, websocket: WebSocket, video_ids: Optional[Iterable[str]] = None) -> ClientConnection:
+        """
+        注册新客户端，首先发送订阅范围内的完整快照
+
+        Args:
+            websocket: 客户端连接
+            video_ids: 订阅的视频ID，None 表示订阅全部
+        """
+        self._sync_state()
+        client = ClientConnection(websocket, self.max_queue)
+        self._set_subscription(client, video_ids)
+        self.clients[websocket] = client
+        client.task = asyncio.create_task(self._send_loop(client))
+        client.wakeup.set()
+        self.task.start()
+        return client
+
+    def subscribe(self, websocket: WebSocket, video_ids: Optional[Iterable[str]] = None):
+        """更换客户端的订阅，之后重新发送新订阅范围内的快照"""
+        client = self.clients.get(websocket)
+        if client is None:
+            return
+        self._sync_state()
+        self._set_subscription(client, video_ids)
+        client.queue.clear()
+        client.resync = True
+        client.wakeup.set()
+
+    def _set_subscription(self, client: ClientConnection, video_ids: Optional[Iterable[str]]):
+        self._unsubscribe(client)
+        client.video_ids = None if video_ids is None else set(video_ids)
+        if client.video_ids is None:
+            self.all_subscribers.add(client)
+            return
+        for video_id in client.video_ids:
+            self.topics.setdefault(video_id, set()).add(client)
+
+    def _unsubscribe(self, client: ClientConnection):
+        self.all_subscribers.discard(client)
+        for video_id in client.video_ids or ():
+            subscribers = self.topics.get(video_id)
+            if subscribers is not None:
+                subscribers.discard(client)
+                if not subscribers:
+                    del self.topics[video_id]
+
+    def _sync_state(self):
+        """把尚未广播过的下载（如启动时恢复的暂停下载）收进已知状态，快照才完整"""
+        for video_id in self.source():
+            if video_id not in self.state:
+                self.mark(video_id)
+        self._collect()
+
+    async def disconnect(self, websocket: WebSocket):
+        client = self.clients.pop(websocket, None)
+        if client is not None:
+            self._unsubscribe(client)
+        if client is not None and client.task is not None:
+            client.task.cancel()
+            try:
+                await client.task
+            except asyncio.CancelledError:
+                pass
+
+    async def flush(self):
+        """收集本周期的变化并发送"""
+        self._collect()
+
+    def _collect(self):
+        if not self.changed:
+            return
+        changed, self.changed = self.changed, set()
+        downloads = self.source()
+        delta: Dict[str, Dict[str, Any]] = {}
+        removed = []
+        for video_id in changed:
+            progress = downloads.get(video_id)
+            if progress is None:
+                if self.state.pop(video_id, None) is not None:
+                    removed.append(video_id)
+                continue
+            data = serialize_progress(progress)
+            previous = self.state.get(video_id)
+            fields = data if previous is None else {k: v for k, v in data.items() if previous.get(k) != v}
+            if fields:
+                delta[video_id] = fields
+                self.state[video_id] = data
+        if not delta and not removed:
+            return
+
+        self.seq += 1
+        if not self.clients:
+            return
+
+        if self.all_subscribers:
+            text = self._delta_frame(delta, removed)
+            for client in self.all_subscribers:
+                client.push(text)
+
+        # 只订阅部分下载的客户端：按订阅者集合找出各自相关的变化，相同的组合只编码一次
+        relevant: Dict[ClientConnection, List[str]] = {}
+        for video_id in [*delta, *removed]:
+            for client in self.topics.get(video_id, ()):
+                relevant.setdefault(client, []).append(video_id)
+        encoded: Dict[Tuple[str, ...], str] = {}
+        for client, video_ids in relevant.items():
+            key = tuple(video_ids)
+            text = encoded.get(key)
+            if text is None:
+                text = encoded[key] = self._delta_frame(
+                    {video_id: delta[video_id] for video_id in video_ids if video_id in delta},
+                    [video_id for video_id in video_ids if video_id not in delta]
+                )
+            client.push(text)
+
+    def _delta_frame(self, delta: Dict[str, Dict[str, Any]], removed: List[str]) -> str:
+        frame: Dict[str, Any] = {"type": "delta", "seq": self.seq, "downloads": delta}
+        if removed:
+            frame["removed"] = removed
+        self.frames += 1
+        return encode_frame(frame)
+
+    def snapshot_frame(self, video_ids: Optional[Set[str]] = None) -> str:
+        """当前已知状态的完整快照，订阅全部时同一个序号下只编码一次"""
+        if video_ids is not None:
+            downloads = {video_id: self.state[video_id] for video_id in video_ids if video_id in self.state}
+            return encode_frame({"type": "snapshot", "seq": self.seq, "downloads": downloads})
+        if self._snapshot is None or self._snapshot[0] != self.seq:
+            text = encode_frame({"type": "snapshot", "seq": self.seq, "downloads": self.state})
+            self._snapshot = (self.seq, text)
+        return self._snapshot[1]
+
+    async def _send_loop(self, client: ClientConnection):
+        try:
+            while True:
+                await client.wakeup.wait()
+                client.wakeup.clear()
+                if client.resync:
+                    client.resync = False
+                    await client.websocket.send_text(self.snapshot_frame(client.video_ids))
+                while client.queue and not client.resync:
+                    await client.websocket.send_text(client.queue.popleft())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug(f"WebSocket发送失败，移除连接: {str(e)}")
+            self.clients.pop(client.websocket, None)
+            self._unsubscribe(client)
+
+    async def stop(self):
+        """停止广播并断开所有客户端的发送任务"""
+        await self.task.stop()
+        for websocket in list(self.clients):
+            await self.disconnect(websocket)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "clients": len(self.clients),
+            "all_subscribers": len(self.all_subscribers),
+            "topics": len(self.topics),
+            "seq": self.seq,
+            "frames": self.frames,
+            "dropped": sum(client.dropped for client in self.clients.values()),
+        }
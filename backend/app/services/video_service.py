@@ -3,13 +3,34 @@ from DrissionPage.common import make_session_ele
 from app.models.video import *
 from app.config import settings, logger
 from app.utils.cloudflare_bypass import cf_bypasser
-from app.utils.chinese_converter import to_simplified, convert_dict, convert_list
+from app.services.catalog_service import catalog_service
+from app.utils.ttl_lru_cache import LRUCache
 
 import re
 import json
+import html
+import time
 import asyncio
 
 
+# 播放页 <video id="player"> 标签的快速扫描正则，group(1) 为开始标签的属性，group(2) 为标签内部
+_PLAYER_VIDEO_PATTERN = re.compile(
+    r'<video\b([^>]*\bid\s*=\s*["\']player["\'][^>]*)>(.*?)</video>', re.S | re.I)
+_SOURCE_TAG_PATTERN = re.compile(r'<source\b([^>]*)>', re.I)
+_HTML_ATTR_PATTERN = re.compile(r'([\w-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+
+# 签名链接中的过期时间戳，例如 ?secure=7B0ISpEJXmdy5cRMl0QQKA==,1749868212 或 ?expires=1749868212
+_SIGNATURE_EXPIRY_PATTERN = re.compile(r'[?&](?:secure=[^&,]*,|expires=|e=)(\d{10})\b')
+
+# 视频卡片中的日期，例如 2024-01-05 或 2024/1/5
+_CARD_DATE_PATTERN = re.compile(r'(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})')
+
+# 播放流缓存：默认10分钟，遇到签名链接时以签名过期时间为准（提前60秒失效）
+STREAM_CACHE_TTL = 600
+STREAM_EXPIRY_MARGIN = 60
+stream_url_cache = LRUCache(maxsize=200, ttl=STREAM_CACHE_TTL)
+
+
 class VideoService:
     def __init__(self):
         """初始化视频服务"""
@@ -136,9 +157,11 @@ class VideoService:
             video_info = self._extract_detailed_video_info(video_ele)
             video_info_list.append(video_info)
 
+        catalog_service.record_videos(video_info_list)
+
         section_videos.append({
             "title": display_name,
-            "search_suffix": to_simplified(search_suffix),
+            "search_suffix": search_suffix,
             "videos": video_info_list
         })
 
@@ -194,10 +217,15 @@ class VideoService:
 
             # 获取发行商信息
             studio = {}
+            release_date = ""
             studio_ele = video_ele.ele("xpath:.//div[contains(@class, 'subtitle')]//a")
             if studio_ele:
                 full_text = studio_ele.text.strip()
                 studio_name = full_text.split("•")[0].strip() if "•" in full_text else full_text
+                # "•" 之后可能带有日期
+                date_match = _CARD_DATE_PATTERN.search(full_text)
+                if date_match:
+                    release_date = "{}-{:0>2}-{:0>2}".format(*date_match.groups())
                 studio_url = studio_ele.attr("href") if studio_ele else ""
                 # 从URL中提取查询参数
                 studio_query = studio_url.split("?")[1] if studio_url and "?" in studio_url else ""
@@ -215,7 +243,8 @@ class VideoService:
                 view_count=self._parse_views(views_text),
                 like_rate=like_rate,
                 # like_count=like_count,
-                studio=studio
+                studio=studio,
+                release_date=release_date
             )
 
         except Exception as e:
@@ -388,8 +417,8 @@ class VideoService:
             video_type_query = video_type_url.split("?")[1] if video_type_url and "?" in video_type_url else ""
 
             video_type = VideoType(
-                name=to_simplified(video_type_name),
-                query=to_simplified(video_type_query)
+                name=video_type_name,
+                query=video_type_query
             )
 
             # 获取标题、描述等基本信息
@@ -433,9 +462,9 @@ class VideoService:
             video_detail = VideoDetail(
                 video_id=video_id,
                 title=video_title,
-                subtitle=to_simplified(subtitle),
+                subtitle=subtitle,
                 cover_url=cover_url,
-                description=to_simplified(description),
+                description=description,
                 default_video_url=default_video_url,
                 stream_urls=stream_urls_list,
                 view_count=self._parse_views(views_str),
@@ -448,6 +477,8 @@ class VideoService:
                 detailed_related_videos=detailed_related_videos
             )
 
+            catalog_service.record_detail(video_detail)
+
             return video_detail
 
         except Exception as e:
@@ -457,6 +488,103 @@ class VideoService:
 
             return VideoDetail(video_id=video_id, title="")
 
+    async def resolve_stream_urls(self, video_id: str) -> Optional[VideoStreamInfo]:
+        """
+        快速解析视频播放流地址
+
+        只扫描播放页中的 <video id="player"> 片段获取 source 和 poster，
+        不构建完整 DOM；扫描结果校验失败时回退到 DOM 解析。
+        结果按签名过期时间缓存。
+        """
+        cached = stream_url_cache.get(video_id)
+        if cached is not None:
+            return cached
+
+        try:
+            video_url = f"{settings.HANIME_BASE_URL}/watch?v={video_id}"
+            page_content = await self.cf_bypasser.get_request(video_url)
+            if not page_content:
+                logger.error(f"解析播放流失败: 无法获取页面内容, video_id={video_id}")
+                return None
+
+            stream_info = self._scan_stream_info(video_id, page_content)
+            if not stream_info:
+                logger.warning(f"播放流快速扫描校验失败，回退到 DOM 解析: video_id={video_id}")
+                page_ele = make_session_ele(page_content)
+                video_elem = page_ele.s_ele('xpath://video[@id="player"]')
+                stream_urls_list = self._extract_stream_urls(video_elem)
+                stream_info = VideoStreamInfo(
+                    video_id=video_id,
+                    cover_url=(video_elem.attr("poster") if video_elem else None) or "",
+                    default_video_url=stream_urls_list[0].url if stream_urls_list else "",
+                    stream_urls=stream_urls_list,
+                )
+
+            if not stream_info.stream_urls:
+                return stream_info
+
+            stream_info.expires_at = self._get_signature_expiry(stream_info.stream_urls)
+            ttl = STREAM_CACHE_TTL
+            if stream_info.expires_at:
+                ttl = min(ttl, stream_info.expires_at - int(time.time()) - STREAM_EXPIRY_MARGIN)
+            if ttl > 0:
+                stream_url_cache.set(video_id, stream_info, ttl=ttl)
+
+            return stream_info
+
+        except Exception as e:
+            logger.error(f"解析播放流错误: {str(e)}")
+            return None
+
+    def _scan_stream_info(self, video_id: str, page_content: str) -> Optional[VideoStreamInfo]:
+        """用正则扫描播放器片段，校验不通过时返回None"""
+        video_match = _PLAYER_VIDEO_PATTERN.search(page_content)
+        if not video_match:
+            return None
+
+        video_attrs = self._parse_html_attrs(video_match.group(1))
+        stream_urls_list = []
+        for source_match in _SOURCE_TAG_PATTERN.finditer(video_match.group(2)):
+            source_attrs = self._parse_html_attrs(source_match.group(1))
+            source_url = source_attrs.get("src", "")
+            # 校验：源地址必须是完整的 http(s) 链接
+            if not source_url.startswith(("http://", "https://")):
+                return None
+            size = source_attrs.get("size", "")
+            stream_urls_list.append(
+                VideoStreamUrl(
+                    quality=size + "p" if size else "unknown",
+                    url=source_url
+                ))
+
+        if not stream_urls_list:
+            return None
+
+        return VideoStreamInfo(
+            video_id=video_id,
+            cover_url=video_attrs.get("poster", ""),
+            default_video_url=stream_urls_list[0].url,
+            stream_urls=stream_urls_list,
+        )
+
+    @staticmethod
+    def _parse_html_attrs(attrs_text: str) -> Dict[str, str]:
+        """解析标签属性文本为字典"""
+        attrs = {}
+        for name, double_quoted, single_quoted in _HTML_ATTR_PATTERN.findall(attrs_text):
+            attrs[name.lower()] = html.unescape(double_quoted or single_quoted)
+        return attrs
+
+    @staticmethod
+    def _get_signature_expiry(stream_urls: List[VideoStreamUrl]) -> Optional[int]:
+        """获取签名链接中最早的过期时间戳"""
+        expiries = []
+        for stream_url in stream_urls:
+            match = _SIGNATURE_EXPIRY_PATTERN.search(stream_url.url)
+            if match:
+                expiries.append(int(match.group(1)))
+        return min(expiries) if expiries else None
+
     # 获取视频评论
     async def get_video_comments(self, video_id: str) -> List[VideoComment]:
         """获取视频播放评论"""
@@ -708,8 +836,8 @@ class VideoService:
             if tag_name:  # 确保名称非空
                 tags.append(
                     VideoTag(
-                        name=to_simplified(tag_name),
-                        query=to_simplified(tag_search_query)
+                        name=tag_name,
+                        query=tag_search_query
                     )
                 )
         return tags
@@ -859,9 +987,9 @@ class VideoService:
                 sort_by_options.append(sort_by_name)
 
             return SearchCombination(
-                video_types=convert_list(video_types),
-                tags=convert_dict(tags_dict),
-                sort=convert_list(sort_by_options)
+                video_types=video_types,
+                tags=tags_dict,
+                sort=sort_by_options
             )
 
         except Exception as e:
@@ -978,6 +1106,8 @@ class VideoService:
                     if video_info:
                         basic_video_list.append(video_info)
 
+            catalog_service.record_videos(detailed_video_list + basic_video_list)
+
             # 创建搜索结果
             return SearchResults(
                 total_pages=total_pages,
@@ -0,0 +1,149 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
+from app.config import settings, logger
+
+
+class TokenBucket:
+    """
+    令牌桶
+
+    令牌按 rate（字节/秒）匀速补充，最多积累 1 秒的量。取用时允许透支，
+    调用方按透支量等待，保证长期平均速率不超过 rate。rate 为 0 表示不限速。
+    """
+
+    def __init__(self, rate: float = 0):
+        self.rate = max(0.0, rate)
+        self.tokens = self.rate
+        self.updated = time.monotonic()
+
+    @property
+    def limited(self) -> bool:
+        return self.rate > 0
+
+    def set_rate(self, rate: float):
+        """调整速率，已积累的令牌不超过新的桶容量"""
+        self._refill()
+        self.rate = max(0.0, rate)
+        self.tokens = min(self.tokens, self.rate)
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate > 0:
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: int) -> float:
+        """取用令牌，返回需要等待的秒数"""
+        if not self.limited:
+            return 0.0
+        self._refill()
+        self.tokens -= amount
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class BandwidthLimiter:
+    """
+    分层带宽限制
+
+    - 全局限速：所有下载共用一个令牌桶；
+    - 单个下载限速：每个下载可以单独设置，未设置时使用默认值；
+    - 视频播放预留：有视频流在播放时，全局限速中预留一部分给 /stream/proxy，下载只能使用剩余部分。
+
+    下载读取数据时需要同时取得全局和自身的令牌，等待时间取两者中较长的一个。
+    """
+
+    def __init__(self):
+        self.global_limit = settings.DOWNLOAD_RATE_LIMIT
+        self.default_download_limit = settings.DOWNLOAD_PER_RATE_LIMIT
+        self.streaming_reserve = settings.STREAMING_RESERVED_SHARE
+        self.global_bucket = TokenBucket(self.global_limit)
+        self.download_limits: Dict[str, float] = {}
+        self.download_buckets: Dict[str, TokenBucket] = {}
+        self.active_streams = 0
+
+    @property
+    def effective_global_limit(self) -> float:
+        """下载实际可用的全局速率（字节/秒），0 表示不限速"""
+        if self.global_limit > 0 and self.active_streams > 0:
+            return self.global_limit * (1 - self.streaming_reserve)
+        return self.global_limit
+
+    def download_limit(self, video_id: str) -> float:
+        """单个下载的限速（字节/秒），0 表示不限速"""
+        return self.download_limits.get(video_id, self.default_download_limit)
+
+    def effective_limit(self, video_id: str) -> Optional[float]:
+        """单个下载当前生效的限速，不限速时返回None"""
+        limits = [limit for limit in (self.effective_global_limit, self.download_limit(video_id)) if limit > 0]
+        return min(limits) if limits else None
+
+    def _download_bucket(self, video_id: str) -> TokenBucket:
+        bucket = self.download_buckets.get(video_id)
+        limit = self.download_limit(video_id)
+        if bucket is None:
+            bucket = self.download_buckets[video_id] = TokenBucket(limit)
+        elif bucket.rate != limit:
+            bucket.set_rate(limit)
+        return bucket
+
+    async def consume(self, video_id: str, amount: int):
+        """下载读取 amount 字节数据后调用，超出限速时等待"""
+        delay = max(
+            self.global_bucket.reserve(amount),
+            self._download_bucket(video_id).reserve(amount)
+        )
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def configure(self, global_limit: Optional[float] = None, default_download_limit: Optional[float] = None,
+                  streaming_reserve: Optional[float] = None):
+        """运行时调整限速设置，未传入的项保持不变"""
+        if global_limit is not None:
+            self.global_limit = max(0.0, global_limit)
+        if default_download_limit is not None:
+            self.default_download_limit = max(0.0, default_download_limit)
+        if streaming_reserve is not None:
+            self.streaming_reserve = min(1.0, max(0.0, streaming_reserve))
+        self._update_global_rate()
+        logger.info(f"带宽限制已更新: {self.stats()}")
+
+    def set_download_limit(self, video_id: str, limit: Optional[float]):
+        """设置单个下载的限速，None 表示恢复默认值"""
+        if limit is None:
+            self.download_limits.pop(video_id, None)
+        else:
+            self.download_limits[video_id] = max(0.0, limit)
+
+    def remove_download(self, video_id: str):
+        """下载删除后清理其限速状态"""
+        self.download_limits.pop(video_id, None)
+        self.download_buckets.pop(video_id, None)
+
+    def stream_started(self):
+        """视频流开始播放，为其预留带宽"""
+        self.active_streams += 1
+        self._update_global_rate()
+
+    def stream_finished(self):
+        """视频流播放结束，释放预留带宽"""
+        self.active_streams = max(0, self.active_streams - 1)
+        self._update_global_rate()
+
+    def _update_global_rate(self):
+        self.global_bucket.set_rate(self.effective_global_limit)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "global_limit": self.global_limit,
+            "default_download_limit": self.default_download_limit,
+            "streaming_reserve": self.streaming_reserve,
+            "active_streams": self.active_streams,
+            "effective_global_limit": self.effective_global_limit,
+            "download_limits": dict(self.download_limits),
+        }
+
+
+# 全局单例
+bandwidth_limiter = BandwidthLimiter()
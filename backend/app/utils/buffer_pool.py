@@ -0,0 +1,119 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List
+
+from app.config import logger
+
+
+class PooledBuffer:
+    """缓冲池中的固定大小缓冲区，数据通过 memoryview 切片复制进来，不会重新分配内存"""
+
+    def __init__(self, size: int):
+        self.data = bytearray(size)
+        self.view = memoryview(self.data)
+        self.length = 0
+
+    @property
+    def full(self) -> bool:
+        return self.length >= len(self.data)
+
+    def fill(self, chunk: memoryview) -> memoryview:
+        """尽量多地复制数据到缓冲区，返回没能放下的剩余部分"""
+        size = min(len(chunk), len(self.data) - self.length)
+        self.view[self.length:self.length + size] = chunk[:size]
+        self.length += size
+        return chunk[size:]
+
+    def filled(self) -> memoryview:
+        """已填充的数据"""
+        return self.view[:self.length]
+
+    def clear(self):
+        self.length = 0
+
+
+class BufferPool:
+    """
+    下载读取循环共用的缓冲池
+
+    缓冲区大小固定，总数受内存预算限制。缓冲区用完时读取方等待其他连接归还（背压），
+    而不是继续分配内存。没有下载在进行时释放所有空闲缓冲区。
+    """
+
+    def __init__(self, buffer_size: int, memory_limit: int):
+        """
+        Args:
+            buffer_size: 单个缓冲区大小（字节）
+            memory_limit: 所有缓冲区的内存预算（字节），至少能分配一个缓冲区
+        """
+        self.buffer_size = max(64 * 1024, buffer_size)
+        self.max_buffers = max(1, memory_limit // self.buffer_size)
+        self._semaphore = asyncio.Semaphore(self.max_buffers)
+        self._free: List[PooledBuffer] = []
+        self.allocated = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.waiting = 0
+        self.total_waits = 0
+        self.total_wait_time = 0.0
+
+    async def acquire(self) -> PooledBuffer:
+        """取得一个空缓冲区，内存预算用完时等待"""
+        if self._semaphore.locked():
+            self.waiting += 1
+            self.total_waits += 1
+            started = time.monotonic()
+            try:
+                await self._semaphore.acquire()
+            finally:
+                self.waiting -= 1
+                self.total_wait_time += time.monotonic() - started
+        else:
+            await self._semaphore.acquire()
+
+        if self._free:
+            buffer = self._free.pop()
+        else:
+            buffer = PooledBuffer(self.buffer_size)
+            self.allocated += 1
+        self.in_use += 1
+        self.peak_in_use = max(self.peak_in_use, self.in_use)
+        return buffer
+
+    def release(self, buffer: PooledBuffer):
+        """归还缓冲区"""
+        buffer.clear()
+        self.in_use -= 1
+        if self.in_use == 0 and not self.waiting:
+            # 空闲时把内存还给系统
+            self.allocated -= len(self._free)
+            self._free.clear()
+            self.allocated -= 1
+            logger.debug("下载缓冲池空闲，已释放所有缓冲区")
+        else:
+            self._free.append(buffer)
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def buffer(self):
+        """使用期间占用一个缓冲区"""
+        buffer = await self.acquire()
+        try:
+            yield buffer
+        finally:
+            self.release(buffer)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "buffer_size": self.buffer_size,
+            "max_buffers": self.max_buffers,
+            "memory_limit": self.buffer_size * self.max_buffers,
+            "allocated": self.allocated,
+            "allocated_bytes": self.allocated * self.buffer_size,
+            "in_use": self.in_use,
+            "peak_in_use": self.peak_in_use,
+            "waiting": self.waiting,
+            "total_waits": self.total_waits,
+            "total_wait_time": round(self.total_wait_time, 3),
+        }
@@ -0,0 +1,113 @@
+"""
+下载文件校验
+
+分段下载时每段的 CRC32 在写入路径中接续计算，整个文件的 CRC32 由各段的值合并得到，无需再次读取文件。
+校验已下载的文件时在线程池中按段重新读取计算，找出损坏的段。
+"""
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+# 校验文件时使用的线程池，读取文件和计算 CRC32 不占用事件循环
+verify_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="download-verify")
+
+_READ_SIZE = 1024 * 1024 * 4
+
+
+def _gf2_matrix_times(matrix: List[int], vector: int) -> int:
+    result = 0
+    index = 0
+    while vector:
+        if vector & 1:
+            result ^= matrix[index]
+        vector >>= 1
+        index += 1
+    return result
+
+
+def _gf2_matrix_square(matrix: List[int]) -> List[int]:
+    return [_gf2_matrix_times(matrix, row) for row in matrix]
+
+
+def crc32_combine(crc1: int, crc2: int, length2: int) -> int:
+    """
+    合并两段相邻数据的 CRC32（zlib 的 crc32_combine 算法）
+
+    Args:
+        crc1: 前一段数据的 CRC32
+        crc2: 后一段数据的 CRC32
+        length2: 后一段数据的长度
+    """
+    if length2 <= 0:
+        return crc1
+    # 表示在 CRC 寄存器后追加一个零比特的矩阵
+    odd = [0xEDB88320] + [1 << n for n in range(31)]
+    even = _gf2_matrix_square(odd)  # 两个零比特
+    odd = _gf2_matrix_square(even)  # 四个零比特
+    # 按 length2 的二进制位依次追加 1、2、4…… 个零字节
+    while True:
+        even = _gf2_matrix_square(odd)
+        if length2 & 1:
+            crc1 = _gf2_matrix_times(even, crc1)
+        length2 >>= 1
+        if not length2:
+            break
+        odd = _gf2_matrix_square(even)
+        if length2 & 1:
+            crc1 = _gf2_matrix_times(odd, crc1)
+        length2 >>= 1
+        if not length2:
+            break
+    return crc1 ^ crc2
+
+
+def combine_segments(segments: Sequence[Tuple[int, int, Optional[int]]]) -> Optional[int]:
+    """
+    由各段的 CRC32 合并出整个文件的 CRC32
+
+    Args:
+        segments: (起始位置, 结束位置, CRC32) 列表，需首尾相接覆盖整个文件
+
+    Returns:
+        整个文件的 CRC32，有段没有校验值时返回None
+    """
+    crc = 0
+    for start, end, checksum in sorted(segments):
+        if checksum is None:
+            return None
+        crc = crc32_combine(crc, checksum, end - start + 1)
+    return crc
+
+
+def format_checksum(crc: int) -> str:
+    """整个文件的校验值在数据库中保存为8位十六进制字符串"""
+    return f"{crc:08x}"
+
+
+def file_crc32(path, start: int = 0, end: Optional[int] = None) -> int:
+    """读取文件的指定范围（含 end）计算 CRC32，在线程池中调用"""
+    crc = 0
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = None if end is None else end - start + 1
+        while remaining is None or remaining > 0:
+            data = f.read(_READ_SIZE if remaining is None else min(_READ_SIZE, remaining))
+            if not data:
+                break
+            crc = zlib.crc32(data, crc)
+            if remaining is not None:
+                remaining -= len(data)
+    return crc
+
+
+def find_corrupt_segments(path, segments: Sequence[Tuple[int, int, Optional[int]]]) -> List[int]:
+    """
+    逐段重新计算 CRC32，返回与记录不一致的段的索引，在线程池中调用
+
+    没有校验值的段（旧版本下载的）跳过。
+    """
+    return [
+        index
+        for index, (start, end, checksum) in enumerate(segments)
+        if checksum is not None and file_crc32(path, start, end) != checksum
+    ]
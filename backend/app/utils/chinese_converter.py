@@ -1,110 +1,217 @@
 """
 简繁体中文转换工具
+
+OpenCC 转换器加载字典的开销很大，这里每个线程只创建一次并复用（OpenCC 实例不保证线程安全，
+线程池中调用时各线程使用自己的实例）；标签等短字符串的转换结果用有界缓存记住；
+嵌套结构中的长字符串合并为一次转换调用。
 """
+import threading
+from functools import lru_cache
+from typing import Any, Collection, Dict, List, Optional
+
 import opencc
-from typing import List, Dict, Any
+from pydantic import BaseModel
+
+# 转换方向对应的 OpenCC 配置
+_T2S = 't2s.json'
+_S2T = 's2t.json'
+
+# 不超过该长度的字符串转换结果会被缓存
+MEMO_MAX_LENGTH = 64
+MEMO_MAX_SIZE = 4096
+
+# 批量转换时的分隔符，包含该字符的字符串单独转换
+_BATCH_SEPARATOR = "\n"
+
+_local = threading.local()
+
+
+def _get_converter(config: str) -> opencc.OpenCC:
+    """获取当前线程的转换器实例"""
+    converters = getattr(_local, "converters", None)
+    if converters is None:
+        converters = _local.converters = {}
+    converter = converters.get(config)
+    if converter is None:
+        converter = converters[config] = opencc.OpenCC(config)
+    return converter
 
 
+@lru_cache(maxsize=MEMO_MAX_SIZE)
+def _convert_short(text: str, config: str) -> str:
+    return _get_converter(config).convert(text)
+
+
+def _needs_conversion(text: str) -> bool:
+    """空字符串和纯ASCII字符串无需转换"""
+    return bool(text) and not text.isascii()
+
+
+def _convert(text: str, config: str) -> str:
+    if not _needs_conversion(text):
+        return text
+    if len(text) <= MEMO_MAX_LENGTH:
+        return _convert_short(text, config)
+    return _get_converter(config).convert(text)
+
 
 def to_simplified(text: str) -> str:
     """
     将繁体中文转换为简体中文
-    
+
     Args:
         text: 需要转换的繁体中文文本
-        
+
     Returns:
         转换后的简体中文文本
     """
-    converter = opencc.OpenCC('t2s.json')
-    return converter.convert(text)
+    return _convert(text, _T2S)
 
 
 def to_traditional(text: str) -> str:
     """
     将简体中文转换为繁体中文
-    
+
     Args:
         text: 需要转换的简体中文文本
-        
+
     Returns:
         转换后的繁体中文文本
     """
-    converter = opencc.OpenCC('s2t.json')
-    return converter.convert(text)
+    return _convert(text, _S2T)
+
+
+def convert_batch(texts: List[str], to_simple: bool = True) -> List[str]:
+    """
+    批量转换字符串列表
+
+    标签等短字符串走缓存逐个转换（重复率高，缓存命中比转换更快），其余字符串合并为一次转换调用。
+
+    Args:
+        texts: 需要转换的字符串列表
+        to_simple: 是否转换为简体中文，默认为True
+
+    Returns:
+        与输入一一对应的转换结果
+    """
+    config = _T2S if to_simple else _S2T
+    result = list(texts)
+    batch_indexes = []
+    for index, text in enumerate(texts):
+        if not _needs_conversion(text):
+            continue
+        if len(text) <= MEMO_MAX_LENGTH or _BATCH_SEPARATOR in text:
+            result[index] = _convert(text, config)
+        else:
+            batch_indexes.append(index)
+
+    if len(batch_indexes) == 1:
+        result[batch_indexes[0]] = _convert(texts[batch_indexes[0]], config)
+    elif batch_indexes:
+        joined = _BATCH_SEPARATOR.join(texts[index] for index in batch_indexes)
+        converted = _get_converter(config).convert(joined).split(_BATCH_SEPARATOR)
+        if len(converted) != len(batch_indexes):
+            # 转换改变了分隔符数量（理论上不会发生），逐个转换
+            converted = [_convert(texts[index], config) for index in batch_indexes]
+        for index, text in zip(batch_indexes, converted):
+            result[index] = text
+    return result
+
+
+def _field_scope(name: Any, fields: Optional[Collection[str]]) -> Optional[Collection[str]]:
+    """进入字段后的转换范围：字段在 fields 中时其下的所有字符串都转换（None）"""
+    return None if fields is None or name in fields else fields
+
+
+def _collect_strings(data: Any, strings: List[str], fields: Optional[Collection[str]] = None):
+    """
+    按遍历顺序收集嵌套结构（字典、列表、pydantic模型）中需要转换的字符串值（字典的键不转换）
+
+    fields 不为 None 时只收集这些字段（模型属性或字典键）下的字符串。
+    """
+    if isinstance(data, str):
+        if fields is None:
+            strings.append(data)
+    elif isinstance(data, BaseModel):
+        for name, value in data.__dict__.items():
+            _collect_strings(value, strings, _field_scope(name, fields))
+    elif isinstance(data, dict):
+        for key, value in data.items():
+            _collect_strings(value, strings, _field_scope(key, fields))
+    elif isinstance(data, list):
+        for item in data:
+            _collect_strings(item, strings, fields)
+
+
+def _replace_strings(data: Any, converted, fields: Optional[Collection[str]] = None) -> Any:
+    """按与 _collect_strings 相同的顺序用转换结果重建结构"""
+    if isinstance(data, str):
+        return next(converted) if fields is None else data
+    elif isinstance(data, BaseModel):
+        return data.model_copy(update={
+            name: _replace_strings(value, converted, _field_scope(name, fields)) for name, value in data.__dict__.items()
+        })
+    elif isinstance(data, dict):
+        return {key: _replace_strings(value, converted, _field_scope(key, fields)) for key, value in data.items()}
+    elif isinstance(data, list):
+        return [_replace_strings(item, converted, fields) for item in data]
+    else:
+        return data
 
 
 def convert_dict(data: Dict[str, Any], to_simple: bool = True) -> Dict[str, Any]:
     """
     转换字典中的所有字符串值
-    
+
     Args:
         data: 需要转换的字典
         to_simple: 是否转换为简体中文，默认为True
-        
+
     Returns:
         转换后的字典
     """
-    result = {}
-    for key, value in data.items():
-        if isinstance(value, str):
-            result[key] = to_simplified(value) if to_simple else to_traditional(value)
-        elif isinstance(value, dict):
-            result[key] = convert_dict(value, to_simple)
-        elif isinstance(value, list):
-            result[key] = convert_list(value, to_simple)
-        else:
-            result[key] = value
-    return result
+    return convert_any(data, to_simple)
 
 
 def convert_list(data: List[Any], to_simple: bool = True) -> List[Any]:
     """
     转换列表中的所有字符串值
-    
+
     Args:
         data: 需要转换的列表
         to_simple: 是否转换为简体中文，默认为True
-        
+
     Returns:
         转换后的列表
     """
-    result = []
-    for item in data:
-        if isinstance(item, str):
-            result.append(to_simplified(item) if to_simple else to_traditional(item))
-        elif isinstance(item, dict):
-            result.append(convert_dict(item, to_simple))
-        elif isinstance(item, list):
-            result.append(convert_list(item, to_simple))
-        else:
-            result.append(item)
-    return result
+    return convert_any(data, to_simple)
 
 
-def convert_any(data: Any, to_simple: bool = True) -> Any:
+def convert_any(data: Any, to_simple: bool = True, fields: Optional[Collection[str]] = None) -> Any:
     """
-    转换任何类型的数据中的所有字符串值
-    
+    转换任何类型的数据中的字符串值，整个结构批量转换
+
     Args:
         data: 需要转换的数据
         to_simple: 是否转换为简体中文，默认为True
-        
+        fields: 只转换这些字段（任意层级的模型属性或字典键）下的字符串，None 表示转换全部
+
     Returns:
         转换后的数据
     """
     if isinstance(data, str):
+        if fields is not None:
+            return data
         return to_simplified(data) if to_simple else to_traditional(data)
-    elif isinstance(data, dict):
-        return convert_dict(data, to_simple)
-    elif isinstance(data, list):
-        return convert_list(data, to_simple)
-    else:
+    strings: List[str] = []
+    _collect_strings(data, strings, fields)
+    if not strings:
         return data
+    return _replace_strings(data, iter(convert_batch(strings, to_simple)), fields)
 
 
 if __name__ == '__main__':
     text = "让我们说中文"
     print(to_simplified(text))
     print(to_traditional(text))
-    print(convert_dict({"key": f"{to_traditional(text)}"}))
\ No newline at end of file
+    print(convert_dict({"key": f"{to_traditional(text)}"}))
@@ -1,4 +1,5 @@
 from typing import Dict, Optional
+import asyncio
 import httpx
 import time
 from app.config import settings, logger
@@ -24,6 +25,23 @@ class CloudflareBypasser:
 
     def __init__(self):
         self._client: Optional[httpx.AsyncClient] = None
+        # 正在进行中的上游请求数，用于判断上游是否空闲
+        self.inflight_requests = 0
+
+    @property
+    def is_idle(self) -> bool:
+        """当前是否没有进行中的上游请求"""
+        return self.inflight_requests == 0
+
+    async def wait_until_idle(self, idle_delay: float):
+        """等待上游连续空闲 idle_delay 秒，供后台低优先级任务让路给用户请求"""
+        while True:
+            if self.is_idle:
+                await asyncio.sleep(idle_delay)
+                if self.is_idle:
+                    return
+            else:
+                await asyncio.sleep(idle_delay)
 
     @property
     async def client(self) -> httpx.AsyncClient:
@@ -82,6 +100,14 @@ class CloudflareBypasser:
 
         首次使用缓存 cookie，如果检测到 CF 挑战页面则自动强制刷新重试。
         """
+        self.inflight_requests += 1
+        try:
+            return await self._get_request(url, params, max_retries)
+        finally:
+            self.inflight_requests -= 1
+
+    async def _get_request(self, url: str, params: Optional[Dict], max_retries: int) -> str:
+        """GET 请求的实际实现"""
         bypass_url, hostname = self._build_bypass_url(url)
         client = await self.client
 
@@ -131,6 +157,14 @@ class CloudflareBypasser:
         """
         通过 Bypass 服务发送 POST 请求
         """
+        self.inflight_requests += 1
+        try:
+            return await self._post_request(url, data, headers, max_retries)
+        finally:
+            self.inflight_requests -= 1
+
+    async def _post_request(self, url: str, data: Dict, headers: Optional[Dict], max_retries: int) -> Dict:
+        """POST 请求的实际实现"""
         bypass_url, hostname = self._build_bypass_url(url)
         client = await self.client
 
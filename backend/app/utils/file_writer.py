@@ -0,0 +1,166 @@
+"""
+下载文件写入
+
+每个下载只打开一个文件描述符，所有分段通过 os.pwrite/os.pwritev 按偏移量写入，
+无需各自打开文件和 seek。写入在一个专用的 I/O 线程中执行：同一文件排队中的写入按偏移量排序，
+首尾相接的合并为一次 pwritev 调用。写入的同时可以在 I/O 线程中接续计算数据的 CRC32，无需再次读取文件。
+同步到磁盘（fsync）可能很慢，在单独的线程中执行，不阻塞其他下载的写入。
+"""
+import asyncio
+import os
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from app.config import logger
+
+# 所有下载共用的 I/O 线程
+_io_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="download-io")
+# fsync 和关闭文件使用的线程，只有一个线程，同一文件的同步一定在关闭之前执行
+_sync_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="download-sync")
+
+# 单次 pwritev 最多提交的缓冲区数量（Linux 的 IOV_MAX）
+_IOV_MAX = 1024
+
+
+def _resolve(future: asyncio.Future, result: Optional[int], error: Exception = None):
+    if future.done():
+        return
+    if error is None:
+        future.set_result(result)
+    else:
+        future.set_exception(error)
+
+
+class DownloadFileWriter:
+    """单个下载文件的写入器"""
+
+    def __init__(self, path, fd: int, loop: asyncio.AbstractEventLoop):
+        self.path = path
+        self.fd = fd
+        self.loop = loop
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[int, memoryview, Optional[int], asyncio.Future]] = []
+        self._draining = False
+
+    @classmethod
+    async def open(cls, path, truncate: bool = False) -> "DownloadFileWriter":
+        """
+        打开（不存在时创建）下载文件
+
+        Args:
+            path: 文件路径
+            truncate: 是否清空已有内容
+        """
+        flags = os.O_RDWR | os.O_CREAT | (os.O_TRUNC if truncate else 0)
+        loop = asyncio.get_running_loop()
+        fd = await loop.run_in_executor(_io_executor, os.open, path, flags, 0o644)
+        return cls(path, fd, loop)
+
+    async def preallocate(self, size: int):
+        """为文件预留磁盘空间，不支持 posix_fallocate 的平台或文件系统上退化为稀疏文件"""
+        await self.loop.run_in_executor(_io_executor, self._preallocate, size)
+
+    def _preallocate(self, size: int):
+        if size <= 0:
+            return
+        if hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(self.fd, 0, size)
+                return
+            except OSError as e:
+                logger.debug(f"posix_fallocate 不可用，使用稀疏文件: {self.path}, {str(e)}")
+        if os.fstat(self.fd).st_size < size:
+            os.ftruncate(self.fd, size)
+
+    async def write(self, offset: int, data, crc: Optional[int] = None) -> Optional[int]:
+        """
+        在指定偏移量写入数据，写入完成后返回（调用方之后可以复用缓冲区）
+
+        Args:
+            offset: 文件偏移量
+            data: 要写入的数据
+            crc: 之前数据的 CRC32，传入时返回接续本次数据后的 CRC32
+        """
+        if not data:
+            return crc
+        future = self.loop.create_future()
+        with self._lock:
+            self._pending.append((offset, memoryview(data), crc, future))
+            schedule = not self._draining
+            self._draining = True
+        if schedule:
+            self.loop.run_in_executor(_io_executor, self._drain)
+        return await future
+
+    def _drain(self):
+        """在 I/O 线程中写入所有排队的数据，首尾相接的写入合并"""
+        while True:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                if not batch:
+                    self._draining = False
+                    return
+            batch.sort(key=lambda item: item[0])
+            run = [batch[0]]
+            run_end = batch[0][0] + len(batch[0][1])
+            for item in batch[1:]:
+                if item[0] == run_end:
+                    run.append(item)
+                else:
+                    self._write_run(run)
+                    run = [item]
+                run_end = item[0] + len(item[1])
+            self._write_run(run)
+
+    def _write_run(self, run: List[Tuple[int, memoryview, Optional[int], asyncio.Future]]):
+        error = None
+        try:
+            self._pwrite_all(run[0][0], [item[1] for item in run])
+        except Exception as e:
+            error = e
+        for _, view, crc, future in run:
+            if error is None and crc is not None:
+                crc = zlib.crc32(view, crc)
+            # 先释放对调用方缓冲区的引用，调用方收到完成通知后即可清空或复用缓冲区
+            view.release()
+            self.loop.call_soon_threadsafe(_resolve, future, crc, error)
+
+    def _pwrite_all(self, offset: int, views: List[memoryview]):
+        """写入全部数据，处理部分写入"""
+        while views:
+            if len(views) > 1 and hasattr(os, "pwritev"):
+                written = os.pwritev(self.fd, views[:_IOV_MAX], offset)
+            else:
+                written = os.pwrite(self.fd, views[0], offset)
+            if written <= 0:
+                raise OSError(f"写入文件失败: {self.path}")
+            offset += written
+            while written:
+                if written >= len(views[0]):
+                    written -= len(views[0])
+                    views.pop(0)
+                else:
+                    views[0] = views[0][written:]
+                    written = 0
+
+    async def sync(self):
+        """将已写入的数据同步到磁盘"""
+        if self.fd >= 0:
+            await self.loop.run_in_executor(_sync_executor, os.fsync, self.fd)
+
+    async def close(self, sync: bool = True):
+        """关闭文件，默认先同步到磁盘"""
+        if self.fd < 0:
+            return
+        fd, self.fd = self.fd, -1
+
+        def _close():
+            try:
+                if sync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+
+        await self.loop.run_in_executor(_sync_executor, _close)
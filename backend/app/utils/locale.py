@@ -0,0 +1,94 @@
+"""
+语言区域处理
+
+上游页面为繁体中文，解析后的结果统一在缓存前转换出简体和繁体两个版本，
+接口根据 lang 参数或 Accept-Language 请求头返回对应版本。
+只转换类型、标签、副标题、简介等字段，标题保持上游原文。
+"""
+from typing import Any, Collection, Dict, Optional
+
+from app.utils.chinese_converter import convert_any
+
+ZH_HANS = "zh-Hans"
+ZH_HANT = "zh-Hant"
+DEFAULT_LOCALE = ZH_HANS
+SUPPORTED_LOCALES = (ZH_HANS, ZH_HANT)
+
+# 各类数据需要转换的字段，其余字段（标题等）保持上游原文
+HOME_FIELDS = ("search_suffix",)
+DETAIL_FIELDS = ("video_type", "subtitle", "description", "tags")
+# 搜索结果、发行日历只有标题等原文字段，不转换
+NO_FIELDS = ()
+
+# 对应繁体中文的语言标签（小写）
+_TRADITIONAL_TAGS = ("zh-hant", "zh-tw", "zh-hk", "zh-mo")
+
+
+def normalize_locale(tag: Optional[str]) -> Optional[str]:
+    """
+    将语言标签映射为支持的语言区域
+
+    Args:
+        tag: 语言标签，如 zh-CN、zh-TW、zh-Hant-HK
+
+    Returns:
+        ZH_HANS 或 ZH_HANT，非中文标签返回 None
+    """
+    tag = (tag or "").strip().lower().replace("_", "-")
+    if tag.startswith(_TRADITIONAL_TAGS):
+        return ZH_HANT
+    if tag == "zh" or tag.startswith("zh-"):
+        return ZH_HANS
+    return None
+
+
+def negotiate_locale(lang: Optional[str] = None, accept_language: Optional[str] = None) -> str:
+    """
+    确定响应使用的语言区域，lang 参数优先，其次按 Accept-Language 中权重最高的中文标签
+
+    Args:
+        lang: 显式指定的语言
+        accept_language: Accept-Language 请求头
+
+    Returns:
+        ZH_HANS 或 ZH_HANT
+    """
+    locale = normalize_locale(lang)
+    if locale:
+        return locale
+
+    best_locale, best_quality = DEFAULT_LOCALE, -1.0
+    for item in (accept_language or "").split(","):
+        tag, _, params = item.partition(";")
+        locale = normalize_locale(tag)
+        if not locale:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                continue
+        if quality > best_quality:
+            best_locale, best_quality = locale, quality
+    return best_locale
+
+
+def localize(value: Any, fields: Optional[Collection[str]] = None) -> Dict[str, Any]:
+    """
+    转换出所有语言区域的版本，供缓存使用
+
+    Args:
+        value: 需要转换的数据
+        fields: 需要转换的字段，None 表示全部
+    """
+    return {
+        ZH_HANS: convert_any(value, to_simple=True, fields=fields),
+        ZH_HANT: convert_any(value, to_simple=False, fields=fields),
+    }
+
+
+def to_locale(value: Any, locale: str, fields: Optional[Collection[str]] = None) -> Any:
+    """将数据转换为指定语言区域（用于未预先缓存两个版本的数据）"""
+    return convert_any(value, to_simple=locale != ZH_HANT, fields=fields)
@@ -0,0 +1,60 @@
+import asyncio
+from typing import Awaitable, Callable, Optional
+from app.config import logger
+
+
+class PeriodicTask:
+    """
+    周期性后台任务
+
+    在事件循环中按固定间隔执行一个异步函数，单次执行出错只记录日志，不影响后续执行。
+    """
+
+    def __init__(self, name: str, func: Callable[[], Awaitable[None]], interval: float,
+                 initial_delay: float = 0.0):
+        """
+        Args:
+            name: 任务名称，用于日志
+            func: 无参数的异步函数
+            interval: 两次执行之间的间隔（秒）
+            initial_delay: 启动后首次执行前的等待时间（秒）
+        """
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.initial_delay = initial_delay
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """启动任务，重复调用无效"""
+        if self.running:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"后台任务已启动: {self.name}")
+
+    async def stop(self):
+        """停止任务并等待其退出"""
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        if self.initial_delay > 0:
+            await asyncio.sleep(self.initial_delay)
+        while True:
+            try:
+                await self.func()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"后台任务执行失败: {self.name}, {str(e)}")
+            await asyncio.sleep(self.interval)
@@ -1,7 +1,7 @@
 import time
 import functools
 import asyncio
-from typing import Any, Callable, Dict, Optional, TypeVar, Union, cast
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar, Union, cast
 from collections import OrderedDict
 from app.config import logger
 
@@ -24,6 +24,8 @@ class LRUCache:
         self.ttl = ttl
         self.hits = 0
         self.misses = 0
+        # 正在加载中的键，同一个键的并发未命中共享同一次加载（single-flight）
+        self._inflight: Dict[str, asyncio.Task] = {}
 
     def get(self, key: str) -> Any:
         """获取缓存项，如果不存在或已过期则返回None"""
@@ -31,10 +33,11 @@ class LRUCache:
             self.misses += 1
             return None
         
-        value, timestamp = self.cache[key]
+        value, timestamp, item_ttl = self.cache[key]
         
-        # 检查是否过期
-        if self.ttl > 0 and time.time() - timestamp > self.ttl:
+        # 检查是否过期（单项TTL优先于全局TTL）
+        ttl = item_ttl if item_ttl is not None else self.ttl
+        if ttl > 0 and time.time() - timestamp > ttl:
             self.cache.pop(key)
             self.misses += 1
             return None
@@ -44,8 +47,30 @@ class LRUCache:
         self.hits += 1
         return value
 
-    def set(self, key: str, value: Any) -> None:
-        """设置缓存项"""
+    def peek(self, key: str) -> Any:
+        """获取未过期的缓存项，不影响命中统计和使用顺序，不存在时返回None"""
+        if key not in self.cache:
+            return None
+
+        value, timestamp, item_ttl = self.cache[key]
+        ttl = item_ttl if item_ttl is not None else self.ttl
+        if ttl > 0 and time.time() - timestamp > ttl:
+            return None
+        return value
+
+    def contains(self, key: str) -> bool:
+        """检查缓存项是否存在且未过期，不影响命中统计和使用顺序"""
+        return self.peek(key) is not None
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        """
+        设置缓存项
+
+        Args:
+            key: 缓存键
+            value: 缓存值
+            ttl: 该项的过期时间（秒），默认使用缓存的全局TTL
+        """
         # 如果键已存在，先移除再添加，以更新顺序
         if key in self.cache:
             self.cache.pop(key)
@@ -54,8 +79,55 @@ class LRUCache:
         if len(self.cache) >= self.maxsize:
             self.cache.popitem(last=False)
         
-        # 添加新项，带上时间戳
-        self.cache[key] = (value, time.time())
+        # 添加新项，带上时间戳和单项TTL
+        self.cache[key] = (value, time.time(), ttl)
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[int] = None,
+        cacheable: Optional[Callable[[Any], bool]] = None
+    ) -> Any:
+        """
+        获取缓存项，未命中时调用loader加载并写入缓存
+
+        同一个键的并发未命中只会触发一次加载，其余调用方等待同一结果。
+        加载在独立任务中进行，单个调用方被取消不会中断其他等待者。
+
+        Args:
+            key: 缓存键
+            loader: 无参数的异步加载函数
+            ttl: 该项的过期时间（秒），默认使用缓存的全局TTL
+            cacheable: 判断加载结果是否应写入缓存，默认非None即缓存
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        return await self.load(key, loader, ttl=ttl, cacheable=cacheable)
+
+    async def load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[int] = None,
+        cacheable: Optional[Callable[[Any], bool]] = None
+    ) -> Any:
+        """不读取缓存，直接以single-flight方式加载并写入缓存，参数同get_or_load"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader, ttl, cacheable))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: Optional[int],
+                    cacheable: Optional[Callable[[Any], bool]]) -> Any:
+        """执行加载并按需写入缓存"""
+        value = await loader()
+        if value is not None and (cacheable is None or cacheable(value)):
+            self.set(key, value, ttl=ttl)
+        return value
 
     def clear(self) -> None:
         """清空缓存"""
@@ -117,13 +189,9 @@ def lru_cache(
                 logger.debug(f"缓存命中: {func.__name__}, key={cache_key}")
                 return cached_result
             
-            # 缓存未命中，执行函数
+            # 缓存未命中，执行函数（并发的相同请求共享同一次执行）并存储结果到缓存
             logger.debug(f"缓存未命中: {func.__name__}, key={cache_key}")
-            result = await func(*args, **kwargs)
-            
-            # 存储结果到缓存
-            cache_instance.set(cache_key, result)
-            return result
+            return await cache_instance.load(cache_key, lambda: func(*args, **kwargs))
         
         @functools.wraps(func)
         def sync_wrapper(*args: Any, **kwargs: Any) -> T:
@@ -10,6 +10,11 @@ import time
 from app.api.routes import api_router
 from app.config import settings, logger
 from app.utils.cloudflare_bypass import cf_bypasser
+from app.services.prefetch_service import prefetch_service
+from app.services.calendar_service import calendar_service
+from app.services.catalog_service import catalog_service
+from app.services.crawler_service import crawler_service
+from app.services.preview_service import preview_service
 
 
 def log_proxy_status():
@@ -41,9 +46,27 @@ async def lifespan(app: FastAPI):
 
     log_proxy_status()
 
+    # 初始化本地视频目录
+    await catalog_service.init_db()
+    catalog_service.flush_task.start()
+    await crawler_service.init_db()
+
+    # 启动后台预取、目录爬虫、日历预热和新番预告预取
+    prefetch_service.start()
+    crawler_service.start()
+    calendar_service.warm_task.start()
+    preview_service.prefetch_task.start()
+
     yield
 
     # 应用关闭时清理资源
+    await calendar_service.warm_task.stop()
+    await preview_service.prefetch_task.stop()
+    await prefetch_service.stop()
+    await crawler_service.stop()
+
+    # 写入剩余的视频目录数据并关闭连接
+    await catalog_service.close_db()
     logger.info("应用关闭，清理 CF Bypass 连接...")
     await cf_bypasser.close()
 
@@ -0,0 +1,124 @@
+"""
+简繁转换性能测试
+
+使用真实的搜索组合数据（get_search_combination 的原始繁体结果）对比：
+- 旧实现：每次调用都新建 OpenCC 实例并逐个字符串转换
+- 逐个转换：复用转换器 + 短字符串缓存
+- 批量转换：整个结构一次性转换（短字符串走缓存，长字符串合并转换）
+
+用法（在 backend 目录下运行）：
+    python scripts/bench_chinese_converter.py                 # 实时获取搜索组合
+    python scripts/bench_chinese_converter.py --save data.json # 获取并保存，便于离线重复测试
+    python scripts/bench_chinese_converter.py --input data.json
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+import opencc
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.utils import chinese_converter  # noqa: E402
+from app.utils.chinese_converter import convert_any, to_simplified  # noqa: E402
+
+
+async def fetch_payload() -> Dict[str, Any]:
+    """实时获取搜索组合，返回转换前的繁体原始数据"""
+    from app.services.video_service import VideoService
+    from app.utils.cloudflare_bypass import cf_bypasser
+
+    try:
+        combination = await VideoService().get_search_combination()
+    finally:
+        await cf_bypasser.close()
+    return combination.model_dump()
+
+
+def legacy_convert(data: Any) -> Any:
+    """旧实现：每个字符串新建一次 OpenCC 实例"""
+    if isinstance(data, str):
+        return opencc.OpenCC('t2s.json').convert(data)
+    if isinstance(data, dict):
+        return {key: legacy_convert(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [legacy_convert(item) for item in data]
+    return data
+
+
+def per_string_convert(data: Any) -> Any:
+    """复用转换器和缓存，但逐个字符串转换"""
+    if isinstance(data, str):
+        return to_simplified(data)
+    if isinstance(data, dict):
+        return {key: per_string_convert(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [per_string_convert(item) for item in data]
+    return data
+
+
+def count_strings(data: Any) -> int:
+    if isinstance(data, str):
+        return 1
+    if isinstance(data, dict):
+        return sum(count_strings(value) for value in data.values())
+    if isinstance(data, list):
+        return sum(count_strings(item) for item in data)
+    return 0
+
+
+def bench(name: str, func: Callable[[Any], Any], payload: Any, rounds: int) -> float:
+    """返回每轮平均耗时（毫秒）"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(payload)
+    elapsed = (time.perf_counter() - start) / rounds * 1000
+    print(f"{name:<24}{elapsed:>10.3f} ms/轮")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="简繁转换性能测试")
+    parser.add_argument("--input", help="从JSON文件读取搜索组合原始数据")
+    parser.add_argument("--save", help="将实时获取的原始数据保存到JSON文件")
+    parser.add_argument("--rounds", type=int, default=20, help="每种实现的测试轮数")
+    args = parser.parse_args()
+
+    if args.input:
+        payload = json.loads(Path(args.input).read_text(encoding="utf-8"))
+    else:
+        payload = asyncio.run(fetch_payload())
+        if args.save:
+            Path(args.save).write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    total = count_strings(payload)
+    if not total:
+        print("未获取到搜索组合数据")
+        return
+    print(f"字符串数量: {total}, 测试轮数: {args.rounds}")
+
+    # 三种实现的结果必须一致
+    expected = legacy_convert(payload)
+    assert per_string_convert(payload) == expected
+    assert convert_any(payload) == expected
+
+    legacy = bench("旧实现(每次新建)", legacy_convert, payload, max(1, args.rounds // 10))
+
+    # 冷缓存：清空短字符串缓存后逐个转换
+    def cold_per_string(data):
+        chinese_converter._convert_short.cache_clear()
+        return per_string_convert(data)
+
+    cold = bench("逐个转换(冷缓存)", cold_per_string, payload, args.rounds)
+    warm = bench("逐个转换(热缓存)", per_string_convert, payload, args.rounds)
+    batch = bench("批量转换", convert_any, payload, args.rounds)
+
+    print(f"\n相对旧实现加速: 冷缓存 {legacy / cold:.0f}x, 热缓存 {legacy / warm:.0f}x, 批量 {legacy / batch:.0f}x")
+
+
+if __name__ == '__main__':
+    main()
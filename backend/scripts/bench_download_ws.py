@@ -0,0 +1,220 @@
+"""
+下载进度 WebSocket 推送压力测试
+
+模拟模式（默认，不需要启动服务）：在进程内用模拟的客户端对比
+- 旧实现：每个下载每次更新都 dict + json.dumps，并依次 await 每个客户端的 send_text
+- 广播器：每个周期合并所有下载的变化，编码一次，每个客户端独立的有界发送队列
+其中一部分客户端发送很慢，观察是否拖慢其他客户端。--subscribed 指定每个客户端只订阅几个下载。
+
+实时模式：连接到运行中的服务，同时打开大量客户端，统计每个客户端收到的帧数和流量。
+
+用法（在 backend 目录下运行）：
+    python scripts/bench_download_ws.py                                  # 模拟 300 个客户端
+    python scripts/bench_download_ws.py --clients 500 --slow 20 --downloads 20
+    python scripts/bench_download_ws.py --subscribed 1                   # 每个客户端只订阅一个下载
+    python scripts/bench_download_ws.py --url ws://127.0.0.1:8000/api/downloads/ws --clients 300 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.models.download import DownloadProgress, DownloadSegment, DownloadStatus  # noqa: E402
+from app.services.progress_broadcaster import ProgressBroadcaster  # noqa: E402
+
+
+class SimulatedSocket:
+    """模拟的 WebSocket 客户端，每次发送耗时 latency 秒"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.frames = 0
+        self.bytes = 0
+        self.last_received = 0.0
+
+    async def send_text(self, text: str):
+        await asyncio.sleep(self.latency)
+        self.frames += 1
+        self.bytes += len(text)
+        self.last_received = time.perf_counter()
+
+
+def make_downloads(count: int) -> Dict[str, DownloadProgress]:
+    total = 1024 * 1024 * 1024
+    return {
+        f"video-{i}": DownloadProgress(
+            video_id=f"video-{i}",
+            filename=f"video-{i}_示例视频标题.mp4",
+            title=f"示例视频标题 {i}",
+            cover_url=f"https://example.com/covers/{i}.jpg",
+            total_size=total,
+            downloaded=0,
+            status=DownloadStatus.DOWNLOADING,
+            speed=0.0,
+            url=f"https://example.com/videos/{i}.mp4",
+            created_at=datetime.now(),
+            segments=[DownloadSegment(start=s * total // 8, end=(s + 1) * total // 8 - 1) for s in range(8)]
+        )
+        for i in range(count)
+    }
+
+
+def advance(downloads: Dict[str, DownloadProgress]):
+    """模拟一个周期的下载进度"""
+    for download in downloads.values():
+        download.downloaded += 4 * 1024 * 1024
+        download.speed = 20 * 1024 * 1024 + download.downloaded % 1000
+        for segment in download.segments:
+            segment.downloaded += 512 * 1024
+
+
+def make_clients(clients: int, slow: int, latency: float, slow_latency: float) -> List[SimulatedSocket]:
+    return [SimulatedSocket(slow_latency if i < slow else latency) for i in range(clients)]
+
+
+async def legacy_broadcast(downloads: Dict[str, DownloadProgress], sockets: List[SimulatedSocket], video_id: str):
+    """旧实现的 broadcast_progress"""
+    progress_data = downloads[video_id].dict()
+    progress_data['speed'] = round(progress_data['speed'], 2)
+    if isinstance(progress_data['created_at'], datetime):
+        progress_data['created_at'] = progress_data['created_at'].isoformat()
+    if 'completed_at' in progress_data and isinstance(progress_data['completed_at'], datetime):
+        progress_data['completed_at'] = progress_data['completed_at'].isoformat()
+    message = json.dumps(progress_data)
+    for websocket in sockets:
+        await websocket.send_text(message)
+
+
+def summarize(name: str, sockets: List[SimulatedSocket], slow: int, ticks: int, blocked: float, finished: float,
+              started: float, encodes: int):
+    fast = sockets[slow:]
+    print(f"\n== {name} ==")
+    print(f"周期数: {ticks}, JSON 编码次数: {encodes}")
+    print(f"下载流程被推送阻塞的时间: 共 {blocked:.3f}s, 平均每周期 {blocked / ticks * 1000:.1f}ms")
+    print(f"全部正常客户端收完最后一个周期: {(finished - started):.3f}s")
+    print(f"正常客户端: 平均 {statistics.mean(s.frames for s in fast):.1f} 帧, "
+          f"平均 {statistics.mean(s.bytes for s in fast) / 1024:.1f} KB")
+    if slow:
+        print(f"慢客户端: 平均 {statistics.mean(s.frames for s in sockets[:slow]):.1f} 帧, "
+              f"平均 {statistics.mean(s.bytes for s in sockets[:slow]) / 1024:.1f} KB")
+
+
+async def run_legacy(args):
+    downloads = make_downloads(args.downloads)
+    sockets = make_clients(args.clients, args.slow, args.latency, args.slow_latency)
+    blocked = 0.0
+    started = time.perf_counter()
+    for _ in range(args.legacy_ticks):
+        advance(downloads)
+        tick_start = time.perf_counter()
+        for video_id in downloads:
+            await legacy_broadcast(downloads, sockets, video_id)
+        blocked += time.perf_counter() - tick_start
+    finished = max(s.last_received for s in sockets[args.slow:])
+    summarize("旧实现", sockets, args.slow, args.legacy_ticks, blocked, finished, started,
+              args.legacy_ticks * args.downloads)
+
+
+async def run_broadcaster(args):
+    downloads = make_downloads(args.downloads)
+    sockets = make_clients(args.clients, args.slow, args.latency, args.slow_latency)
+    broadcaster = ProgressBroadcaster(lambda: downloads, interval=args.interval, max_queue=args.queue_size)
+    video_ids = list(downloads)
+    for index, websocket in enumerate(sockets):
+        subscription = None
+        if args.subscribed:
+            subscription = [video_ids[(index + i) % len(video_ids)] for i in range(args.subscribed)]
+        broadcaster.connect(websocket, subscription)
+    # 等待所有客户端收到初始快照
+    await asyncio.sleep(args.slow_latency * 2)
+    for websocket in sockets:
+        websocket.frames = websocket.bytes = 0
+
+    blocked = 0.0
+    started = time.perf_counter()
+    for _ in range(args.ticks):
+        advance(downloads)
+        tick_start = time.perf_counter()
+        for video_id in downloads:
+            broadcaster.mark(video_id)
+        await broadcaster.flush()
+        blocked += time.perf_counter() - tick_start
+        await asyncio.sleep(args.interval)
+    clients = [broadcaster.clients[s] for s in sockets[args.slow:]]
+    while any(client.queue or client.resync for client in clients):
+        await asyncio.sleep(0.001)
+    finished = max(s.last_received for s in sockets[args.slow:])
+    summarize("广播器", sockets, args.slow, args.ticks, blocked, finished, started, broadcaster.frames)
+    print(f"丢弃的积压帧: {broadcaster.stats()['dropped']}")
+    await broadcaster.stop()
+
+
+async def run_live(args):
+    import websockets
+
+    frames: List[int] = [0] * args.clients
+    snapshots: List[int] = [0] * args.clients
+    received: List[int] = [0] * args.clients
+    gaps: List[float] = [0.0] * args.clients
+
+    async def client(index: int):
+        async with websockets.connect(args.url, max_size=None) as websocket:
+            last = None
+            deadline = time.perf_counter() + args.duration
+            while True:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    return
+                try:
+                    message = await asyncio.wait_for(websocket.recv(), timeout)
+                except asyncio.TimeoutError:
+                    return
+                now = time.perf_counter()
+                if last is not None:
+                    gaps[index] = max(gaps[index], now - last)
+                last = now
+                frames[index] += 1
+                received[index] += len(message)
+                if json.loads(message).get("type") == "snapshot":
+                    snapshots[index] += 1
+
+    await asyncio.gather(*(client(i) for i in range(args.clients)))
+    print(f"客户端数: {args.clients}, 持续 {args.duration}s")
+    print(f"每个客户端帧数: 最少 {min(frames)}, 平均 {statistics.mean(frames):.1f}, 最多 {max(frames)}")
+    print(f"每个客户端流量: 平均 {statistics.mean(received) / 1024:.1f} KB")
+    print(f"快照帧: 共 {sum(snapshots)}（每个客户端连接时 1 个，其余为积压后的重新同步）")
+    print(f"最大帧间隔: 平均 {statistics.mean(gaps):.3f}s, 最大 {max(gaps):.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="下载进度 WebSocket 推送压力测试")
+    parser.add_argument("--url", help="连接运行中的服务，例如 ws://127.0.0.1:8000/api/downloads/ws")
+    parser.add_argument("--clients", type=int, default=300, help="客户端数量")
+    parser.add_argument("--duration", type=float, default=20, help="实时模式的持续时间（秒）")
+    parser.add_argument("--downloads", type=int, default=10, help="模拟的下载数量")
+    parser.add_argument("--slow", type=int, default=5, help="慢客户端数量")
+    parser.add_argument("--latency", type=float, default=0.0005, help="正常客户端每次发送耗时（秒）")
+    parser.add_argument("--slow-latency", type=float, default=0.5, help="慢客户端每次发送耗时（秒）")
+    parser.add_argument("--ticks", type=int, default=25, help="广播器模拟的周期数")
+    parser.add_argument("--legacy-ticks", type=int, default=2, help="旧实现模拟的周期数（很慢）")
+    parser.add_argument("--interval", type=float, default=0.2, help="广播周期（秒）")
+    parser.add_argument("--queue-size", type=int, default=8, help="每个客户端的发送队列长度")
+    parser.add_argument("--subscribed", type=int, default=0, help="每个客户端订阅的下载数，0 表示订阅全部")
+    args = parser.parse_args()
+
+    if args.url:
+        asyncio.run(run_live(args))
+        return
+    asyncio.run(run_broadcaster(args))
+    asyncio.run(run_legacy(args))
+
+
+if __name__ == "__main__":
+    main()
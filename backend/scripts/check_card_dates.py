@@ -0,0 +1,92 @@
+"""
+搜索结果卡片日期解析检查
+
+发行日历依赖 _CARD_DATE_PATTERN 从卡片副标题（"制作商 • 日期"）中解析日期，匹配失败时整月视频
+都会落入 undated_videos。本脚本用内置的卡片片段校验解析结果，也可以检查保存下来的真实搜索页，
+统计有多少卡片能解析出日期，用于在网站改版后快速确认。
+
+用法（在 backend 目录下运行）：
+    python scripts/check_card_dates.py                      # 校验内置卡片片段
+    python scripts/check_card_dates.py --input search.html  # 额外检查保存的搜索结果页
+"""
+import argparse
+import sys
+from pathlib import Path
+
+from DrissionPage.common import make_session_ele
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.video_service import VideoService  # noqa: E402
+
+# 按搜索结果页卡片结构整理的片段，副标题链接文本为 "制作商 • 日期"
+CARD_TEMPLATE = """
+<html><body>
+<div id="home-rows-wrapper">
+  <div title="{title}">
+    <a class="video-link" href="https://hanime1.me/watch?v={video_id}"></a>
+    <img class="main-thumb" src="https://example.com/{video_id}.jpg">
+    <div class="duration">20:35</div>
+    <div class="title">{title}</div>
+    <div class="subtitle">
+      <a href="https://hanime1.me/search?query=&amp;type=&amp;genre=%E8%A3%8F%E7%95%AA">{subtitle}</a>
+    </div>
+    <div class="stats-container">
+      <div class="stat-item">98%</div>
+      <div class="stat-item">12.3萬次</div>
+    </div>
+  </div>
+</div>
+</body></html>
+"""
+
+# (副标题, 期望解析出的日期)
+CASES = [
+    ("魔人 • 2024-05-10", "2024-05-10"),
+    ("PoRO • 2023/7/3", "2023-07-03"),
+    ("Queen Bee•2022.12.01", "2022-12-01"),
+    ("ピンクパイナップル", ""),
+]
+
+
+def check_cases(service: VideoService) -> int:
+    """校验内置卡片片段，返回失败数量"""
+    failures = 0
+    for index, (subtitle, expected) in enumerate(CASES, start=1):
+        html = CARD_TEMPLATE.format(title=f"测试视频{index}", video_id=100000 + index, subtitle=subtitle)
+        card = make_session_ele(html).ele('xpath://*[@id="home-rows-wrapper"]//div[@title]')
+        video = service._extract_detailed_video_info(card)
+        actual = video.release_date if video else None
+        ok = actual == expected
+        failures += not ok
+        print(f"[{'OK' if ok else 'FAIL'}] {subtitle!r}: 期望 {expected!r}, 实际 {actual!r}")
+    return failures
+
+
+def check_page(service: VideoService, path: Path) -> int:
+    """检查保存的搜索结果页，返回无法解析出日期的卡片数量"""
+    page_ele = make_session_ele(path.read_text(encoding="utf-8"))
+    # 与 search_videos 一致，每隔一个取一个
+    video_elements = page_ele.eles('xpath://*[@id="home-rows-wrapper"]//div[@title]')[::2]
+    videos = [video for video in map(service._extract_detailed_video_info, video_elements) if video]
+    undated = [video for video in videos if not video.release_date]
+    print(f"{path}: 共 {len(videos)} 个卡片, {len(videos) - len(undated)} 个解析出日期, {len(undated)} 个无日期")
+    for video in undated[:10]:
+        print(f"  无日期: {video.video_id} {video.title} ({video.studio.name if video.studio else ''})")
+    return len(undated)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="搜索结果卡片日期解析检查")
+    parser.add_argument("--input", type=Path, help="保存的搜索结果页 HTML")
+    args = parser.parse_args()
+
+    service = VideoService()
+    failures = check_cases(service)
+    if args.input:
+        failures += check_page(service, args.input)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
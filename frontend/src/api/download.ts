@@ -1,5 +1,5 @@
 import request from '../utils/request.ts';
-import { DownloadProgress, DownloadActionType } from '../types/download';
+import { DownloadProgress, DownloadProgressFrame, DownloadActionType } from '../types/download';
 
 /**
  * 下载相关API服务
@@ -92,7 +92,7 @@ export const DownloadApi = {
    * 创建WebSocket连接以接收下载进度更新
    * @param onMessage 消息处理函数
    */
-  createWebSocket: (onMessage: (data: DownloadProgress) => void): WebSocket => {
+  createWebSocket: (onMessage: (frame: DownloadProgressFrame) => void): WebSocket => {
     const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
     const host = window.location.host;
     const baseUrl = request.defaults.baseURL || '';
@@ -103,8 +103,8 @@ export const DownloadApi = {
     
     ws.onmessage = (event) => {
       try {
-        const data = JSON.parse(event.data) as DownloadProgress;
-        onMessage(data);
+        const frame = JSON.parse(event.data) as DownloadProgressFrame;
+        onMessage(frame);
       } catch (error) {
         console.error('解析WebSocket消息失败:', error);
       }
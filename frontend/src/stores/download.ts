@@ -1,6 +1,6 @@
 import { defineStore } from 'pinia';
 import { DownloadApi } from '../api/download';
-import type { DownloadProgress } from '../types/download';
+import type { DownloadProgress, DownloadProgressFrame } from '../types/download';
 import { ElMessage } from 'element-plus';
 
 /**
@@ -14,6 +14,8 @@ class DownloadWebSocketManager {
   private reconnectTimeout = 1000;
   private listeners: Set<(data: any) => void> = new Set();
   private isConnecting = false;
+  // 订阅的下载：'all' 或视频ID列表，服务端只推送订阅范围内的进度
+  private subscription: string[] | 'all' = 'all';
   
   private constructor() {
     // 私有构造函数确保单例
@@ -48,7 +50,9 @@ class DownloadWebSocketManager {
     
     const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
     const host = window.location.host;
-    const wsUrl = `${protocol}//${host}/api/downloads/ws`;
+    // 连接时带上订阅，首个快照即只包含订阅的下载
+    const query = this.subscription === 'all' ? '' : `?video_ids=${encodeURIComponent(this.subscription.join(','))}`;
+    const wsUrl = `${protocol}//${host}/api/downloads/ws${query}`;
     
     try {
       this.ws = new WebSocket(wsUrl);
@@ -107,6 +111,16 @@ class DownloadWebSocketManager {
     }
   }
   
+  /**
+   * 更换订阅，已连接时立即通知服务端，服务端随后发送新订阅范围内的快照
+   */
+  subscribe(videoIds: string[] | 'all'): void {
+    this.subscription = videoIds;
+    if (this.ws && this.ws.readyState === WebSocket.OPEN) {
+      this.ws.send(JSON.stringify({ type: 'subscribe', video_ids: videoIds }));
+    }
+  }
+  
   removeListener(callback: (data: any) => void): void {
     this.listeners.delete(callback);
   }
@@ -244,7 +258,7 @@ export const useDownloadStore = defineStore('download', {
     
     // 活跃下载（下载中、暂停、等待中）
     activeDownloads: (state) => Object.values(state.downloads).filter(
-      download => ['downloading', 'paused', 'pending'].includes(download.status)
+      download => ['downloading', 'paused', 'pending', 'queued'].includes(download.status)
     ),
     
     // 已完成下载
@@ -284,7 +298,7 @@ export const useDownloadStore = defineStore('download', {
     // 是否有活跃下载
     hasActiveDownloads: (state) => {
       return Object.values(state.downloads).some(
-        download => download.status === 'downloading' || download.status === 'pending'
+        download => ['downloading', 'pending', 'queued'].includes(download.status)
       );
     },
     
@@ -352,11 +366,49 @@ export const useDownloadStore = defineStore('download', {
       }
       
       const wsManager = DownloadWebSocketManager.getInstance();
-      wsManager.addListener(this.updateDownloadProgress.bind(this));
+      wsManager.addListener(this.applyProgressFrame.bind(this));
       wsManager.connect();
       this.wsConnected = true;
     },
     
+    /**
+     * 设置WebSocket订阅的下载，'all' 表示全部
+     */
+    subscribeDownloads(videoIds: string[] | 'all') {
+      DownloadWebSocketManager.getInstance().subscribe(videoIds);
+    },
+    
+    /**
+     * 处理推送的进度帧：快照替换本地的下载列表，增量帧与已有的进度合并
+     */
+    applyProgressFrame(frame: DownloadProgressFrame) {
+      if (frame.type === 'snapshot') {
+        // 快照包含订阅范围内的全部下载，不在其中的（积压期间被删除或已取消订阅）从本地移除
+        Object.keys(this.downloads).forEach(videoId => {
+          if (!(videoId in frame.downloads)) {
+            delete this.downloads[videoId];
+            this.speedSmoother.clearHistory(videoId);
+          }
+        });
+      }
+
+      Object.entries(frame.downloads).forEach(([videoId, fields]) => {
+        const existing = this.downloads[videoId];
+        if (!existing && !fields.video_id) {
+          // 本地没有这个下载，增量不完整，等待下一次快照
+          return;
+        }
+        this.updateDownloadProgress({ ...existing, ...fields } as DownloadProgress);
+      });
+      
+      frame.removed?.forEach(videoId => {
+        delete this.downloads[videoId];
+        this.speedSmoother.clearHistory(videoId);
+      });
+      
+      this.lastUpdated = Date.now();
+    },
+    
     /**
      * 更新下载进度
      */
@@ -403,7 +455,7 @@ export const useDownloadStore = defineStore('download', {
         const result = await DownloadApi.startDownload(videoId, force);
         
         if (result.status === 'success') {
-          ElMessage.success('开始下载');
+          ElMessage.success(result.message || '开始下载');
           return true;
         } else if (result.status === 'warning' && result.existing_download) {
           // 视频已经下载过，询问用户
@@ -504,6 +556,26 @@ export const useDownloadStore = defineStore('download', {
       }
     },
     
+    /**
+     * 校验已下载的文件，损坏的部分会自动重新下载
+     */
+    async verifyDownload(videoId: string) {
+      try {
+        const result = await DownloadApi.handleDownloadAction(videoId, 'verify');
+        if (result.status === 'success') {
+          ElMessage.success(result.message || '文件校验通过');
+          return true;
+        } else {
+          ElMessage.error(result.message || '校验文件失败');
+          return false;
+        }
+      } catch (error) {
+        console.error('校验文件失败:', error);
+        ElMessage.error('校验文件失败');
+        return false;
+      }
+    },
+    
     /**
      * 删除下载记录
      */
@@ -529,7 +601,7 @@ export const useDownloadStore = defineStore('download', {
      */
     async pauseAllDownloads() {
       const downloadingIds = this.activeDownloads
-        .filter(d => d.status === 'downloading')
+        .filter(d => d.status === 'downloading' || d.status === 'queued')
         .map(d => d.video_id);
       
       if (downloadingIds.length === 0) {
@@ -3,10 +3,10 @@
  */
 
 // 下载操作类型
-export type DownloadActionType = 'pause' | 'resume' | 'cancel' | 'retry' | 'delete';
+export type DownloadActionType = 'pause' | 'resume' | 'cancel' | 'retry' | 'delete' | 'verify';
 
 // 下载状态类型
-export type DownloadStatus = 'pending' | 'downloading' | 'paused' | 'completed' | 'cancelled' | 'error';
+export type DownloadStatus = 'pending' | 'queued' | 'downloading' | 'paused' | 'completed' | 'cancelled' | 'error';
 
 // 下载分段类型
 export interface DownloadSegment {
@@ -32,14 +32,24 @@ export interface DownloadProgress {
   completed_at?: string;
   retry_count: number;
   max_retries: number;
+  queue_position?: number;
   segments?: DownloadSegment[];
 }
 
+// WebSocket 推送的进度帧：快照包含所有下载的完整进度，增量只包含变化的字段
+export interface DownloadProgressFrame {
+  type: 'snapshot' | 'delta';
+  seq: number;
+  downloads: Record<string, Partial<DownloadProgress>>;
+  removed?: string[];
+}
+
 // 下载请求类型
 export interface DownloadRequest {
   video_id: string;
   filename?: string;
   force?: boolean;
+  priority?: number;
 }
 
 // 下载操作请求类型